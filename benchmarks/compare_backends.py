@@ -0,0 +1,80 @@
+# benchmarks/compare_backends.py
+# Compares local inference backends (PyTorch eager vs ONNX Runtime fp32/int8)
+# on latency, throughput and ROUGE drift against the PyTorch outputs.
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import pandas as pd
+from rouge_score import rouge_scorer
+
+# Measure raw generation, not cache hits; ONNX has no prefix KV cache, so torch runs without it too
+os.environ["SUMMARY_CACHE_ENABLED"] = "0"
+os.environ["LOCAL_PREFIX_CACHE"] = "0"
+
+from src.summarizer import SummarizerService  # noqa: E402
+
+
+def run_backend(backend: str, model_name: str, notes: list) -> dict:
+    start = time.perf_counter()
+    service = SummarizerService(mode="local", model_name=model_name, backend=backend)
+    load_seconds = time.perf_counter() - start
+
+    latencies, outputs = [], []
+    for note in notes:
+        t0 = time.perf_counter()
+        outputs.append(service.summarize(note))
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    service.batch_summarize(notes)
+    batch_seconds = time.perf_counter() - t0
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "latency_p50_s": round(statistics.median(latencies), 4),
+        "latency_mean_s": round(statistics.mean(latencies), 4),
+        "throughput_notes_per_s": round(len(notes) / batch_seconds, 3),
+        "outputs": outputs,
+    }
+
+
+def compare(model_name: str, csv_path: str, samples: int, backends: list) -> list:
+    notes = pd.read_csv(csv_path)["Prompt"].head(samples).tolist()
+    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+
+    reference = run_backend("torch", model_name, notes)
+    reports = [reference]
+    for backend in backends:
+        report = run_backend(backend, model_name, notes)
+        drift = [
+            scorer.score(ref, out)["rougeL"].fmeasure
+            for ref, out in zip(reference["outputs"], report["outputs"])
+        ]
+        report["rougeL_vs_torch"] = round(statistics.mean(drift), 4)
+        report["speedup_vs_torch"] = round(reference["latency_mean_s"] / report["latency_mean_s"], 2)
+        reports.append(report)
+
+    for report in reports:
+        report.pop("outputs")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare local inference backends.")
+    parser.add_argument("--model", default=os.getenv("LOCAL_MODEL_PATH", "distilgpt2"))
+    parser.add_argument("--csv", default="Data/test.csv")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    parser.add_argument("--out", help="Optional path for the JSON report")
+    args = parser.parse_args()
+
+    results = compare(args.model, args.csv, args.samples, args.backends)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
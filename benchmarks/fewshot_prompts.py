@@ -0,0 +1,125 @@
+# benchmarks/fewshot_prompts.py
+# Compares the static two-example prompt with retrieved few-shot examples
+# (src/fewshot_index.py) on prompt tokens, generation latency and ROUGE-L.
+#
+# The labelled CSV is split: the index is built from the train part and the
+# held-out notes are summarized with both prompts. `--mode none` skips
+# generation and only reports prompt sizes and retrieval time.
+#
+#   python -m benchmarks.fewshot_prompts --csv data/clinical_prompts.csv --mode local --samples 20
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from rouge_score import rouge_scorer
+
+# Measure raw generation, not cache hits
+os.environ["SUMMARY_CACHE_ENABLED"] = "0"
+
+from src.async_gemini import estimate_tokens  # noqa: E402
+from src.data_loader import load_clinical_data  # noqa: E402
+from src.fewshot_index import FewShotIndex  # noqa: E402
+from src.prompt_templates import build_prompt  # noqa: E402
+
+
+def make_generator(mode: str, model_name: str, max_new_tokens: int):
+    """Return (generate(prompt) -> text, count_tokens(text) -> int) for the chosen backend."""
+    if mode == "none":
+        return None, estimate_tokens
+
+    from src.langchain_pipeline import LangChainSummarizer
+
+    pipeline = LangChainSummarizer(mode=mode, model_name=model_name)
+    if mode == "gemini":
+        return (lambda prompt: pipeline.llm.generate_content(prompt).text.strip()), estimate_tokens
+
+    import torch
+
+    tokenizer, model = pipeline.tokenizer, pipeline.model
+
+    def generate(prompt: str) -> str:
+        encoded = tokenizer(prompt, return_tensors="pt")
+        with torch.no_grad():
+            output_ids = model.generate(**encoded, max_new_tokens=max_new_tokens, do_sample=False,
+                                        pad_token_id=tokenizer.pad_token_id)
+        return tokenizer.decode(output_ids[0, encoded["input_ids"].shape[1]:], skip_special_tokens=True).strip()
+
+    return generate, (lambda text: len(tokenizer(text)["input_ids"]))
+
+
+def run(csv_path: str, mode: str, model_name: str, samples: int, k: int, token_budget: int,
+        max_new_tokens: int, index_dir: str = None) -> dict:
+    df = load_clinical_data(csv_path).sample(frac=1.0, random_state=42).reset_index(drop=True)
+    held_out, train = df.head(samples), df.iloc[samples:]
+
+    index = FewShotIndex(index_dir or tempfile.mkdtemp(prefix="fewshot-"))
+    start = time.perf_counter()
+    index.add(zip(train["Prompt"], train["Clinician"]))
+    build_seconds = time.perf_counter() - start
+
+    generate, count_tokens = make_generator(mode, model_name, max_new_tokens)
+    scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+    variants = {"static": [], "retrieved": []}
+
+    for note, gold in zip(held_out["Prompt"], held_out["Clinician"]):
+        t0 = time.perf_counter()
+        examples = index.select(note, k=k, token_budget=token_budget)
+        retrieval_seconds = time.perf_counter() - t0
+
+        for name, prompt in (("static", build_prompt(note)), ("retrieved", build_prompt(note, examples))):
+            row = {"prompt_tokens": count_tokens(prompt)}
+            if name == "retrieved":
+                row["retrieval_ms"] = retrieval_seconds * 1000
+                row["examples"] = len(examples)
+            if generate is not None:
+                t0 = time.perf_counter()
+                output = generate(prompt)
+                row["latency_s"] = time.perf_counter() - t0
+                row["rougeL"] = scorer.score(gold, output)["rougeL"].fmeasure
+            variants[name].append(row)
+
+    def summarize(rows):
+        keys = [key for key in rows[0] if key != "examples"] if rows else []
+        return {f"mean_{key}": round(statistics.mean(r[key] for r in rows), 4) for key in keys}
+
+    report = {
+        "mode": mode,
+        "samples": len(held_out),
+        "index_examples": len(index),
+        "index_build_seconds": round(build_seconds, 3),
+        "k": k,
+        "token_budget": token_budget,
+        "static": summarize(variants["static"]),
+        "retrieved": summarize(variants["retrieved"]),
+    }
+    static, retrieved = report["static"], report["retrieved"]
+    report["prompt_token_reduction"] = round(1 - retrieved["mean_prompt_tokens"] / static["mean_prompt_tokens"], 4)
+    if generate is not None:
+        report["latency_reduction"] = round(1 - retrieved["mean_latency_s"] / static["mean_latency_s"], 4)
+        report["rougeL_delta"] = round(retrieved["mean_rougeL"] - static["mean_rougeL"], 4)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static vs retrieved few-shot prompts.")
+    parser.add_argument("--csv", required=True, help="Labelled CSV with Prompt and Clinician columns")
+    parser.add_argument("--mode", choices=["none", "local", "gemini"], default="none")
+    parser.add_argument("--model", default=os.getenv("LOCAL_MODEL_PATH", "distilgpt2"))
+    parser.add_argument("--samples", type=int, default=20, help="Held-out notes to evaluate")
+    parser.add_argument("-k", type=int, default=2)
+    parser.add_argument("--budget", type=int, default=800, help="Token budget for retrieved examples")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--index", help="Index directory (default: a temporary one)")
+    parser.add_argument("--out", help="Optional path for the JSON report")
+    args = parser.parse_args()
+
+    results = run(args.csv, args.mode, args.model, args.samples, args.k, args.budget,
+                  args.max_new_tokens, args.index)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
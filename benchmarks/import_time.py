@@ -0,0 +1,59 @@
+# benchmarks/import_time.py
+# Measures how long it takes to import a module (default: the FastAPI app)
+# using `python -X importtime`, so import-time regressions show up in CI.
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("torch", "transformers", "langchain", "google.generativeai")
+
+
+def measure_import(module: str) -> dict:
+    """Import `module` in a fresh interpreter and parse the -X importtime report."""
+    probe = (
+        "import sys, json, {m}; "
+        "print(json.dumps([h for h in {heavy!r} if h in sys.modules]))"
+    ).format(m=module, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        timings.append((name, int(self_us), int(cumulative_us)))
+
+    total_us = sum(self_us for _, self_us, _ in timings)
+    slowest = sorted(timings, key=lambda t: t[2], reverse=True)[:10]
+    return {
+        "module": module,
+        "total_seconds": round(total_us / 1e6, 4),
+        "heavy_modules_loaded": json.loads(result.stdout.strip().splitlines()[-1]),
+        "slowest": [{"module": n, "cumulative_seconds": round(c / 1e6, 4)} for n, _, c in slowest],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark module import time.")
+    parser.add_argument("--module", default="src.app", help="Module to import (default: src.app)")
+    parser.add_argument("--max-seconds", type=float, help="Fail if the import takes longer than this")
+    args = parser.parse_args()
+
+    report = measure_import(args.module)
+    print(json.dumps(report, indent=2))
+
+    if args.max_seconds is not None and report["total_seconds"] > args.max_seconds:
+        print(f"❌ Import of {args.module} took {report['total_seconds']}s (limit {args.max_seconds}s)")
+        sys.exit(1)
@@ -0,0 +1,226 @@
+# benchmarks/load_test.py
+# Open-loop load test for /summarize and /summarize/batch.
+#
+# Replays notes from Data/test.csv at fixed arrival rates and reports
+# p50/p95/p99 latency, throughput, error rate and admission rejections (429)
+# as JSON. Requests are spread over `--clients` X-Client-Id values, so the
+# per-client admission limit does not turn the whole test into one client.
+# By default it starts the API itself in MODE=stub, so no model or network is
+# needed.
+#
+#   python benchmarks/load_test.py --rates 2 5 10 --duration 15 --save-baseline
+#   python benchmarks/load_test.py --rates 2 5 10 --duration 15 --baseline benchmarks/baseline.json
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_notes(csv_path: str) -> List[str]:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row["Prompt"] for row in csv.DictReader(f) if row.get("Prompt")]
+
+
+def post_json(url: str, payload: dict, timeout: float, client_id: str) -> int:
+    data = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json", "X-Client-Id": client_id}
+    request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        return 0
+
+
+def start_stub_server(latency_ms: float, tokens_per_sec: float) -> tuple:
+    """Start uvicorn with MODE=stub on a free port and wait until /readyz answers."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    env = dict(
+        os.environ,
+        MODE="stub",
+        WARMUP="0",
+        SUMMARY_CACHE_ENABLED="0",
+        STUB_LATENCY_MS=str(latency_ms),
+        STUB_TOKENS_PER_SEC=str(tokens_per_sec),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/readyz", timeout=1) as resp:
+                if resp.status == 200:
+                    return proc, base_url
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Stub server did not become ready within 30s")
+
+
+async def run_rate(base_url: str, endpoint: str, notes: List[str], rate: float, duration: float,
+                   batch_size: int, timeout: float, executor: ThreadPoolExecutor, clients: int = 32) -> dict:
+    """
+    Fire requests at a fixed arrival rate (open loop) and collect latencies.
+    Request `i` is sent as client `i % clients`; 429s are counted as
+    rejections rather than errors.
+    """
+    loop = asyncio.get_running_loop()
+    total = max(1, int(rate * duration))
+    latencies, errors, rejected = [], 0, 0
+
+    if endpoint == "batch":
+        url = f"{base_url}/summarize/batch"
+        payloads = [
+            {"texts": [notes[(i * batch_size + j) % len(notes)] for j in range(batch_size)], "bypass_cache": True}
+            for i in range(total)
+        ]
+    else:
+        url = f"{base_url}/summarize"
+        payloads = [{"text": notes[i % len(notes)], "bypass_cache": True} for i in range(total)]
+
+    async def fire(i: int):
+        nonlocal errors, rejected
+        await asyncio.sleep(max(0.0, start + i / rate - time.monotonic()))
+        t0 = time.monotonic()
+        status = await loop.run_in_executor(executor, post_json, url, payloads[i], timeout, f"load-{i % clients}")
+        if status == 200:
+            latencies.append(time.monotonic() - t0)
+        elif status == 429:
+            rejected += 1
+        else:
+            errors += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(fire(i) for i in range(total)))
+    elapsed = time.monotonic() - start
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "endpoint": endpoint,
+        "rate_rps": rate,
+        "requests": total,
+        "clients": clients,
+        "errors": errors,
+        "error_rate": round(errors / total, 4),
+        "rejected": rejected,
+        "rejection_rate": round(rejected / total, 4),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+    }
+
+
+def compare_to_baseline(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Return human-readable regressions of p95 latency, throughput, error or rejection rate."""
+    previous = {(r["endpoint"], r["rate_rps"]): r for r in baseline}
+    regressions = []
+    for current in results:
+        old = previous.get((current["endpoint"], current["rate_rps"]))
+        if old is None:
+            continue
+        label = f"{current['endpoint']}@{current['rate_rps']}rps"
+        if old["p95_ms"] and current["p95_ms"] and current["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {old['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old['throughput_rps']} -> {current['throughput_rps']} rps")
+        if current["error_rate"] > old["error_rate"] + 0.01:
+            regressions.append(f"{label}: error rate {old['error_rate']} -> {current['error_rate']}")
+        # Baselines saved before rejections were counted separately have no rejection rate
+        old_rejections = old.get("rejection_rate", 0.0)
+        if current["rejection_rate"] > old_rejections + 0.01:
+            regressions.append(f"{label}: rejection rate {old_rejections} -> {current['rejection_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the summarization API.")
+    parser.add_argument("--url", help="Existing server to test; a MODE=stub server is started if omitted")
+    parser.add_argument("--csv", default=str(REPO_ROOT / "Data" / "test.csv"))
+    parser.add_argument("--endpoints", nargs="+", choices=["summarize", "batch"], default=["summarize", "batch"])
+    parser.add_argument("--rates", nargs="+", type=float, default=[2, 5, 10])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per rate")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32, help="Distinct X-Client-Id values to spread requests over")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0)
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Compare against this saved report")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Save the report to {DEFAULT_BASELINE}")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    notes = load_notes(args.csv)
+    proc = None
+    base_url = args.url
+    if base_url is None:
+        proc, base_url = start_stub_server(args.stub_latency_ms, args.stub_tokens_per_sec)
+
+    try:
+        with ThreadPoolExecutor(max_workers=256) as executor:
+            results = [
+                asyncio.run(run_rate(base_url, endpoint, notes, rate, args.duration,
+                                     args.batch_size, args.timeout, executor, args.clients))
+                for endpoint in args.endpoints
+                for rate in args.rates
+            ]
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"✅ Baseline saved to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+
+def load_checkpoint(checkpoint_path, keys: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # Completed rows from the JSONL checkpoint; a torn last line from a crash is ignored.
+    # With `keys` ({id: request key}) a row only counts if it was produced by that exact request.
+    done = {}
+    path = Path(checkpoint_path)
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            row_id = str(record["id"])
+            if keys is None or (row_id in keys and record.get("key") == keys[row_id]):
+                done[row_id] = record["response"]
+    return done
+
+
+class BatchRunner:
+    """
+    Sends chat completions to an OpenAI-compatible endpoint (Ollama by default)
+    with a fixed number of requests in flight over keep-alive connections.
+
+    Every finished row is appended to a JSONL checkpoint straight away, so an
+    interrupted run picks up where it stopped. Rows are stored with a hash of
+    the model, generation settings and full prompt (`request_key`); a row is
+    only reused when that hash matches, so changing the model or the prompt
+    template regenerates it.
+
+    `stop` sequences end a completion early; items may carry their own
+    `max_tokens` as a third element, otherwise `max_tokens` applies.
+
+    A row whose request fails (after the client's retries) is logged and
+    left out of the checkpoint, so the run carries on and a rerun retries it.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434/v1",
+        api_key: str = "ollama",
+        model: str = "qwen2.5:0.5b",
+        concurrency: int = 4,
+        max_tokens: int = 256,
+        temperature: float = 0,
+        seed: int = 42,
+        system_prompt: str = "You are a helpful assistant!",
+        timeout: float = 300.0,
+        max_retries: int = 2,
+        stop: Optional[List[str]] = None
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.concurrency = concurrency
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.seed = seed
+        self.system_prompt = system_prompt
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.stop = stop
+
+    def _client(self) -> AsyncOpenAI:
+        # One pooled connection per in-flight request, kept alive between requests
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            timeout=self.timeout
+        )
+        return AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            http_client=http_client,
+            max_retries=self.max_retries
+        )
+
+    def request_key(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """Hash of everything that determines a row's response."""
+        request = {
+            "model": self.model,
+            "system_prompt": self.system_prompt,
+            "temperature": self.temperature,
+            "seed": self.seed,
+            "stop": self.stop,
+            "max_tokens": max_tokens or self.max_tokens,
+            "prompt": prompt
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    async def _complete(self, client: AsyncOpenAI, prompt: str, max_tokens: Optional[int] = None) -> str:
+        extra = {"stop": self.stop} if self.stop else {}
+        response = await client.chat.completions.create(
+            model=self.model,
+            seed=self.seed,
+            temperature=self.temperature,
+            max_tokens=max_tokens or self.max_tokens,
+            messages=[
+                {'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': prompt}
+            ],
+            **extra
+        )
+        return response.choices[0].message.content.strip()
+
+    async def arun(self, items: Iterable[Tuple], checkpoint_path) -> Dict[str, str]:
+        """
+        Complete every (id, prompt) or (id, prompt, max_tokens) item not
+        already in the checkpoint for the same request.
+
+        Returns {id: response} for all ids that have one, including those
+        from earlier runs; failed rows are missing.
+        """
+        rows = [(str(item[0]), item[1], item[2] if len(item) > 2 else None) for item in items]
+        keys = {row_id: self.request_key(prompt, max_tokens) for row_id, prompt, max_tokens in rows}
+        done = load_checkpoint(checkpoint_path, keys)
+        pending: List[Tuple[str, str, Optional[int]]] = [row for row in rows if row[0] not in done]
+        queue = iter(pending)
+        failed: List[str] = []
+        progress = tqdm(total=len(pending), desc="Processing test rows")
+
+        async with self._client() as client:
+            with open(checkpoint_path, "a", encoding="utf-8") as ckpt:
+                async def worker():
+                    # Workers pull from a shared iterator, so at most `concurrency` requests are open
+                    for row_id, prompt, max_tokens in queue:
+                        try:
+                            text = await self._complete(client, prompt, max_tokens)
+                        except Exception as e:
+                            failed.append(row_id)
+                            logger.warning("Row %s failed, will be retried on the next run: %s", row_id, e)
+                            progress.update(1)
+                            continue
+                        done[row_id] = text
+                        record = {"id": row_id, "key": keys[row_id], "response": text}
+                        ckpt.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        ckpt.flush()
+                        progress.update(1)
+
+                await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+
+        progress.close()
+        if failed:
+            logger.warning("%d of %d rows failed; rerun with the same checkpoint to retry them",
+                           len(failed), len(pending))
+        return done
+
+    def run(self, items: Iterable[Tuple], checkpoint_path) -> Dict[str, str]:
+        return asyncio.run(self.arun(items, checkpoint_path))
+
+
+def runner_from_env(**overrides) -> BatchRunner:
+    settings = dict(
+        base_url=os.getenv("OPENAI_BASE_URL", "http://localhost:11434/v1"),
+        api_key=os.getenv("OPENAI_API_KEY", "ollama"),
+        model=os.getenv("BATCH_MODEL", "qwen2.5:0.5b"),
+        concurrency=int(os.getenv("BATCH_CONCURRENCY", 4))
+    )
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return BatchRunner(**settings)
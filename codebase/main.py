@@ -1,40 +1,16 @@
+import argparse
 import os
-import openai 
-import string
+import sys
+from pathlib import Path
+
 import pandas as pd
-import re
-from openai import OpenAI
-from tqdm import tqdm
-
-def clean_sentence(text: str) -> str:
-    # Remove punctuation
-    text_no_punct = text.translate(str.maketrans('', '', string.punctuation))
-    # Remove newlines and carriage returns
-    text_no_newlines = text_no_punct.replace('\n', ' ').replace('\r', ' ').replace("**", "")
-    # Convert to lowercase and strip extra whitespace
-    return text_no_newlines.lower().strip()
-
-def extract_description(prompt):
-    # Replace newlines with spaces
-    prompt_cleaned = prompt.replace('\n', ' ')
-
-    # Find the first full stop and extract everything after it
-    match = re.search(r'\.(.*)', prompt_cleaned)
-    return match.group(1).strip() if match else None
-
-def clean_summary(summary):
-    sentences = summary.split('.')
-        # Remove any sentence that contains 'I am a nurse' (case insensitive)
-    filtered = [s for s in sentences if 'i am a nurse' not in s.lower()]
-    # Join the filtered sentences back together
-    cleaned_summary = '. '.join(filtered).strip()
-    return cleaned_summary
-
-client = OpenAI(
-    base_url = 'http://localhost:11434/v1',
-    api_key='ollama', # required, but unused
-)
-test = pd.read_csv('Data/test_raw.csv')
+
+from batch_runner import runner_from_env
+from postprocess import format_responses
+
+# Token budgets come from the serving code, so both scale with a note's questions the same way
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.stopping import new_token_budget  # noqa: E402
 
 # Optimized prompt with enhanced structure and clinical tone
 optimized_prompt_template = """
@@ -86,31 +62,42 @@ Immediate Management:
 ### OUTPUT:
 """
 
-for idx , row in tqdm(test.iterrows(), total=len(test), desc="Processing test rows"):
-    question = row['Prompt']
-    cleaned_prompt =  "summary "+ " ".join(question.split('.')[1:]).replace('\n\n', ' ').replace('\n', ' ')
-    formatted_prompt = optimized_prompt_template.replace("{{question}}", question)
-    response = client.chat.completions.create(
-        model = "qwen2.5:0.5b",
-        seed= 42,
-        temperature=0,
-        max_tokens=256,
-
-        messages = [
-            {'role': 'system', 'content': 'You are a helpful assistant!'},
-            {'role': 'user', 'content': formatted_prompt}
-        ]
+# The answer is over once the model starts another example or echoes the prompt layout
+STOP_SEQUENCES = ["**********", "### INPUT", "### Example"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate clinician responses for the test set.")
+    parser.add_argument("--input", default="Data/test_raw.csv")
+    parser.add_argument("--output", default="Data/optimizedv2_test_raw_with_prompt.csv")
+    parser.add_argument("--checkpoint", help="Append-only JSONL checkpoint (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint (default: env OPENAI_BASE_URL or local Ollama)")
+    parser.add_argument("--model", help="Model name (default: env BATCH_MODEL or qwen2.5:0.5b)")
+    parser.add_argument("--concurrency", type=int, help="Requests in flight (default: env BATCH_CONCURRENCY or 4)")
+    args = parser.parse_args()
+
+    test = pd.read_csv(args.input)
+    runner = runner_from_env(base_url=args.base_url, model=args.model, concurrency=args.concurrency,
+                             stop=STOP_SEQUENCES)
+    checkpoint = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+
+    items = [
+        (str(master_index), optimized_prompt_template.replace("{{question}}", question), new_token_budget(question))
+        for master_index, question in zip(test['Master_Index'], test['Prompt'])
+    ]
+    responses = runner.run(items, checkpoint)
+    missing = len(items) - len(responses)
+    if missing:
+        print(f"⚠️ {missing} rows have no response yet; rerun to retry them (checkpoint: {checkpoint})")
+
+    # Assemble in the original row order, whatever order the requests finished in
+    test['Clinician'] = format_responses(
+        test['Prompt'],
+        test['Master_Index'].astype(str).map(responses)
     )
-    response_text = f"{cleaned_prompt} {response.choices[0].message.content.strip()}"
-    processed_response = response_text.replace('\n\n', ' ').replace('\n', ' ').replace('**', '').replace("####", "").strip().lower()
-    test.at[idx, 'Clinician'] = f"{processed_response}"
-
-test[['Master_Index', 'Clinician']].to_csv("Data/optimizedv2_test_raw_with_prompt.csv", index=False)
-print(test['Clinician'][0])
-    
-
-
-
-
+    test[['Master_Index', 'Clinician']].to_csv(args.output, index=False)
+    print(test['Clinician'][0])
 
 
+if __name__ == "__main__":
+    main()
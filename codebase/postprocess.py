@@ -0,0 +1,113 @@
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+# Compiled once at import instead of on every row
+_CLEAN_TABLE = str.maketrans({**{c: None for c in string.punctuation}, '\n': ' ', '\r': ' '})
+_NEWLINES = re.compile(r'\n\n|\n')
+_DESCRIPTION = re.compile(r'\.(.*)')
+_NURSE = r'[^.]*?(?i:i am a nurse)[^.]*'
+# A self-introduction sentence plus the full stop after it...
+_NURSE_SENTENCE = re.compile(r'(?:^|(?<=\.))' + _NURSE + r'\.')
+# ...or, when it is the last sentence, plus the full stop before it
+_NURSE_LAST_SENTENCE = re.compile(r'(?:^|\.)' + _NURSE + r'$')
+
+
+def clean_sentence(texts: pd.Series) -> pd.Series:
+    # Remove punctuation, newlines and carriage returns, lowercase and strip extra whitespace
+    return texts.str.translate(_CLEAN_TABLE).str.lower().str.strip()
+
+
+def extract_description(prompts: pd.Series) -> pd.Series:
+    # Everything after the first full stop, or None when there is none
+    described = prompts.str.replace('\n', ' ', regex=False).str.extract(_DESCRIPTION, expand=False).str.strip()
+    return described.astype(object).where(described.notna(), None)
+
+
+def clean_summary(summaries: pd.Series) -> pd.Series:
+    # Drop every sentence containing 'I am a nurse' (case insensitive) and rejoin with '. '
+    kept = summaries.str.replace(_NURSE_SENTENCE, '', regex=True)
+    kept = kept.str.replace(_NURSE_LAST_SENTENCE, '', regex=True)
+    return kept.str.replace('.', '. ', regex=False).str.strip()
+
+
+def format_responses(questions: pd.Series, responses: pd.Series) -> pd.Series:
+    # "summary " + the scenario without the nurse's self-introduction + the model output, flattened and lowercased
+    scenario = questions.str.partition('.')[2].str.replace('.', ' ', regex=False)
+    scenario = scenario.str.replace(_NEWLINES, ' ', regex=True)
+    text = "summary " + scenario + " " + responses
+    text = text.str.replace(_NEWLINES, ' ', regex=True)
+    # Same order as the original chained replaces: removing '**' can join a '####'
+    text = text.str.replace('**', '', regex=False).str.replace('####', '', regex=False)
+    return text.str.strip().str.lower()
+
+
+TRANSFORMS: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    "clean_sentence": clean_sentence,
+    "extract_description": extract_description,
+    "clean_summary": clean_summary,
+}
+
+
+def _transform_chunk(task):
+    chunk, columns = task
+    for column, name in columns.items():
+        chunk[column] = TRANSFORMS[name](chunk[column])
+    return chunk
+
+
+def process_csv(
+    input_csv: str,
+    output_csv: str,
+    columns: Dict[str, str],
+    chunksize: int = 100_000,
+    workers: Optional[int] = None
+):
+    """
+    Apply TRANSFORMS to columns of a large CSV, e.g. {"Clinician": "clean_summary"}.
+
+    The file is read in chunks that are transformed in a process pool and
+    written back in their original order, so memory stays bounded.
+    """
+    workers = workers or os.cpu_count() or 1
+    reader = pd.read_csv(input_csv, chunksize=chunksize, dtype={c: "string" for c in columns})
+    header = True
+
+    def write(chunk):
+        nonlocal header
+        chunk.to_csv(output_csv, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = []
+        for chunk in reader:
+            in_flight.append(pool.submit(_transform_chunk, (chunk, columns)))
+            if len(in_flight) >= workers * 2:
+                write(in_flight.pop(0).result())
+        for future in in_flight:
+            write(future.result())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Post-process text columns of a CSV.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--column", action="append", required=True,
+                        help=f"COLUMN=TRANSFORM, TRANSFORM one of {sorted(TRANSFORMS)}")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    process_csv(
+        args.input,
+        args.output,
+        dict(spec.split("=", 1) for spec in args.column),
+        chunksize=args.chunksize,
+        workers=args.workers
+    )
@@ -0,0 +1,277 @@
+# src/admission.py
+# Admission control for the API: a bounded queue in front of a fixed number
+# of generation slots, per-client limits, and request deadlines that are
+# carried into generation so expired or abandoned requests stop early and
+# give their slot back.
+#
+# The controller lives on the event loop of one worker process; every method
+# is called from that loop, so no locking is needed. Worker threads (bulk
+# jobs) take slots through `thread_slot`, which hops onto that loop.
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from src import metrics
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+CLIENT_HEADER = "X-Client-Id"
+
+ADMISSION_REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "admission_rejected", "Requests turned away with 429 before queueing.", ("reason",)))
+ADMISSION_CANCELLED = metrics.REGISTRY.register(metrics.Counter(
+    "admission_cancelled", "Admitted requests cancelled before finishing.", ("reason",)))
+ADMISSION_QUEUE_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "admission_queue_seconds", "Time admitted requests waited for a generation slot.", ()))
+
+
+class DeadlineExceeded(Exception):
+    """A request ran past its deadline or its client went away."""
+
+    def __init__(self, reason: str = "deadline"):
+        super().__init__(f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class AdmissionRejected(Exception):
+    """The queue or the client's share of it is full; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Too many requests ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """
+    Absolute expiry time plus a cancel flag, shared between the request
+    handler and the thread doing the generation.
+    """
+
+    def __init__(self, timeout_s: Optional[float] = None):
+        self.expires_at = time.monotonic() + timeout_s if timeout_s else None
+        self._cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default_ms: Optional[float] = None) -> "Deadline":
+        """Deadline from an `X-Deadline-Ms` value: milliseconds the client is willing to wait."""
+        try:
+            ms = float(value) if value else default_ms
+        except ValueError:
+            ms = default_ms
+        return cls(ms / 1000.0 if ms and ms > 0 else None)
+
+    def cancel(self, reason: str = "disconnect"):
+        self.reason = self.reason or reason
+        self._cancelled.set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a time limit."""
+        return None if self.expires_at is None else self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        if self._cancelled.is_set():
+            return True
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.reason = self.reason or "deadline"
+            return True
+        return False
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed or the request was cancelled."""
+        if self.expired:
+            raise DeadlineExceeded(self.reason or "deadline")
+
+
+class Reservation:
+    """
+    A client's place in the admission queue, taken with
+    `AdmissionController.reserve`. `hold` waits for a generation slot and
+    keeps it for the duration of the block; `close` gives up a place that
+    was never used. Both are safe to call more than once.
+    """
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self.controller = controller
+        self.client = client
+        self._queued = True
+        self._closed = False
+
+    @asynccontextmanager
+    async def hold(self, deadline: Deadline):
+        try:
+            await self.controller._acquire(deadline)
+            self._queued = False
+            self.controller._waiting -= 1
+            try:
+                # Expired or abandoned while queued: give the slot straight back
+                deadline.check()
+            except DeadlineExceeded:
+                self.controller._release(None)
+                raise
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.controller._release(time.monotonic() - start)
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.controller._leave(self.client, queued=self._queued)
+
+
+class AdmissionController:
+    """
+    At most `max_concurrency` requests generate at once and at most
+    `max_queue` more wait for a slot, in arrival order. A client (by
+    `X-Client-Id`, else remote address) may hold at most `per_client` of
+    those places. Anything beyond is rejected immediately with a
+    `Retry-After` estimated from recent service times. Background work
+    shares the same slots through `thread_slot`.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 16, per_client: int = 4):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.per_client = max(1, per_client)
+        self._active = 0
+        self._waiting = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._clients: Dict[str, int] = defaultdict(int)
+        self._background = 0
+        self._service_seconds = 1.0
+        self._stats = {"admitted": 0, "rejected": 0, "completed": 0, "expired_in_queue": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", 4)),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", 16)),
+            per_client=int(os.getenv("ADMISSION_PER_CLIENT", 4))
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely get a slot."""
+        backlog = self._waiting + 1
+        return max(1, math.ceil(self._service_seconds * backlog / self.max_concurrency))
+
+    def _reject(self, reason: str):
+        self._stats["rejected"] += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def reserve(self, client: str) -> Reservation:
+        """Take a place in the queue for `client`, or raise AdmissionRejected."""
+        if self._clients.get(client, 0) >= self.per_client:
+            self._reject("client_limit")
+        if self._active + self._waiting >= self.max_concurrency + self.max_queue:
+            self._reject("queue_full")
+        self._clients[client] += 1
+        self._waiting += 1
+        self._stats["admitted"] += 1
+        return Reservation(self, client)
+
+    @asynccontextmanager
+    async def slot(self, client: str, deadline: Deadline):
+        """`reserve` and `hold` in one step, for handlers that reply after generation."""
+        async with self.reserve(client).hold(deadline):
+            yield
+
+    async def _acquire(self, deadline: Deadline):
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), deadline.remaining())
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we gave up; pass it on
+                    self._release(None)
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._stats["expired_in_queue"] += 1
+                    ADMISSION_CANCELLED.inc(reason="expired_in_queue")
+                    raise DeadlineExceeded("deadline") from None
+                raise
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - start)
+
+    def _release(self, service_seconds: Optional[float]):
+        if service_seconds is not None:
+            self._stats["completed"] += 1
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * service_seconds
+        # Hand the slot straight to the oldest waiter, so newcomers cannot jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def _acquire_background(self):
+        await self._acquire(Deadline())
+        self._background += 1
+
+    def _release_background(self):
+        self._background -= 1
+        # Batch durations would skew the per-request Retry-After estimate
+        self._release(None)
+
+    @contextmanager
+    def thread_slot(self, loop: asyncio.AbstractEventLoop):
+        """
+        Hold a generation slot from a worker thread, e.g. for one bulk job
+        batch; `loop` is the event loop the controller runs on. It waits in
+        line with admitted requests but takes no queue place, so it is never
+        rejected.
+        """
+        asyncio.run_coroutine_threadsafe(self._acquire_background(), loop).result()
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self._release_background)
+
+    def _leave(self, client: str, queued: bool):
+        if queued:
+            self._waiting -= 1
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def stats(self) -> Dict[str, float]:
+        return dict(
+            self._stats,
+            active=self._active,
+            background=self._background,
+            waiting=self._waiting,
+            clients=len(self._clients),
+            max_concurrency=self.max_concurrency,
+            max_queue=self.max_queue,
+            per_client=self.per_client,
+            mean_service_seconds=round(self._service_seconds, 3),
+        )
+
+
+async def cancel_on_disconnect(is_disconnected: Callable[[], Awaitable[bool]], deadline: Deadline,
+                               interval: float = 0.1):
+    """Poll the client connection and cancel `deadline` once it is gone (or the deadline passes)."""
+    while not deadline.expired:
+        if await is_disconnected():
+            deadline.cancel("disconnect")
+            ADMISSION_CANCELLED.inc(reason="disconnect")
+            return
+        await asyncio.sleep(interval)
@@ -1,33 +1,191 @@
+import asyncio
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from starlette.routing import Match
+from typing import List, Optional
+from src.admission import (
+    CLIENT_HEADER,
+    DEADLINE_HEADER,
+    AdmissionController,
+    AdmissionRejected,
+    Deadline,
+    DeadlineExceeded,
+    cancel_on_disconnect,
+)
+from src.jobs import JobRunner, JobStore, parse_upload, results_csv
 from src.summarizer import SummarizerService
+from src.shared_weights import memory_report
+from src import metrics
+from src.streaming import ndjson_events, sse_events
+
+logger = logging.getLogger(__name__)
 
 # Read defaults from environment
 MODE = os.getenv("MODE", "local")
 MODEL_NAME = os.getenv("LOCAL_MODEL_PATH", "distilgpt2")
+# A warmup generation in gemini mode is a billable API call per worker start, so it is opt-in there
+WARMUP = os.getenv("WARMUP", "0" if MODE.lower() == "gemini" else "1") != "0"
+# Applied when a request has no X-Deadline-Ms header; off (0) by default, so
+# requests without the header run to completion as before
+DEFAULT_DEADLINE_MS = float(os.getenv("DEFAULT_DEADLINE_MS", 0))
+
+# The service is built during startup, not at import time, so reloads and
+# health probes don't wait for the model weights.
+summarizer_service: Optional[SummarizerService] = None
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+startup_state = {"ready": False, "error": None, "load_seconds": None, "warmup_seconds": None}
+
+
+def load_service(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """
+    Build the summarizer and run a warmup generation; marks the app ready
+    when done. With the server's event `loop`, bulk job batches take
+    admission slots like requests do.
+    """
+    global summarizer_service, job_store, job_runner
+    try:
+        start = time.perf_counter()
+        service = SummarizerService(mode=MODE, model_name=MODEL_NAME)
+        startup_state["load_seconds"] = round(time.perf_counter() - start, 3)
+        if WARMUP:
+            startup_state["warmup_seconds"] = round(service.warmup(), 3)
+        summarizer_service = service
+        # Bulk jobs left unfinished by an earlier run are picked up again here
+        job_store = JobStore.from_env()
+        slot = (lambda: admission.thread_slot(loop)) if loop is not None else None
+        job_runner = JobRunner.from_env(job_store, service, slot=slot).start()
+        startup_state["ready"] = True
+    except Exception as e:
+        logger.exception("Summarizer startup failed: %s", e)
+        startup_state["error"] = str(e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background so /healthz answers while the model is loading
+    loader = asyncio.create_task(asyncio.to_thread(load_service, asyncio.get_running_loop()))
+    yield
+    loader.cancel()
+    if job_runner is not None:
+        # Off the loop: a worker waiting for an admission slot needs it to keep running
+        await asyncio.to_thread(job_runner.stop, 5)
+    if summarizer_service is not None:
+        # Token ids tokenized since the last part was written would otherwise be lost
+        summarizer_service.flush()
+
+
+def get_service() -> SummarizerService:
+    if summarizer_service is None:
+        raise HTTPException(status_code=503, detail="Summarizer is not ready yet")
+    return summarizer_service
+
+
+# Generation slots and queue for this worker process (ADMISSION_* env vars)
+admission = AdmissionController.from_env()
+
+
+def request_deadline(request: Request) -> Deadline:
+    return Deadline.from_header(request.headers.get(DEADLINE_HEADER), DEFAULT_DEADLINE_MS)
+
+
+def reserve(request: Request):
+    """Take a queue place for the caller, or fail fast with 429 and Retry-After."""
+    client = request.headers.get(CLIENT_HEADER) or (request.client.host if request.client else "unknown")
+    try:
+        return admission.reserve(client)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def run_admitted(request: Request, work):
+    """
+    Run `work(deadline)` (an awaitable factory) in an admission slot. The
+    deadline is cancelled if the client disconnects, which stops generation
+    and frees the slot; expired requests get 504.
+    """
+    deadline = request_deadline(request)
+    reservation = reserve(request)
+    try:
+        async with reservation.hold(deadline):
+            watcher = asyncio.create_task(cancel_on_disconnect(request.is_disconnected, deadline))
+            try:
+                return await work(deadline)
+            finally:
+                watcher.cancel()
+    except DeadlineExceeded as e:
+        # 499 (client closed request) is only seen in logs; the client is gone
+        status_code = 499 if e.reason == "disconnect" else 504
+        raise HTTPException(status_code=status_code, detail=str(e))
 
-# Initialize the service once at startup
-summarizer_service = SummarizerService(mode=MODE, model_name=MODEL_NAME)
 
 app = FastAPI(
     title="Medical Summarization API",
     description="REST API for generating medical summaries using Gemini API or a locally fine-tuned model.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
+def route_label(scope) -> str:
+    """
+    Route template ("/jobs/{job_id}") of a request for metric labels, so
+    the number of label values stays bounded; "unmatched" for unknown paths.
+    """
+    route = scope.get("route")
+    if route is None:
+        # Middleware runs before the router has put the route in the scope
+        partial = None
+        for candidate in app.router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+            if match == Match.PARTIAL and partial is None:
+                partial = candidate
+        route = route or partial
+    return getattr(route, "path", None) or "unmatched"
+
+
+if metrics.METRICS_ENABLED:
+    @app.middleware("http")
+    async def track_requests(request: Request, call_next):
+        route = route_label(request.scope)
+        metrics.IN_FLIGHT.inc(route=route)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.IN_FLIGHT.dec(route=route)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+            metrics.REQUESTS.inc(route=route, status=status)
+
+
 class SummarizeRequest(BaseModel):
     text: str
+    bypass_cache: bool = False
 
 
 class BatchSummarizeRequest(BaseModel):
     texts: List[str]
+    bypass_cache: bool = False
 
 
 class SummarizeResponse(BaseModel):
     summary: str
+    source: str = "generated"
+    similarity: Optional[float] = None
+    near_duplicate_of: Optional[int] = None
 
 
 class BatchSummarizeResponse(BaseModel):
@@ -39,22 +197,163 @@ def root():
     return {"message": "Medical Summarization API is running", "mode": MODE}
 
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: the model is loaded and warmed up."""
+    status_code = 200 if startup_state["ready"] else 503
+    return JSONResponse(status_code=status_code, content={"mode": MODE, **startup_state})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of stage timings, token counts and request gauges."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/memory")
+def memory():
+    """Resident and shared memory of the worker that served this request."""
+    return memory_report()
+
+
 @app.post("/summarize", response_model=SummarizeResponse)
-def summarize_text(request: SummarizeRequest):
-    if not request.text.strip():
+async def summarize_text(body: SummarizeRequest, request: Request):
+    if not body.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    service = get_service()
+    result = await run_admitted(request, lambda deadline: asyncio.to_thread(
+        service.summarize_with_audit, body.text, body.bypass_cache, deadline))
+    return SummarizeResponse(**result)
+
+
+@app.post("/summarize/stream")
+async def summarize_stream(body: SummarizeRequest, request: Request, format: str = "ndjson"):
+    """Stream the summary as it is generated, as NDJSON (default) or SSE (`?format=sse`)."""
+    if not body.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
-    summary = summarizer_service.summarize(request.text)
-    return SummarizeResponse(summary=summary)
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    service = get_service()
+    deadline = request_deadline(request)
+    reservation = reserve(request)
+
+    async def events():
+        # The slot is held while the response streams; a dropped connection
+        # closes this generator, which cancels generation
+        try:
+            async with reservation.hold(deadline):
+                chunks = service.stream(body.text, bypass_cache=body.bypass_cache, deadline=deadline)
+                encoded = sse_events(chunks) if format == "sse" else ndjson_events(chunks)
+                async for event in iterate_in_threadpool(encoded):
+                    yield event
+        except DeadlineExceeded:
+            # Headers are already sent; ending without the final event marks the stream incomplete
+            return
+        finally:
+            deadline.cancel("disconnect")
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # Releases the queue place if the client leaves before streaming starts
+    return StreamingResponse(events(), media_type=media_type, background=BackgroundTask(reservation.close))
 
 
 @app.post("/summarize/batch", response_model=BatchSummarizeResponse)
-def summarize_batch(request: BatchSummarizeRequest):
-    if not request.texts or not all(t.strip() for t in request.texts):
+async def summarize_batch(body: BatchSummarizeRequest, request: Request):
+    if not body.texts or not all(t.strip() for t in body.texts):
         raise HTTPException(status_code=400, detail="All texts must be non-empty")
-    summaries = summarizer_service.batch_summarize(request.texts)
+    service = get_service()
+    summaries = await run_admitted(request, lambda deadline: service.abatch_summarize(
+        body.texts, bypass_cache=body.bypass_cache, deadline=deadline))
     return BatchSummarizeResponse(summaries=summaries)
 
 
+def get_job_store() -> JobStore:
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job store is not ready yet")
+    return job_store
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Queue a CSV or NDJSON file in the Data/test.csv schema (Master_Index,
+    Prompt) for background summarization; returns the job id to poll.
+    """
+    store = get_job_store()
+    try:
+        job_id, rows = await asyncio.to_thread(
+            store.create, parse_upload(file.file, file.filename or "", file.content_type or ""), file.filename
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job_runner is not None:
+        job_runner.wake()
+    return {"job_id": job_id, "rows": rows, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Progress of a job, with throughput (rows/s) and ETA (s)."""
+    status = get_job_store().get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/results")
+def job_results(job_id: str, partial: bool = False):
+    """Stream `Master_Index,Clinician` CSV; unfinished jobs need `?partial=true`."""
+    store = get_job_store()
+    status = store.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] != "done" and not partial:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}; pass partial=true for finished rows")
+    return StreamingResponse(
+        results_csv(store.iter_results(job_id)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{job_id}.csv"', "X-Job-Status": status["status"]}
+    )
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job; rows already being summarized still finish."""
+    store = get_job_store()
+    if store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "cancelled": store.cancel(job_id)}
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Generation slots, queue depth and rejections for this worker."""
+    return admission.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    service = get_service()
+    stats = {"enabled": service.cache is not None}
+    if service.cache is not None:
+        stats.update(service.cache.stats())
+    prefix_cache = getattr(service.pipeline, "prefix_cache", None)
+    if prefix_cache is not None:
+        stats["prefix_kv"] = prefix_cache.stats()
+    assisted_stats = getattr(service.pipeline, "assisted_stats", None)
+    if assisted_stats is not None:
+        stats["assisted_decoding"] = assisted_stats.stats()
+    if service.near_dup is not None:
+        stats["near_dup"] = service.near_dup.stats()
+    return stats
+
+
 if __name__ == "__main__":
     import uvicorn
 
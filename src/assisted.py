@@ -0,0 +1,72 @@
+# src/assisted.py
+# Accounting for assisted (speculative) generation, where a small draft model
+# proposes tokens and the main model verifies them in one forward pass. Forward
+# hooks count how often each model runs, which gives the draft acceptance rate.
+
+import threading
+from typing import Dict
+
+
+class ForwardCounter:
+    """
+    Counts forward calls of a torch module through a forward hook, per thread.
+
+    Hooks run on the thread that called `generate`, so concurrent generations
+    on a shared model each see only their own forwards.
+    """
+
+    def __init__(self, module):
+        self._local = threading.local()
+        self._handle = module.register_forward_hook(self._hook)
+
+    @property
+    def calls(self) -> int:
+        """Forward calls made so far by the current thread."""
+        return getattr(self._local, "calls", 0)
+
+    def _hook(self, module, inputs, output):
+        self._local.calls = self.calls + 1
+
+    def remove(self):
+        self._handle.remove()
+
+
+class AssistedDecodingStats:
+    """
+    Aggregates draft/main forward counts per generation.
+
+    Each main-model forward during assisted decoding verifies the draft's
+    proposals and emits one token of its own. Accepted draft tokens are
+    therefore `new_tokens - main_forwards`, and every draft forward
+    proposed one token.
+    """
+
+    def __init__(self, model, draft_model):
+        self.main = ForwardCounter(model)
+        self.draft = ForwardCounter(draft_model)
+        self._lock = threading.Lock()
+        self._totals = {"generations": 0, "new_tokens": 0, "main_forwards": 0, "draft_forwards": 0}
+
+    def snapshot(self):
+        """Forward counts of the current thread; pass to `record` once its generation is done."""
+        return self.main.calls, self.draft.calls
+
+    def record(self, before, new_tokens: int):
+        """Add one generation, given the `snapshot()` taken before it started on this thread."""
+        main_forwards = self.main.calls - before[0]
+        draft_forwards = self.draft.calls - before[1]
+        with self._lock:
+            self._totals["generations"] += 1
+            self._totals["new_tokens"] += new_tokens
+            self._totals["main_forwards"] += main_forwards
+            self._totals["draft_forwards"] += draft_forwards
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            totals = dict(self._totals)
+        accepted = max(0, totals["new_tokens"] - totals["main_forwards"])
+        totals["acceptance_rate"] = round(accepted / totals["draft_forwards"], 4) if totals["draft_forwards"] else None
+        totals["tokens_per_main_forward"] = (
+            round(totals["new_tokens"] / totals["main_forwards"], 3) if totals["main_forwards"] else None
+        )
+        return totals
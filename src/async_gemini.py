@@ -0,0 +1,211 @@
+# src/async_gemini.py
+# Bounded-concurrency Gemini fan-out used for batch requests.
+
+import asyncio
+import json
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+Transport = Callable[[str], Awaitable[str]]
+
+
+class TransportError(Exception):
+    """Raised by a transport when a Gemini request fails."""
+
+    def __init__(self, status: Optional[int], message: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"Gemini request failed ({status}): {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        # status None means the request never got an HTTP answer (timeout, reset, DNS)
+        return self.status is None or self.status in RETRYABLE_STATUS
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a `Retry-After` header, which is either a number of
+    seconds or an HTTP-date (RFC 9110). None if absent or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Client-side token bucket refilled continuously at `rate_per_minute`.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        # Check-and-take has no await in between, so it is atomic on the event loop
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Combined requests-per-minute and tokens-per-minute limiter."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+
+class GeminiRestTransport:
+    """
+    Calls the Gemini `generateContent` REST endpoint.
+
+    `base_url` can point at a local fake server for testing.
+    """
+
+    def __init__(self, api_key: str, model_name: str, base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 60.0):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    async def __call__(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._post, prompt)
+
+    def _post(self, prompt: str) -> str:
+        # Key in a header, not the query string, so it stays out of proxy and error logs
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:generateContent"
+        body = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+        request = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                payload = json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            raise TransportError(e.code, e.read().decode("utf-8", "replace"), parse_retry_after(retry_after)) from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise TransportError(None, str(e)) from e
+
+        parts = payload["candidates"][0]["content"]["parts"]
+        return "".join(part.get("text", "") for part in parts)
+
+
+class AsyncGeminiRunner:
+    """
+    Fans prompts out to a transport with bounded concurrency,
+    client-side rate limiting and jittered retries on 429/5xx.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        concurrency: int = 8,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 1_000_000,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0
+    ):
+        """
+        Args:
+            transport: Async callable taking a prompt and returning the response text.
+            concurrency (int): Maximum requests in flight.
+            requests_per_minute (float): Client-side request budget.
+            tokens_per_minute (float): Client-side prompt token budget.
+            max_retries (int): Retries per prompt on retryable errors.
+            base_delay (float): Base backoff in seconds.
+            max_delay (float): Backoff ceiling in seconds.
+        """
+        self.transport = transport
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt: int, error: TransportError) -> float:
+        if error.retry_after is not None:
+            return min(self.max_delay, error.retry_after) + random.uniform(0, self.base_delay)
+        # Full jitter keeps a burst of failed requests from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def generate(self, prompt: str) -> str:
+        """Send a single prompt, retrying retryable failures."""
+        attempt = 0
+        while True:
+            await self.limiter.acquire(estimate_tokens(prompt))
+            try:
+                return await self.transport(prompt)
+            except TransportError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("Gemini request failed with %s, retrying in %.2fs", e.status, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def generate_many(self, prompts: List[str]) -> List[str]:
+        """
+        Generate all prompts concurrently and return results in input order.
+        If one prompt fails, the requests still in flight are cancelled and
+        its error is raised.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(prompt: str) -> str:
+            async with semaphore:
+                return await self.generate(prompt)
+
+        tasks = [asyncio.ensure_future(bounded(p)) for p in prompts]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
@@ -0,0 +1,50 @@
+# src/batching.py
+# Helpers for grouping prompts into padded generation batches.
+
+from typing import List, Sequence
+
+
+def bucket_by_length(
+    lengths: Sequence[int],
+    batch_size: int = 8,
+    max_padded_tokens: int = 4096
+) -> List[List[int]]:
+    """
+    Group item indices into buckets of similar length.
+
+    Items are sorted by length so each bucket pads to a length close to
+    its members. A bucket is closed when it reaches `batch_size` items or
+    when adding the next item would push `len(bucket) * longest` past
+    `max_padded_tokens`. An item longer than the token budget still gets
+    a bucket of its own.
+
+    Args:
+        lengths (Sequence[int]): Token length of each item.
+        batch_size (int): Maximum number of items per bucket.
+        max_padded_tokens (int): Maximum padded tokens per bucket.
+
+    Returns:
+        List[List[int]]: Buckets of indices into `lengths`.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+
+    for idx in order:
+        candidate_longest = max(longest, lengths[idx])
+        too_many = len(current) >= batch_size
+        too_wide = current and (len(current) + 1) * candidate_longest > max_padded_tokens
+        if too_many or too_wide:
+            buckets.append(current)
+            current, longest = [], 0
+            candidate_longest = lengths[idx]
+        current.append(idx)
+        longest = candidate_longest
+
+    if current:
+        buckets.append(current)
+    return buckets
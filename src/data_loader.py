@@ -1,21 +1,131 @@
 # src/data_loader.py
 
-import pandas as pd
+import hashlib
+import json
+import os
 from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+# Low-cardinality columns are held as pandas categoricals once loaded
+CATEGORICAL_COLUMNS = ["County", "Health level", "Nursing Competency", "Clinical Panel"]
+COLUMN_DTYPES = {
+    "Master_Index": "string",
+    "Prompt": "string",
+    "Clinician": "string",
+    "Years of Experience": "float32",
+    # Categoricals are read as strings and converted after loading, so chunks
+    # with different category sets still share one Arrow schema.
+    **{col: "string" for col in CATEGORICAL_COLUMNS},
+}
+
 
 class ClinicalDataLoader:
     """
     Loads and preprocesses clinical prompt dataset.
+
+    The CSV can be streamed in chunks. The first full pass also writes an
+    uncompressed Arrow IPC cache next to the data. Later loads memory-map
+    that cache instead of re-parsing the CSV, as long as the source file's
+    size and modification time are unchanged.
     """
 
-    def __init__(self, csv_path: str):
-        self.csv_path = Path("clinical_prompts.csv")
+    def __init__(self, csv_path: str, chunksize: int = 50_000, cache_dir: Optional[str] = None):
+        """
+        Args:
+            csv_path (str): Path to the source CSV.
+            chunksize (int): Rows per chunk when streaming.
+            cache_dir (str): Arrow cache directory. Defaults to env DATA_CACHE_DIR or 'cache/data'.
+        """
+        self.csv_path = Path(csv_path)
+        self.chunksize = chunksize
+        self.cache_dir = Path(cache_dir or os.getenv("DATA_CACHE_DIR", "cache/data"))
+        digest = hashlib.sha256(str(self.csv_path.resolve()).encode("utf-8")).hexdigest()[:12]
+        self.cache_path = self.cache_dir / f"{self.csv_path.stem}-{digest}.arrow"
+        self.meta_path = self.cache_path.with_suffix(".json")
 
-    def load_data(self) -> pd.DataFrame:
+    def _source_signature(self) -> Dict[str, int]:
+        stat = self.csv_path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def cache_is_fresh(self) -> bool:
+        if not self.cache_path.exists() or not self.meta_path.exists():
+            return False
+        try:
+            return json.loads(self.meta_path.read_text()) == self._source_signature()
+        except (json.JSONDecodeError, OSError):
+            return False
+
+    @staticmethod
+    def _finalize(df: pd.DataFrame) -> pd.DataFrame:
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+        return df
+
+    def _csv_dtypes(self) -> Dict[str, str]:
+        # Other columns (GPT4.0, LLAMA, DDX SNOMED, ...) are read as strings, so a chunk
+        # where one is all empty keeps the same Arrow schema as the rest
+        header = pd.read_csv(self.csv_path, nrows=0).columns
+        return {col: COLUMN_DTYPES.get(col, "string") for col in header}
+
+    def iter_chunks(self, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yield the dataset as DataFrames of at most `chunksize` rows.
+
+        Reads from the Arrow cache when it is fresh. Otherwise parses the
+        CSV and writes the cache as a side effect. The cache only becomes
+        visible after the whole file has been read.
+        """
         if not self.csv_path.exists():
             raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
+        chunksize = chunksize or self.chunksize
+
+        if self.cache_is_fresh():
+            with pa.memory_map(str(self.cache_path)) as source:
+                # Slices of the memory-mapped table span record batches, so chunk
+                # boundaries depend on `chunksize` only, not on how the cache was written
+                table = pa.ipc.open_file(source).read_all()
+                for start in range(0, table.num_rows, chunksize):
+                    yield self._finalize(table.slice(start, chunksize).to_pandas())
+            return
 
-        df = pd.read_csv(self.csv_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f".tmp-{os.getpid()}")
+        writer = None
+        try:
+            for chunk in pd.read_csv(self.csv_path, chunksize=chunksize, dtype=self._csv_dtypes()):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pa.ipc.new_file(str(tmp_path), table.schema)
+                writer.write_table(table)
+                yield self._finalize(chunk)
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.replace(tmp_path, self.cache_path)
+                self.meta_path.write_text(json.dumps(self._source_signature()))
+        finally:
+            if writer is not None:
+                writer.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def load_table(self) -> pd.DataFrame:
+        """Load the whole dataset with its original column names."""
+        if self.cache_is_fresh():
+            with pa.memory_map(str(self.cache_path)) as source:
+                table = pa.ipc.open_file(source).read_all()
+            return self._finalize(table.to_pandas())
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return pd.DataFrame(columns=list(self._csv_dtypes()))
+        return self._finalize(pd.concat(chunks, ignore_index=True))
+
+    def load_data(self) -> pd.DataFrame:
+        df = self.load_table()
 
         # Ensure expected columns exist
         expected_cols = {"Prompt", "Clinician"}
@@ -32,7 +142,22 @@ class ClinicalDataLoader:
 
         return df
 
+
+def load_csv_data(csv_path: str) -> pd.DataFrame:
+    """Load a dataset CSV with its original column names (Prompt, Clinician, ...)."""
+    return ClinicalDataLoader(csv_path).load_table()
+
+
+def load_clinical_data(csv_path: str) -> pd.DataFrame:
+    """Load a labelled dataset, keeping only rows with both Prompt and Clinician."""
+    df = load_csv_data(csv_path)
+    missing = {"Prompt", "Clinician"} - set(df.columns)
+    if missing:
+        raise ValueError(f"CSV missing required columns: {sorted(missing)}")
+    return df.dropna(subset=["Prompt", "Clinician"]).reset_index(drop=True)
+
+
 if __name__ == "__main__":
-    loader = ClinicalDataLoader("data/clinical_prompts.csv")
+    loader = ClinicalDataLoader(os.getenv("CLINICAL_CSV", "data/clinical_prompts.csv"))
     data = loader.load_data()
     print(data.head())
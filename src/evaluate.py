@@ -1,27 +1,101 @@
 # src/evaluate.py
 
 import os
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Optional
+
 import pandas as pd
 from datasets import Dataset
 from sklearn.metrics import f1_score, precision_score, recall_score
 from rouge_score import rouge_scorer
 from src.summarizer import SummarizerService
 from src.data_loader import load_csv_data
+from src.results_store import ResultsStore, note_hash, result_key
+
+# Generation workers per backend: remote calls overlap well, a local model does not
+GENERATION_WORKERS = {"gemini": 8, "local": 1, "stub": 4}
+
+# Bump a metric's version when its scoring changes; stored scores at older versions get recomputed
+METRIC_VERSIONS = {"rouge1": 1, "rougeL": 1}
+
+_scorer = None
+
+
+def _init_scorer():
+    global _scorer
+    _scorer = rouge_scorer.RougeScorer(list(METRIC_VERSIONS), use_stemmer=True)
+
+
+def score_summary(gold_summary: str, generated_summary: str, metrics: Optional[list] = None) -> Dict[str, float]:
+    """Score one generated summary on `metrics` (default: all); runs inside the scoring process pool."""
+    if _scorer is None:
+        _init_scorer()
+    rouge_scores = _scorer.score(gold_summary, generated_summary)
+    return {metric: rouge_scores[metric].fmeasure for metric in (metrics or METRIC_VERSIONS)}
+
+
+def _load_checkpoint(checkpoint_path: Path, identity: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Read completed rows from the JSONL checkpoint, ignoring a torn last line
+    and rows written for another mode, model or template (`identity`).
+    """
+    done = {}
+    if not checkpoint_path.exists():
+        return done
+    with open(checkpoint_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if all(record.get(field) == value for field, value in identity.items()):
+                done[record["row_id"]] = record
+    return done
+
 
 def evaluate_model(
     csv_path: str,
     mode: str = "local",
     model_name: str = "distilgpt2",
-    sample_size: int = 50
+    sample_size: int = 50,
+    out_path: str = "evaluation_results.csv",
+    checkpoint_path: Optional[str] = None,
+    generation_workers: Optional[int] = None,
+    scoring_workers: Optional[int] = None,
+    store_dir: Optional[str] = None,
+    token_cache_dir: Optional[str] = None
 ):
     """
     Evaluate model-generated summaries against clinician-written summaries.
 
+    Generation runs on a thread pool sized per backend and ROUGE scoring on
+    a process pool, pipelined so rows are scored as soon as they are
+    generated. Every scored row is appended to a JSONL checkpoint tagged
+    with the mode, model and template, so an interrupted run resumes where
+    it stopped when rerun with the same settings; rows checkpointed under
+    other settings are regenerated. The checkpoint is removed once a run
+    completes.
+
+    With `store_dir`, generations and scores are also kept in a Parquet
+    results store keyed by (note, model, template): summaries already in
+    the store are reused instead of regenerated, and only metrics without
+    a score at their current version are computed. Rows resumed from the
+    checkpoint of an interrupted run are added to the store if missing.
+
     Args:
         csv_path (str): Path to dataset CSV
-        mode (str): "local" or "gemini"
+        mode (str): "local", "gemini" or "stub"
         model_name (str): Hugging Face model name or Gemini model ID
         sample_size (int): Number of samples to evaluate
+        out_path (str): Where to write the per-row results CSV
+        checkpoint_path (str): JSONL checkpoint; defaults to `<out_path>.checkpoint.jsonl`
+        generation_workers (int): Override the per-backend generation pool size
+        scoring_workers (int): Scoring processes; defaults to the CPU count
+        store_dir (str): Optional Parquet results store directory
+        token_cache_dir (str): Optional on-disk token id cache for local mode
     """
     # Load dataset
     df = load_csv_data(csv_path)
@@ -29,37 +103,152 @@ def evaluate_model(
     if sample_size and sample_size < len(df):
         df = df.sample(sample_size, random_state=42)
 
+    id_column = "Master_Index" if "Master_Index" in df.columns else None
+    rows = [
+        (str(row[id_column]) if id_column else str(idx), row["Prompt"], row["Clinician"])
+        for idx, row in df.iterrows()
+    ]
+
     # Initialize summarizer
-    summarizer = SummarizerService(mode=mode, model_name=model_name)
+    summarizer = SummarizerService(mode=mode, model_name=model_name, token_cache_dir=token_cache_dir)
+    identity = {"mode": summarizer.mode, "model": summarizer.model_id, "template_fp": summarizer.template_fp}
 
-    rouge = rouge_scorer.RougeScorer(["rouge1", "rougeL"], use_stemmer=True)
-    results = []
+    checkpoint = Path(checkpoint_path or f"{out_path}.checkpoint.jsonl")
+    done = _load_checkpoint(checkpoint, identity)
+    # A checkpointed row only counts if its note is unchanged
+    pending = [row for row in rows if row[0] not in done or done[row[0]]["prompt"] != row[1]]
 
-    print(f"\nEvaluating {sample_size} samples in {mode.upper()} mode...\n")
+    print(f"\nEvaluating {len(rows)} samples in {mode.upper()} mode "
+          f"({len(rows) - len(pending)} already done, resuming from {checkpoint})...\n")
+
+    store = ResultsStore(store_dir) if store_dir else None
+    run_id = ResultsStore.new_run_id()
+    keys = {row[0]: result_key(row[1], summarizer.model_id, summarizer.template_fp) for row in rows}
+    pending_keys = [keys[row[0]] for row in pending]
+    stored_summaries = store.get_generations(pending_keys) if store else {}
+    stored_scores = store.get_scores(pending_keys, METRIC_VERSIONS) if store else {}
+    new_generations, new_scores = [], []
+
+    def generation_record(row_id, prompt, generated_summary, latency):
+        return {
+            "key": keys[row_id],
+            "note_hash": note_hash(prompt),
+            "row_id": row_id,
+            "model": summarizer.model_id,
+            "template_fp": summarizer.template_fp,
+            "generated_summary": generated_summary,
+            "latency_s": latency
+        }
 
-    for i, row in df.iterrows():
-        prompt = row["Prompt"]
-        gold_summary = row["Clinician"]
+    def score_records(row_id, scores):
+        return [
+            {"key": keys[row_id], "metric": m, "metric_version": METRIC_VERSIONS[m], "value": v}
+            for m, v in scores.items()
+        ]
 
-        generated_summary = summarizer.summarize(prompt)
+    if store:
+        # Rows checkpointed by an interrupted run never reached the store; add them now
+        pending_ids = {row[0] for row in pending}
+        resumed = [row_id for row_id, _, _ in rows if row_id in done and row_id not in pending_ids]
+        resumed_keys = [keys[row_id] for row_id in resumed]
+        have_summaries = store.get_generations(resumed_keys)
+        have_scores = store.get_scores(resumed_keys, METRIC_VERSIONS)
+        for row_id in resumed:
+            record = done[row_id]
+            if keys[row_id] not in have_summaries:
+                new_generations.append(generation_record(
+                    row_id, record["prompt"], record["generated_summary"], record["latency_s"]))
+            new_scores.extend(score_records(row_id, {
+                m: record[m] for m in METRIC_VERSIONS if m in record and (keys[row_id], m) not in have_scores
+            }))
 
-        # Compute ROUGE scores
-        rouge_scores = rouge.score(gold_summary, generated_summary)
+    def generate(row):
+        row_id, prompt, gold_summary = row
+        start = time.perf_counter()
+        # Timed generation, not a cache lookup; resuming is the checkpoint's and the store's job
+        generated_summary = summarizer.summarize(prompt, bypass_cache=True)
+        return row_id, prompt, gold_summary, generated_summary, time.perf_counter() - start
 
-        results.append({
+    def record_for(row_id, prompt, gold_summary, generated_summary, latency):
+        return {
+            **identity,
+            "row_id": row_id,
             "prompt": prompt,
             "gold_summary": gold_summary,
             "generated_summary": generated_summary,
-            "rouge1": rouge_scores["rouge1"].fmeasure,
-            "rougeL": rouge_scores["rougeL"].fmeasure
-        })
+            "latency_s": None if latency is None else round(latency, 4)
+        }
+
+    def finish(record, ckpt):
+        done[record["row_id"]] = record
+        ckpt.write(json.dumps(record, ensure_ascii=False) + "\n")
+        ckpt.flush()
+        print(f"Sample {len(done)}/{len(rows)} — ROUGE-L: {record['rougeL']:.3f}")
+
+    gen_workers = generation_workers or GENERATION_WORKERS.get(mode, 1)
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=gen_workers) as gen_pool, \
+            ProcessPoolExecutor(max_workers=scoring_workers, initializer=_init_scorer) as score_pool, \
+            open(checkpoint, "a", encoding="utf-8") as ckpt:
+        generating, scoring = set(), {}
+        for row in pending:
+            key = keys[row[0]]
+            if key not in stored_summaries:
+                generating.add(gen_pool.submit(generate, row))
+                continue
+            # Reuse the stored summary; score only metrics missing at their current version
+            record = record_for(*row, stored_summaries[key], None)
+            missing = [m for m in METRIC_VERSIONS if (key, m) not in stored_scores]
+            record.update({m: stored_scores[(key, m)] for m in METRIC_VERSIONS if m not in missing})
+            if missing:
+                scoring[score_pool.submit(score_summary, row[2], record["generated_summary"], missing)] = record
+            else:
+                finish(record, ckpt)
+
+        while generating or scoring:
+            finished, _ = wait(set(generating) | set(scoring), return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in generating:
+                    generating.discard(future)
+                    row_id, prompt, gold_summary, generated_summary, latency = future.result()
+                    score_future = score_pool.submit(score_summary, gold_summary, generated_summary)
+                    scoring[score_future] = record_for(row_id, prompt, gold_summary, generated_summary, latency)
+                    if store:
+                        new_generations.append(generation_record(row_id, prompt, generated_summary, latency))
+                else:
+                    record = scoring.pop(future)
+                    scores = future.result()
+                    record.update(scores)
+                    if store:
+                        new_scores.extend(score_records(record["row_id"], scores))
+                    finish(record, ckpt)
+
+    elapsed = time.perf_counter() - started
+
+    if store:
+        store.append_generations(new_generations, run_id)
+        store.append_scores(new_scores, run_id)
 
-        print(f"Sample {len(results)}/{sample_size} — ROUGE-L: {rouge_scores['rougeL'].fmeasure:.3f}")
+    # Save results to CSV in dataset order
+    results = pd.DataFrame([done[row_id] for row_id, _, _ in rows])
+    results.to_csv(out_path, index=False)
+    # Everything is in the CSV (and the store); a later run starts fresh
+    checkpoint.unlink(missing_ok=True)
 
-    # Save results to CSV
-    out_path = "evaluation_results.csv"
-    pd.DataFrame(results).to_csv(out_path, index=False)
+    metrics = {
+        "samples": len(rows),
+        "generated_this_run": sum(1 for key in pending_keys if key not in stored_summaries),
+        "wall_seconds": round(elapsed, 2),
+        "throughput_rows_per_s": round(len(pending) / elapsed, 3) if pending and elapsed > 0 else None,
+        "mean_latency_s": round(results["latency_s"].mean(), 4),
+        "p95_latency_s": round(results["latency_s"].quantile(0.95), 4),
+        "rouge1": round(results["rouge1"].mean(), 4),
+        "rougeL": round(results["rougeL"].mean(), 4)
+    }
     print(f"\n✅ Evaluation complete. Results saved to {out_path}")
+    print(json.dumps(metrics, indent=2))
+    return metrics
 
 
 if __name__ == "__main__":
@@ -67,9 +256,15 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Evaluate medical summarization model.")
     parser.add_argument("--csv", required=True, help="Path to CSV dataset")
-    parser.add_argument("--mode", choices=["local", "gemini"], default="local")
+    parser.add_argument("--mode", choices=["local", "gemini", "stub"], default="local")
     parser.add_argument("--model", default=os.getenv("LOCAL_MODEL_PATH", "distilgpt2"))
     parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--out", default="evaluation_results.csv")
+    parser.add_argument("--checkpoint", help="JSONL checkpoint path (default: <out>.checkpoint.jsonl)")
+    parser.add_argument("--generation-workers", type=int)
+    parser.add_argument("--scoring-workers", type=int)
+    parser.add_argument("--store", help="Parquet results store directory for incremental re-runs")
+    parser.add_argument("--token-cache", help="Token id cache directory shared with finetune.py (local mode)")
 
     args = parser.parse_args()
 
@@ -77,5 +272,11 @@ if __name__ == "__main__":
         csv_path=args.csv,
         mode=args.mode,
         model_name=args.model,
-        sample_size=args.samples
+        sample_size=args.samples,
+        out_path=args.out,
+        checkpoint_path=args.checkpoint,
+        generation_workers=args.generation_workers,
+        scoring_workers=args.scoring_workers,
+        store_dir=args.store,
+        token_cache_dir=args.token_cache
     )
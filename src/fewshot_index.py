@@ -0,0 +1,222 @@
+# src/fewshot_index.py
+# Local BM25 index over past (note, clinician summary) pairs, used to pick the
+# few-shot examples most similar to each incoming note.
+#
+# Each `add` writes a new immutable segment (CSR postings as .npy files plus a
+# JSON term list). Segments are memory-mapped on load and scored with global
+# BM25 statistics, so growing the corpus never rebuilds earlier segments.
+
+import hashlib
+import json
+import os
+import re
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.async_gemini import estimate_tokens
+from src.summary_cache import normalize_note
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or the to was were with "
+    "i am nurse years experience working kenya county".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms without stopwords or the nurse self-introduction boilerplate."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def example_hash(note: str) -> str:
+    return hashlib.sha256(normalize_note(note).encode("utf-8")).hexdigest()
+
+
+class _Segment:
+    def __init__(self, path: Path):
+        self.path = path
+        self.terms: Dict[str, int] = {
+            term: i for i, term in enumerate(json.loads((path / "terms.json").read_text(encoding="utf-8")))
+        }
+        self.indptr = np.load(path / "indptr.npy", mmap_mode="r")
+        self.doc_ids = np.load(path / "doc_ids.npy", mmap_mode="r")
+        self.tfs = np.load(path / "tfs.npy", mmap_mode="r")
+        self.doc_len = np.load(path / "doc_len.npy", mmap_mode="r")
+        self.examples = [
+            json.loads(line) for line in (path / "examples.jsonl").read_text(encoding="utf-8").splitlines()
+        ]
+
+    def df(self, term: str) -> int:
+        idx = self.terms.get(term)
+        return 0 if idx is None else int(self.indptr[idx + 1] - self.indptr[idx])
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        idx = self.terms.get(term)
+        if idx is None:
+            return self.doc_ids[:0], self.tfs[:0]
+        start, end = self.indptr[idx], self.indptr[idx + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+
+class FewShotIndex:
+    """
+    BM25 retrieval of few-shot examples.
+
+    `add` only indexes notes whose normalized text is not in the index yet,
+    so re-running it over a grown dataset costs one new segment.
+    """
+
+    def __init__(self, root: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.root = Path(root or os.getenv("FEWSHOT_INDEX_DIR", "cache/fewshot"))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._load()
+
+    def _load(self):
+        manifest = self.root / "index.json"
+        names = json.loads(manifest.read_text(encoding="utf-8"))["segments"] if manifest.exists() else []
+        self.segments = [_Segment(self.root / name) for name in names]
+        self.hashes = {ex["hash"] for seg in self.segments for ex in seg.examples}
+        self.num_docs = sum(len(seg.examples) for seg in self.segments)
+        total_len = sum(float(seg.doc_len.sum()) for seg in self.segments)
+        self.avgdl = total_len / self.num_docs if self.num_docs else 0.0
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def fingerprint(self) -> str:
+        """Short, stable id of the indexed segments; changes whenever `add` indexes something."""
+        names = "\x1f".join(seg.path.name for seg in self.segments)
+        return hashlib.sha256(names.encode("utf-8")).hexdigest()[:16]
+
+    def add(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Index new (note, summary) pairs as one segment; returns how many were new."""
+        examples, seen = [], set()
+        for note, summary in pairs:
+            if not note or not summary:
+                continue
+            h = example_hash(note)
+            if h in self.hashes or h in seen:
+                continue
+            seen.add(h)
+            examples.append({"hash": h, "note": note, "summary": summary,
+                             "tokens": estimate_tokens(note) + estimate_tokens(summary)})
+        if not examples:
+            return 0
+
+        counts = [Counter(tokenize(ex["note"])) for ex in examples]
+        terms = sorted({term for c in counts for term in c})
+        term_idx = {term: i for i, term in enumerate(terms)}
+        postings: List[List[Tuple[int, int]]] = [[] for _ in terms]
+        for doc, c in enumerate(counts):
+            for term, tf in c.items():
+                postings[term_idx[term]].append((doc, tf))
+
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(indptr[-1]))
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(indptr[-1]))
+        doc_len = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        tmp = self.root / f".{name}.tmp"
+        tmp.mkdir()
+        np.save(tmp / "indptr.npy", indptr)
+        np.save(tmp / "doc_ids.npy", doc_ids)
+        np.save(tmp / "tfs.npy", tfs)
+        np.save(tmp / "doc_len.npy", doc_len)
+        (tmp / "terms.json").write_text(json.dumps(terms), encoding="utf-8")
+        (tmp / "examples.jsonl").write_text(
+            "".join(json.dumps(ex, ensure_ascii=False) + "\n" for ex in examples), encoding="utf-8"
+        )
+        os.replace(tmp, self.root / name)
+
+        # The manifest is swapped in last, so readers never see a half-written segment
+        names = [seg.path.name for seg in self.segments] + [name]
+        manifest_tmp = self.root / "index.json.tmp"
+        manifest_tmp.write_text(json.dumps({"segments": names}), encoding="utf-8")
+        os.replace(manifest_tmp, self.root / "index.json")
+        self._load()
+        return len(examples)
+
+    def search(self, note: str, k: int = 5, exclude_self: bool = True) -> List[dict]:
+        """Top-`k` examples by BM25 score against `note`, best first."""
+        query = set(tokenize(note))
+        if not query or not self.num_docs:
+            return []
+        own_hash = example_hash(note) if exclude_self else None
+
+        idf = {}
+        for term in query:
+            df = sum(seg.df(term) for seg in self.segments)
+            if df:
+                idf[term] = np.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for seg in self.segments:
+            scores = np.zeros(len(seg.examples), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * np.asarray(seg.doc_len) / self.avgdl)
+            for term, weight in idf.items():
+                docs, tfs = seg.postings(term)
+                if len(docs):
+                    scores[docs] += weight * tfs * (self.k1 + 1) / (tfs + norm[docs])
+            # k + 1 so the note itself can be dropped without losing a slot
+            n = min(k + 1, len(scores))
+            top = np.argpartition(-scores, n - 1)[:n]
+            candidates.extend(
+                (float(scores[i]), seg.examples[i]) for i in top
+                if scores[i] > 0 and seg.examples[i]["hash"] != own_hash
+            )
+
+        candidates.sort(key=lambda item: -item[0])
+        return [dict(ex, score=round(score, 4)) for score, ex in candidates[:k]]
+
+    def select(self, note: str, k: int = 3, token_budget: int = 1500) -> List[dict]:
+        """
+        The most similar examples that together fit in `token_budget`
+        (estimated) tokens, at most `k` of them.
+        """
+        chosen, used = [], 0
+        for example in self.search(note, k=k * 3):
+            if len(chosen) == k:
+                break
+            if used + example["tokens"] <= token_budget:
+                chosen.append(example)
+                used += example["tokens"]
+        return chosen
+
+
+def build_from_csv(csv_path: str, root: Optional[str] = None) -> FewShotIndex:
+    """Index every labelled (Prompt, Clinician) row of a dataset CSV not indexed yet."""
+    from src.data_loader import ClinicalDataLoader
+
+    index = FewShotIndex(root)
+    added = 0
+    for chunk in ClinicalDataLoader(csv_path).iter_chunks():
+        chunk = chunk.dropna(subset=["Prompt", "Clinician"])
+        added += index.add(zip(chunk["Prompt"], chunk["Clinician"]))
+    print(f"✅ Few-shot index at {index.root}: {len(index)} examples ({added} new)")
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the few-shot example index.")
+    parser.add_argument("--index", help="Index directory (default: env FEWSHOT_INDEX_DIR or cache/fewshot)")
+    parser.add_argument("--csv", help="Labelled CSV to (incrementally) index")
+    parser.add_argument("--query", help="Show the examples selected for this note")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=1500, help="Token budget for selected examples")
+    args = parser.parse_args()
+
+    if args.csv:
+        build_from_csv(args.csv, args.index)
+    if args.query:
+        for example in FewShotIndex(args.index).select(args.query, k=args.k, token_budget=args.budget):
+            print(f"[{example['score']}] ({example['tokens']} tokens) {example['note'][:120]}")
@@ -1,41 +1,111 @@
 import os
+import time
 import argparse
 import pandas as pd
 from datasets import Dataset
-from transformers import T5Tokenizer, T5ForConditionalGeneration, Trainer, TrainingArguments
+from transformers import (
+    DataCollatorForSeq2Seq,
+    T5Tokenizer,
+    T5ForConditionalGeneration,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments
+)
 import google.generativeai as genai
 
 from data_loader import load_clinical_data
+from token_cache import TokenCache
 
-def fine_tune_local(data_path, model_dir="models/t5_finetuned"):
+
+class PaddingStatsCollator:
+    """Wraps a collator and counts real vs. padded token slots in every batch it builds."""
+
+    def __init__(self, collator, label_pad_token_id=-100):
+        self.collator = collator
+        self.label_pad_token_id = label_pad_token_id
+        self.real_tokens = 0
+        self.total_slots = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        attention = batch["attention_mask"]
+        labels = batch["labels"]
+        self.real_tokens += int(attention.sum()) + int((labels != self.label_pad_token_id).sum())
+        self.total_slots += attention.numel() + labels.numel()
+        return batch
+
+    @property
+    def padding_ratio(self):
+        return 1 - self.real_tokens / self.total_slots if self.total_slots else 0.0
+
+
+class ThroughputCallback(TrainerCallback):
+    """Reports non-pad tokens/sec and the padding ratio at every logging step."""
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.started = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+
+    def _report(self):
+        elapsed = time.perf_counter() - self.started
+        tokens_per_sec = self.collator.real_tokens / elapsed if elapsed > 0 else 0.0
+        return tokens_per_sec, self.collator.padding_ratio
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        tokens_per_sec, padding_ratio = self._report()
+        if logs is not None:
+            logs["tokens_per_sec"] = round(tokens_per_sec, 1)
+            logs["padding_ratio"] = round(padding_ratio, 4)
+        print(f"[INFO] step {state.global_step}: {tokens_per_sec:.1f} tokens/sec, padding ratio {padding_ratio:.2%}")
+
+    def on_train_end(self, args, state, control, **kwargs):
+        tokens_per_sec, padding_ratio = self._report()
+        print(f"[INFO] Training throughput: {tokens_per_sec:.1f} tokens/sec, padding ratio {padding_ratio:.2%}")
+
+
+def fine_tune_local(data_path, model_dir="models/t5_finetuned", batch_size=8, gradient_accumulation_steps=4,
+                    num_train_epochs=1, token_cache_dir=None):
     print("[INFO] Starting local fine-tuning with Hugging Face...")
     
     # Load data
     df = load_clinical_data(data_path)
 
-    # Hugging Face dataset
-    dataset = Dataset.from_pandas(df.rename(columns={"Prompt": "input_text", "Clinician": "target_text"}))
-
     # Tokenizer & model
     tokenizer = T5Tokenizer.from_pretrained("t5-small")
     model = T5ForConditionalGeneration.from_pretrained("t5-small")
 
-    def preprocess(batch):
-        inputs = ["summarize: " + text for text in batch["input_text"]]
-        model_inputs = tokenizer(inputs, max_length=512, truncation=True, padding="max_length")
-
-        labels = tokenizer(batch["target_text"], max_length=128, truncation=True, padding="max_length")
-        model_inputs["labels"] = labels["input_ids"]
-        return model_inputs
-
-    tokenized_dataset = dataset.map(preprocess, batched=True, remove_columns=["input_text", "target_text"])
+    # Token ids come from the on-disk cache; only rows not seen before are tokenized.
+    # No padding here: the collator pads each batch to its own longest example
+    token_cache = TokenCache(tokenizer, prefix="summarize: ", max_length=512, label_max_length=128,
+                             root=token_cache_dir)
+    encoded = token_cache.encode(df["Prompt"].tolist(), df["Clinician"].tolist())
+    token_cache.flush()
+    print(f"[INFO] Token cache: {token_cache.stats()}")
+
+    tokenized_dataset = Dataset.from_dict({
+        "input_ids": encoded["input_ids"],
+        "attention_mask": [[1] * len(ids) for ids in encoded["input_ids"]],
+        "labels": encoded["labels"],
+        "length": [len(ids) for ids in encoded["input_ids"]]
+    })
+
+    # Label padding is -100 so the loss ignores it
+    collator = PaddingStatsCollator(
+        DataCollatorForSeq2Seq(tokenizer, model=model, label_pad_token_id=-100)
+    )
 
     # Training setup
     training_args = TrainingArguments(
         output_dir=model_dir,
         eval_strategy="no",
-        per_device_train_batch_size=2,
-        num_train_epochs=1,
+        per_device_train_batch_size=batch_size,
+        gradient_accumulation_steps=gradient_accumulation_steps,
+        group_by_length=True,
+        length_column_name="length",
+        num_train_epochs=num_train_epochs,
         save_strategy="epoch",
         logging_dir="./logs",
         logging_steps=5
@@ -44,7 +114,9 @@ def fine_tune_local(data_path, model_dir="models/t5_finetuned"):
     trainer = Trainer(
         model=model,
         args=training_args,
-        train_dataset=tokenized_dataset
+        train_dataset=tokenized_dataset,
+        data_collator=collator,
+        callbacks=[ThroughputCallback(collator)]
     )
 
     trainer.train()
@@ -80,9 +152,21 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fine-tune summarization model.")
     parser.add_argument("--mode", choices=["local", "gemini"], required=True, help="Fine-tuning mode.")
     parser.add_argument("--data", default="data/clinical_prompt.csv", help="Path to dataset.")
+    parser.add_argument("--model-dir", default="models/t5_finetuned")
+    parser.add_argument("--batch-size", type=int, default=8, help="Per-device batch size.")
+    parser.add_argument("--grad-accum", type=int, default=4, help="Gradient accumulation steps.")
+    parser.add_argument("--epochs", type=float, default=1)
+    parser.add_argument("--token-cache", help="Tokenization cache directory (default: env TOKEN_CACHE_DIR or cache/tokens).")
     args = parser.parse_args()
 
     if args.mode == "local":
-        fine_tune_local(args.data)
+        fine_tune_local(
+            args.data,
+            model_dir=args.model_dir,
+            batch_size=args.batch_size,
+            gradient_accumulation_steps=args.grad_accum,
+            num_train_epochs=args.epochs,
+            token_cache_dir=args.token_cache
+        )
     elif args.mode == "gemini":
         fine_tune_gemini(args.data)
@@ -1,8 +1,18 @@
 import os
+import json
 import logging
-from typing import Dict, Any, Optional
+import queue
+import threading
+import time
+import http.client
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Optional
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
+from src.async_gemini import DEFAULT_BASE_URL, TransportError, parse_retry_after
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -21,42 +31,350 @@ if genai and API_KEY:
     except Exception as e:
         logger.warning("Could not configure google.generativeai: %s", e)
 
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Gemini circuit is open; retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and fails
+    calls fast for `reset_timeout` seconds. Then one probe call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = self.clock() - self.opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_neutral(self):
+        """End a call that says nothing about upstream health (a client error) without changing state."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+
+
+class PooledRestTransport:
+    """
+    Blocking client for the Gemini `generateContent` REST endpoint over a
+    pool of keep-alive `http.client` connections, so repeated calls skip
+    the TCP/TLS handshake. `base_url` can point at a local fake server.
+    """
+
+    def __init__(self, api_key: str, model_name: str, base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 60.0, pool_size: int = 8):
+        parts = urlsplit(base_url)
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path_prefix = parts.path.rstrip("/")
+        # LIFO keeps the most recently used (least likely to be stale) connections warm
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+        self.connections_opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _checkin(self, conn: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def __call__(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.0) -> str:
+        path = f"{self._path_prefix}/v1beta/models/{self.model_name}:generateContent"
+        body = json.dumps({
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"maxOutputTokens": max_output_tokens, "temperature": temperature},
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+
+        conn, reused = self._checkout()
+        try:
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = self._connect()
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise TransportError(None, str(e)) from e
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+        if response.status != 200:
+            retry_after = response.getheader("Retry-After")
+            raise TransportError(
+                response.status,
+                data.decode("utf-8", "replace"),
+                parse_retry_after(retry_after)
+            )
+        payload = json.loads(data.decode("utf-8"))
+        parts = payload["candidates"][0]["content"]["parts"]
+        return "".join(part.get("text", "") for part in parts)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _response_text(resp) -> str:
+    """Text out of the response shapes the different SDK entry points return."""
+    if hasattr(resp, "text"):
+        return resp.text
+    if hasattr(resp, "output"):
+        pieces = []
+        for o in getattr(resp, "output"):
+            if isinstance(o, dict) and "content" in o:
+                for c in o["content"]:
+                    pieces.append(c.get("text", ""))
+            elif hasattr(o, "text"):
+                pieces.append(o.text)
+        return "\n".join(pieces)
+    if hasattr(resp, "answer"):
+        return resp.answer
+    return str(resp)
+
+
 class GeminiClient:
-    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
+    """
+    Gemini text generation through one call path chosen at construction:
+    the pooled REST transport ("rest"), or the installed SDK's
+    `GenerativeModel.generate_content`, `generate` or `responses.create`.
+
+    Calls go through a circuit breaker and, with `hedge=True`, a duplicate
+    request is sent when the first has not answered within the recent p95
+    latency; whichever finishes first wins. Hedges are capped at
+    `hedge_budget` of all calls so a slow upstream is not doubled.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_name: Optional[str] = None,
+        transport: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: float = 60.0,
+        pool_size: int = 8,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: Optional[bool] = None,
+        hedge_delay: float = 2.0,
+        hedge_budget: float = 0.1,
+        min_samples: int = 20
+    ):
+        """
+        Args:
+            transport (str): "rest" or "sdk". Defaults to env GEMINI_TRANSPORT, else the SDK when installed.
+            base_url (str): REST endpoint root. Defaults to env GEMINI_BASE_URL or the public API.
+            breaker (CircuitBreaker): Defaults to 5 consecutive failures / 30 s.
+            hedge (bool): Send hedged requests. Defaults to env GEMINI_HEDGE=1.
+            hedge_delay (float): Hedge delay (s) until `min_samples` latencies give a p95.
+            hedge_budget (float): Maximum fraction of calls that may be hedged.
+        """
         self.api_key = api_key or API_KEY
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not set in environment or passed to GeminiClient")
-        if genai is None:
-            raise RuntimeError("google.generativeai package not installed. Install it or adapt this wrapper.")
         self.model_name = model_name or GEMINI_MODEL
+        transport = (transport or os.getenv("GEMINI_TRANSPORT") or ("sdk" if genai is not None else "rest")).lower()
+        if transport not in ("rest", "sdk"):
+            raise ValueError("transport must be 'rest' or 'sdk'.")
+
+        self.rest = None
+        if transport == "rest":
+            self.rest = PooledRestTransport(
+                self.api_key, self.model_name, base_url or os.getenv("GEMINI_BASE_URL", DEFAULT_BASE_URL),
+                timeout=timeout, pool_size=pool_size
+            )
+            self.call_path = "rest"
+            self._call = self.rest
+        else:
+            if genai is None:
+                raise RuntimeError("google.generativeai package not installed. Install it or use transport='rest'.")
+            self.call_path, self._call = self._resolve_sdk_call()
+
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge if hedge is not None else os.getenv("GEMINI_HEDGE", "0") == "1"
+        self.hedge_delay = hedge_delay
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0}
+        self._executor = ThreadPoolExecutor(max_workers=2 * pool_size, thread_name_prefix="gemini") if self.hedge else None
+
+    def _resolve_sdk_call(self):
+        """Pick the SDK entry point once, so calls never pay for probing a missing method."""
+        if hasattr(genai, "GenerativeModel"):
+            model = genai.GenerativeModel(self.model_name)
+
+            def call(prompt, max_output_tokens, temperature):
+                config = {"max_output_tokens": max_output_tokens, "temperature": temperature}
+                return _response_text(model.generate_content(prompt, generation_config=config))
+            return "generate_content", call
+        if hasattr(genai, "generate"):
+            def call(prompt, max_output_tokens, temperature):
+                return _response_text(genai.generate(model=self.model_name, prompt=prompt,
+                                                     max_output_tokens=max_output_tokens, temperature=temperature))
+            return "generate", call
+        if hasattr(genai, "responses"):
+            def call(prompt, max_output_tokens, temperature):
+                return _response_text(genai.responses.create(model=self.model_name, input=prompt))
+            return "responses", call
+        raise RuntimeError("Installed google.generativeai exposes no known generate entry point; use transport='rest'.")
+
+    def p95_latency(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def _attempt(self, prompt: str, max_output_tokens: int, temperature: float) -> str:
+        """One upstream request, with latency sampling. Breaker outcomes are recorded per call, not per attempt."""
+        start = time.monotonic()
+        text = self._call(prompt, max_output_tokens, temperature)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return text
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._stats["hedges"] + 1 > self.hedge_budget * self._stats["calls"] + 1:
+                return False
+            self._stats["hedges"] += 1
+            return True
+
+    def _hedged(self, prompt: str, max_output_tokens: int, temperature: float) -> str:
+        primary = self._executor.submit(self._attempt, prompt, max_output_tokens, temperature)
+        done, _ = wait([primary], timeout=self.p95_latency() or self.hedge_delay)
+        if done or not self._may_hedge():
+            return primary.result()
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            return primary.result()
+
+        backup = self._executor.submit(self._attempt, prompt, max_output_tokens, temperature)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        with self._lock:
+                            self._stats["hedge_wins"] += 1
+                    # The slower request is left to finish; its connection goes back to the pool
+                    return future.result()
+                error = future.exception()
+        raise error
 
     def call_generate(self, prompt: str, max_output_tokens: int = 512, temperature: float = 0.0) -> str:
-        """Call Gemini to generate text. Adapt if SDK differs in your environment."""
+        """Call Gemini to generate text through the call path resolved at construction."""
         try:
-            try:
-                resp = genai.generate(model=self.model_name, prompt=prompt, max_output_tokens=max_output_tokens, temperature=temperature)
-                if hasattr(resp, "text"):
-                    return resp.text
-                if hasattr(resp, "output"):
-                    pieces = []
-                    for o in getattr(resp, "output"):
-                        if isinstance(o, dict) and "content" in o:
-                            for c in o["content"]:
-                                pieces.append(c.get("text", ""))
-                        elif hasattr(o, "text"):
-                            pieces.append(o.text)
-                    return "\n".join(pieces)
-                return str(resp)
-            except Exception:
-                resp = genai.responses.create(model=self.model_name, input=prompt)
-                if hasattr(resp, "output"):
-                    return getattr(resp, "output")[0].get("content")[0].get("text", "")
-                if hasattr(resp, "answer"):
-                    return resp.answer
-                return str(resp)
+            self.breaker.allow()
+        except CircuitOpenError:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise
+        with self._lock:
+            self._stats["calls"] += 1
+        try:
+            if self.hedge:
+                text = self._hedged(prompt, max_output_tokens, temperature)
+            else:
+                text = self._attempt(prompt, max_output_tokens, temperature)
         except Exception as e:
+            # One outcome per logical call, however many hedged attempts it made.
+            # Client errors (bad request, auth) are neither upstream failures nor successes.
+            if isinstance(e, TransportError) and not e.retryable:
+                self.breaker.record_neutral()
+            else:
+                self.breaker.record_failure()
+            with self._lock:
+                self._stats["failures"] += 1
             logger.exception("Gemini generate failed: %s", e)
             raise
+        self.breaker.record_success()
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        p95 = self.p95_latency()
+        stats.update(
+            call_path=self.call_path,
+            breaker=self.breaker.state,
+            p95_latency_s=round(p95, 4) if p95 is not None else None,
+            connections_opened=self.rest.connections_opened if self.rest is not None else None,
+        )
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.rest is not None:
+            self.rest.close()
 
     def attempt_finetune(self, training_file_path: str, **kwargs) -> Dict[str, Any]:
         """
@@ -0,0 +1,425 @@
+# src/jobs.py
+# Bulk summarization jobs. An uploaded CSV or NDJSON file (Data/test.csv
+# schema) becomes a job whose rows are stored in SQLite; background workers
+# claim rows in batches, summarize them and write the results back, so jobs
+# survive restarts and can be polled and downloaded while they run.
+#
+# Rows are claimed with a lease. A claim held by a process that has died
+# (same host, pid gone) or that outlived the lease is handed out again, so
+# several API workers can share one job database.
+
+import csv
+import io
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+from typing import BinaryIO, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMN = "Master_Index"
+PROMPT_COLUMN = "Prompt"
+RESULT_COLUMNS = (ID_COLUMN, "Clinician")
+
+# Throughput is measured over recently finished rows, so it reflects the current rate after a restart
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+def parse_upload(stream: BinaryIO, filename: str = "", content_type: str = "") -> Iterator[Tuple[str, str]]:
+    """
+    Yield (Master_Index, Prompt) pairs from an uploaded CSV or NDJSON file,
+    chosen by extension or content type (CSV by default). Other columns are
+    ignored; a missing column or malformed line raises ValueError.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    is_ndjson = filename.lower().endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or "")
+
+    if is_ndjson:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_no} is not valid JSON: {e}") from None
+            if ID_COLUMN not in record or PROMPT_COLUMN not in record:
+                raise ValueError(f"Line {line_no} needs '{ID_COLUMN}' and '{PROMPT_COLUMN}' fields")
+            yield str(record[ID_COLUMN]), str(record[PROMPT_COLUMN] or "")
+        return
+
+    reader = csv.DictReader(text)
+    missing = {ID_COLUMN, PROMPT_COLUMN} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+    for row in reader:
+        yield str(row[ID_COLUMN]), row[PROMPT_COLUMN] or ""
+
+
+# Tells this process apart from an earlier one with the same pid, e.g. pid 1
+# before a container restart
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{BOOT_ID}"
+
+
+def _owner_is_dead(owner: str) -> bool:
+    """
+    True for claims made by an earlier process on this host: one of
+    another boot whose pid is gone or is now this process's. Claims
+    without a boot id predate it.
+    """
+    host, pid, boot = (owner.split(":") + [""])[:3]
+    if host != socket.gethostname() or not pid.isdigit() or boot == BOOT_ID:
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class JobStore:
+    """
+    SQLite store of jobs and their rows.
+
+    `jobs` holds one record per upload; `items` holds the rows in upload
+    order with their summary (or error) once processed and the current
+    claim while a worker is on them.
+    """
+
+    def __init__(self, path: str = "cache/jobs.sqlite3", lease_seconds: float = 600.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " filename TEXT,"
+            " total INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " master_index TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " summary TEXT,"
+            " error TEXT,"
+            " claimed_by TEXT,"
+            " claimed_at REAL,"
+            " finished_at REAL,"
+            " PRIMARY KEY (job_id, seq))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_finished ON items(job_id, finished_at)")
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        return cls(
+            os.getenv("JOBS_DB_PATH", "cache/jobs.sqlite3"),
+            lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", 600))
+        )
+
+    def create(self, rows: Iterable[Tuple[str, str]], filename: Optional[str] = None, chunk: int = 1000) -> Tuple[str, int]:
+        """Store a new job from (Master_Index, Prompt) rows; returns (job id, row count)."""
+        job_id = uuid.uuid4().hex
+        total = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                batch = []
+                for master_index, prompt in rows:
+                    batch.append((job_id, total, master_index, prompt))
+                    total += 1
+                    if len(batch) >= chunk:
+                        self._conn.executemany(
+                            "INSERT INTO items (job_id, seq, master_index, prompt) VALUES (?, ?, ?, ?)", batch)
+                        batch = []
+                if batch:
+                    self._conn.executemany(
+                        "INSERT INTO items (job_id, seq, master_index, prompt) VALUES (?, ?, ?, ?)", batch)
+                if total == 0:
+                    raise ValueError("Upload contains no rows")
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, filename, total, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, filename, total, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id, total
+
+    def claim(self, limit: int, owner: Optional[str] = None) -> Optional[Tuple[str, List[Tuple[int, str]]]]:
+        """
+        Claim up to `limit` unprocessed rows of the oldest active job.
+        Returns (job id, [(seq, prompt), ...]) or None when there is no work.
+        """
+        owner = owner or _owner()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = None
+                jobs = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+                ).fetchall()
+                for (job_id,) in jobs:
+                    rows = self._claimable(job_id, limit, now)
+                    if not rows:
+                        continue
+                    self._conn.executemany(
+                        "UPDATE items SET claimed_by = ?, claimed_at = ? WHERE job_id = ? AND seq = ?",
+                        [(owner, now, job_id, seq) for seq, _ in rows]
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) "
+                        "WHERE id = ? AND status = 'queued'",
+                        (now, job_id)
+                    )
+                    claimed = (job_id, rows)
+                    break
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def _claimable(self, job_id: str, limit: int, now: float) -> List[Tuple[int, str]]:
+        rows = self._conn.execute(
+            "SELECT seq, prompt FROM items WHERE job_id = ? AND finished_at IS NULL"
+            " AND (claimed_by IS NULL OR claimed_at < ?) ORDER BY seq LIMIT ?",
+            (job_id, now - self.lease_seconds, limit)
+        ).fetchall()
+        if len(rows) < limit:
+            # Rows held by a crashed process on this host do not wait for the lease to run out
+            for owner, in self._conn.execute(
+                "SELECT DISTINCT claimed_by FROM items WHERE job_id = ? AND finished_at IS NULL"
+                " AND claimed_by IS NOT NULL AND claimed_at >= ?",
+                (job_id, now - self.lease_seconds)
+            ).fetchall():
+                if _owner_is_dead(owner):
+                    rows += self._conn.execute(
+                        "SELECT seq, prompt FROM items WHERE job_id = ? AND finished_at IS NULL"
+                        " AND claimed_by = ? ORDER BY seq LIMIT ?",
+                        (job_id, owner, limit - len(rows))
+                    ).fetchall()
+        return rows[:limit]
+
+    def complete(self, job_id: str, results: List[Tuple[int, Optional[str], Optional[str]]]):
+        """Record (seq, summary, error) results and finish the job when no rows are left."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE items SET summary = ?, error = ?, finished_at = ?, claimed_by = NULL"
+                    " WHERE job_id = ? AND seq = ?",
+                    [(summary, error, now, job_id, seq) for seq, summary, error in results]
+                )
+                left = self._conn.execute(
+                    "SELECT COUNT(*) FROM items WHERE job_id = ? AND finished_at IS NULL", (job_id,)
+                ).fetchone()[0]
+                if left == 0:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ? AND status = 'running'",
+                        (now, job_id)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop handing out the job's rows; rows already claimed still finish."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status with row counts, throughput (rows/s) and ETA (s)."""
+        now = time.time()
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT status, filename, total, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            completed, failed = self._conn.execute(
+                "SELECT COUNT(summary), COUNT(error) FROM items WHERE job_id = ? AND finished_at IS NOT NULL",
+                (job_id,)
+            ).fetchone()
+            recent = self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE job_id = ? AND finished_at >= ?",
+                (job_id, now - THROUGHPUT_WINDOW_SECONDS)
+            ).fetchone()[0]
+
+        status, filename, total, created_at, started_at, finished_at = job
+        processed = completed + failed
+        throughput = None
+        if started_at is not None and status == "running" and recent:
+            throughput = recent / max(1e-6, min(THROUGHPUT_WINDOW_SECONDS, now - started_at))
+        elif started_at is not None and processed:
+            throughput = processed / max(1e-6, (finished_at or now) - started_at)
+        pending = total - processed
+        eta = None
+        if status in ("queued", "running"):
+            eta = round(pending / throughput, 1) if throughput else None
+        elif status == "done":
+            eta = 0.0
+        return {
+            "job_id": job_id,
+            "status": status,
+            "filename": filename,
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "pending": pending,
+            "progress": round(processed / total, 4) if total else 1.0,
+            "throughput_rows_per_s": round(throughput, 3) if throughput else None,
+            "eta_seconds": eta,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def iter_results(self, job_id: str, page: int = 1000) -> Iterator[Tuple[str, str]]:
+        """(Master_Index, summary) for processed rows in upload order; failed rows give an empty summary."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, master_index, summary FROM items WHERE job_id = ? AND seq > ?"
+                    " AND finished_at IS NOT NULL ORDER BY seq LIMIT ?",
+                    (job_id, last, page)
+                ).fetchall()
+            if not rows:
+                return
+            for seq, master_index, summary in rows:
+                yield master_index, summary or ""
+            last = rows[-1][0]
+
+
+def results_csv(rows: Iterable[Tuple[str, str]]) -> Iterator[str]:
+    """Encode (Master_Index, Clinician) rows as CSV text, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RESULT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class JobRunner:
+    """
+    Background threads that claim rows from a JobStore and summarize them
+    with `service.batch_summarize` (cache-aware, length-bucketed in local
+    mode). If a batch fails, its rows are retried one by one so a single
+    bad note only fails itself.
+
+    `slot` (e.g. `AdmissionController.thread_slot`) is entered around each
+    batch, so bulk jobs count against the same generation limit as
+    interactive requests instead of competing with them for the model.
+    """
+
+    def __init__(self, store: JobStore, service, workers: int = 1, batch_size: int = 16,
+                 poll_interval: float = 1.0, slot: Optional[Callable[[], ContextManager]] = None):
+        self.store = store
+        self.service = service
+        self.slot = slot or nullcontext
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def from_env(cls, store: JobStore, service, slot: Optional[Callable[[], ContextManager]] = None) -> "JobRunner":
+        return cls(
+            store,
+            service,
+            workers=int(os.getenv("JOB_WORKERS", 1)),
+            batch_size=int(os.getenv("JOB_BATCH_SIZE", 16)),
+            slot=slot
+        )
+
+    def start(self) -> "JobRunner":
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wake(self):
+        """Signal that a new job was submitted."""
+        self._wake.set()
+
+    def _summarize(self, prompts: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+        try:
+            return [(summary, None) for summary in self.service.batch_summarize(prompts)]
+        except Exception:
+            logger.exception("Job batch failed; retrying rows one by one")
+        results = []
+        for prompt in prompts:
+            try:
+                results.append((self.service.summarize(prompt), None))
+            except Exception as e:
+                results.append((None, str(e) or type(e).__name__))
+        return results
+
+    def run_once(self) -> bool:
+        """Process one claimed batch; False when there was nothing to do."""
+        # Claimed only once the slot is held, so rows are not leased while waiting for it
+        with self.slot():
+            claimed = self.store.claim(self.batch_size)
+            if claimed is None:
+                return False
+            job_id, rows = claimed
+            outcomes = self._summarize([prompt for _, prompt in rows])
+        self.store.complete(job_id, [(seq, summary, error) for (seq, _), (summary, error) in zip(rows, outcomes)])
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Job worker error")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
@@ -1,17 +1,19 @@
 # src/langchain_pipeline.py
 
+import asyncio
 import os
-from typing import Optional
+import time
+from threading import Thread
+from typing import Iterator, List, Optional
 
-# LangChain imports
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+from src.async_gemini import DEFAULT_BASE_URL, AsyncGeminiRunner, GeminiRestTransport
+from src.batching import bucket_by_length
+from src.metrics import record_tokens, span
+from src.stopping import STOP_MARKERS, trim_at_stop, trim_trailing_header
+from src.streaming import stop_at_markers, strip_prompt_stream
 
-# Gemini imports
-import google.generativeai as genai
-
-# Local model imports
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+# Heavy backends (langchain, google.generativeai, torch, transformers) are imported
+# inside the methods that need them, so only the active mode pays their import cost.
 
 
 class LangChainSummarizer:
@@ -20,15 +22,76 @@ class LangChainSummarizer:
     into a LangChain-based summarization pipeline.
     """
 
-    def __init__(self, mode: str = "gemini", model_name: Optional[str] = None):
+    GEMINI_MODEL = "gemini-pro"
+
+    def __init__(
+        self,
+        mode: str = "gemini",
+        model_name: Optional[str] = None,
+        batch_size: int = 8,
+        max_batch_tokens: int = 4096,
+        backend: str = "torch",
+        token_cache_dir: Optional[str] = None,
+        draft_model_name: Optional[str] = None,
+        prompt_style: str = "concise"
+    ):
         """
         Args:
             mode (str): "gemini" or "local".
             model_name (str): Local model name/path (HF Hub or local dir).
+            batch_size (int): Maximum notes per local `generate` call.
+            max_batch_tokens (int): Maximum padded prompt tokens per local batch.
+            backend (str): Local inference backend: "torch", "onnx" or "onnx-int8".
+            token_cache_dir (str): If set, local prompt token ids are cached on disk here.
+            draft_model_name (str): Small model sharing the tokenizer, used as the draft for
+                assisted decoding. Greedy output is unchanged; torch backend only.
+            prompt_style (str): "concise" (short instruction), "fewshot" (the worked
+                examples and directive of src/prompt_templates.py) or "retrieved" (the
+                examples most similar to each note from the FewShotIndex at env
+                FEWSHOT_INDEX_DIR; FEWSHOT_K examples within FEWSHOT_TOKEN_BUDGET tokens).
         """
         self.mode = mode.lower()
         self.model_name = model_name
         self.llm = None
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.backend = backend.lower()
+        self.token_cache_dir = token_cache_dir
+        self._token_caches = {}
+        self.draft_model_name = draft_model_name
+        self.draft_model = None
+        self.assisted_stats = None
+        self.fewshot_index = None
+
+        self.prompt_style = prompt_style.lower()
+        from langchain.prompts import PromptTemplate
+
+        if self.prompt_style == "concise":
+            # Static text before the note; the prefix KV cache (local mode) keys on it
+            self.prompt_prefix = (
+                "You are a clinical summarization assistant. "
+                "Given the clinician's note, produce a concise, clear, and accurate summary.\n\n"
+                "Clinician's Note:\n"
+            )
+            tail = "\n\nSummary:"
+        elif self.prompt_style in ("fewshot", "retrieved"):
+            from src.prompt_templates import PROMPT_SUFFIX, prompt_prefix
+
+            # The static examples are also what "retrieved" falls back to
+            self.prompt_prefix = prompt_prefix()
+            tail = PROMPT_SUFFIX
+        else:
+            raise ValueError("Prompt style must be 'concise', 'fewshot' or 'retrieved'.")
+        if self.prompt_style == "retrieved":
+            from src.fewshot_index import FewShotIndex
+
+            self.fewshot_index = FewShotIndex()
+            self.fewshot_k = int(os.getenv("FEWSHOT_K", 3))
+            self.fewshot_token_budget = int(os.getenv("FEWSHOT_TOKEN_BUDGET", 1500))
+        self.prompt_template = PromptTemplate(
+            input_variables=["prompt"],
+            template=self.prompt_prefix + "{prompt}" + tail
+        )
 
         if self.mode == "gemini":
             self._setup_gemini()
@@ -37,53 +100,341 @@ class LangChainSummarizer:
         else:
             raise ValueError("Mode must be 'gemini' or 'local'.")
 
-        self.prompt_template = PromptTemplate(
-            input_variables=["prompt"],
-            template=(
-                "You are a clinical summarization assistant. "
-                "Given the clinician's note, produce a concise, clear, and accurate summary.\n\n"
-                "Clinician's Note:\n{prompt}\n\nSummary:"
-            )
-        )
-
     def _setup_gemini(self):
         """Configure Google Gemini API."""
+        import google.generativeai as genai
+
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise EnvironmentError("GOOGLE_API_KEY is not set in environment variables.")
         genai.configure(api_key=api_key)
-        self.llm = genai.GenerativeModel("gemini-pro")
+        self.llm = genai.GenerativeModel(self.GEMINI_MODEL)
+        self.async_runner = AsyncGeminiRunner(
+            GeminiRestTransport(api_key, self.GEMINI_MODEL, base_url=os.getenv("GEMINI_BASE_URL", DEFAULT_BASE_URL)),
+            concurrency=int(os.getenv("GEMINI_CONCURRENCY", 8)),
+            requests_per_minute=float(os.getenv("GEMINI_RPM", 60)),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", 1_000_000))
+        )
 
     def _setup_local(self):
         """Load local fine-tuned model."""
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        from src.prefix_cache import PrefixKVCache
+
         model_path = self.model_name or os.getenv("LOCAL_MODEL_PATH", "distilgpt2")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.model = AutoModelForCausalLM.from_pretrained(model_path)
-        self.pipeline = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_length=512,
-            temperature=0.3,
-            do_sample=False
+        shared_dir = os.getenv("SHARED_WEIGHTS_DIR")
+        if self.backend in ("onnx", "onnx-int8"):
+            from src.onnx_backend import load_onnx_model
+
+            self.tokenizer, self.model = load_onnx_model(
+                model_path,
+                quantize=self.backend == "onnx-int8",
+                root=os.getenv("ONNX_CACHE_DIR", "cache/onnx")
+            )
+        elif self.backend != "torch":
+            raise ValueError("Local backend must be 'torch', 'onnx' or 'onnx-int8'.")
+        elif shared_dir:
+            # Weights exported by src/serve.py are memory-mapped and shared between workers
+            from src.shared_weights import load_shared_model
+
+            self.tokenizer, self.model = load_shared_model(shared_dir)
+        else:
+            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+            self.model = AutoModelForCausalLM.from_pretrained(model_path)
+        # Causal LMs must be left-padded so every row continues from its own last token
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        self.prefix_cache = None
+        # Only the ~1000-token few-shot prefix is worth caching, so that is the default.
+        # Retrieved examples differ per note, leaving no shared prefix to cache.
+        use_prefix_cache = (
+            self.fewshot_index is None
+            and os.getenv("LOCAL_PREFIX_CACHE", "1" if self.prompt_style == "fewshot" else "0") != "0"
         )
+        if self.draft_model_name:
+            self._setup_draft()
+        # ONNX Runtime keeps past key/values in its own format, so prefix reuse is torch-only.
+        # Assisted decoding manages its own caches, so it takes precedence over prefix reuse.
+        elif self.backend == "torch" and use_prefix_cache:
+            self.prefix_cache = PrefixKVCache(self.model, self.tokenizer, model_path)
+
+    def _setup_draft(self):
+        """Load the draft model for assisted decoding and hook up acceptance accounting."""
+        from transformers import AutoModelForCausalLM
+        from src.assisted import AssistedDecodingStats
+
+        if self.backend != "torch":
+            raise ValueError("Assisted decoding (draft_model_name) requires the 'torch' backend.")
+        self.draft_model = AutoModelForCausalLM.from_pretrained(self.draft_model_name)
+        if self.draft_model.config.vocab_size != self.model.config.vocab_size:
+            raise ValueError(
+                f"Draft model {self.draft_model_name} has a different vocabulary "
+                f"({self.draft_model.config.vocab_size} vs {self.model.config.vocab_size}); "
+                "it must share the main model's tokenizer."
+            )
+        self.draft_model.eval()
+        self.assisted_stats = AssistedDecodingStats(self.model, self.draft_model)
+
+    def _generate_kwargs(self) -> dict:
+        """Extra `generate` arguments: the draft model when assisted decoding is on."""
+        return {"assistant_model": self.draft_model} if self.draft_model is not None else {}
 
-    def run(self, input_text: str) -> str:
-        """Generate a summary from the given input text."""
+    def _token_cache(self):
+        """Token cache for whole prompts (template text around the note included)."""
+        if "prompt" not in self._token_caches:
+            from src.token_cache import TokenCache
+
+            head, tail = self.prompt_template.format(prompt="\x00").split("\x00", 1)
+            self._token_caches["prompt"] = TokenCache(
+                self.tokenizer,
+                prefix=head,
+                suffix=tail,
+                root=self.token_cache_dir
+            )
+        return self._token_caches["prompt"]
+
+    def flush(self):
+        """Write buffered token ids to disk, e.g. on shutdown."""
+        for cache in self._token_caches.values():
+            cache.flush()
+
+    def _format(self, input_text: str) -> str:
+        """Full prompt for one note, with retrieved few-shot examples when the index is on."""
+        if self.fewshot_index is None:
+            return self.prompt_template.format(prompt=input_text)
+        from src.prompt_templates import build_prompt
+
+        examples = self.fewshot_index.select(input_text, k=self.fewshot_k, token_budget=self.fewshot_token_budget)
+        return build_prompt(input_text, examples)
+
+    def _prompt_ids(self, input_texts: List[str], prompts: List[str]) -> List[List[int]]:
+        """Token ids of the formatted prompts, served from the token cache when enabled."""
+        # The token cache assumes the same text around every note, which retrieval breaks
+        if self.token_cache_dir and self.fewshot_index is None:
+            return self._token_cache().encode(input_texts)["input_ids"]
+        return self.tokenizer(prompts)["input_ids"]
+
+    def run(self, input_text: str, deadline=None) -> str:
+        """
+        Generate a summary from the given input text.
+
+        A `deadline` (src/admission.py) stops local generation as soon as it
+        passes or is cancelled and raises DeadlineExceeded instead of
+        returning a partial summary.
+        """
         # Format prompt
-        final_prompt = self.prompt_template.format(prompt=input_text)
+        with span("prompt_build", self.mode):
+            final_prompt = self._format(input_text)
 
         if self.mode == "gemini":
-            response = self.llm.generate_content(final_prompt)
-            return response.text.strip()
+            if deadline is not None:
+                deadline.check()
+            start = time.perf_counter()
+            with span("gemini_request", self.mode):
+                response = self.llm.generate_content(final_prompt)
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                record_tokens(self.mode, usage.prompt_token_count, usage.candidates_token_count,
+                              time.perf_counter() - start)
+            with span("postprocess", self.mode):
+                return response.text.strip()
 
         elif self.mode == "local":
-            outputs = self.pipeline(final_prompt, num_return_sequences=1)
-            return outputs[0]["generated_text"].replace(final_prompt, "").strip()
+            if self.prefix_cache is not None:
+                generated = self._run_with_prefix_cache(final_prompt, input_text, deadline)
+            else:
+                generated = self._generate_local(final_prompt, input_text, deadline)
+            if deadline is not None:
+                deadline.check()
+            with span("postprocess", self.mode):
+                return trim_trailing_header(trim_at_stop(generated.replace(final_prompt, ""))).strip()
 
         else:
             raise ValueError(f"Unsupported mode: {self.mode}")
 
+    def _generate_local(self, final_prompt: str, input_text: str, deadline=None) -> str:
+        """Tokenize, generate and decode one prompt; returns only the generated text."""
+        import torch
+        from src.stopping import stopping_criteria
+
+        with span("tokenize", self.mode):
+            if self.token_cache_dir and self.fewshot_index is None:
+                ids = self._prompt_ids([input_text], [final_prompt])
+                encoded = self.tokenizer.pad({"input_ids": ids}, return_tensors="pt")
+            else:
+                encoded = self.tokenizer(final_prompt, return_tensors="pt")
+        prompt_len = encoded["input_ids"].shape[1]
+        criteria, max_new_tokens = stopping_criteria(self.tokenizer, prompt_len, [input_text], deadline)
+
+        start = time.perf_counter()
+        before = self.assisted_stats.snapshot() if self.assisted_stats else None
+        with span("generate", self.mode), torch.no_grad():
+            output_ids = self.model.generate(
+                **encoded,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=criteria,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self._generate_kwargs()
+            )
+        new_ids = output_ids[0, prompt_len:]
+        record_tokens(self.mode, prompt_len, len(new_ids), time.perf_counter() - start)
+        if before is not None:
+            self.assisted_stats.record(before, len(new_ids))
+
+        with span("decode", self.mode):
+            return self.tokenizer.decode(new_ids, skip_special_tokens=True)
+
+    def _run_with_prefix_cache(self, final_prompt: str, input_text: str, deadline=None) -> str:
+        import torch
+        from src.stopping import stopping_criteria
+
+        with span("tokenize", self.mode):
+            # Tokenized in one piece, exactly as the uncached path does
+            ids = self._prompt_ids([input_text], [final_prompt])[0]
+            input_ids = torch.tensor([ids], dtype=torch.long)
+
+        criteria, max_new_tokens = stopping_criteria(self.tokenizer, input_ids.shape[1], [input_text], deadline)
+        start = time.perf_counter()
+        with span("generate", self.mode):
+            new_ids, prompt_len = self.prefix_cache.generate(
+                self.prompt_prefix,
+                input_ids,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=criteria,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+        record_tokens(self.mode, prompt_len, len(new_ids), time.perf_counter() - start)
+
+        with span("decode", self.mode):
+            return self.tokenizer.decode(new_ids, skip_special_tokens=True)
+
+    def stream(self, input_text: str, deadline=None) -> Iterator[str]:
+        """
+        Yield the summary in chunks as the backend produces them.
+
+        Applies the same prompt-stripping as `run`, so the joined chunks
+        match the non-streaming output. A passed or cancelled `deadline`
+        ends generation and raises DeadlineExceeded after the last chunk.
+        """
+        final_prompt = self._format(input_text)
+        if deadline is not None:
+            deadline.check()
+
+        if self.mode == "gemini":
+            response = self.llm.generate_content(final_prompt, stream=True)
+            yield from strip_prompt_stream((chunk.text for chunk in response), final_prompt)
+
+        elif self.mode == "local":
+            from transformers import TextIteratorStreamer
+            from src.stopping import stopping_criteria
+
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            encoded = self.tokenizer(final_prompt, return_tensors="pt")
+            criteria, max_new_tokens = stopping_criteria(
+                self.tokenizer, encoded["input_ids"].shape[1], [input_text], deadline
+            )
+            worker = Thread(
+                target=self.model.generate,
+                kwargs=dict(
+                    **encoded,
+                    streamer=streamer,
+                    max_new_tokens=max_new_tokens,
+                    stopping_criteria=criteria,
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id
+                ),
+                daemon=True
+            )
+            worker.start()
+            yield from strip_prompt_stream(stop_at_markers(streamer, STOP_MARKERS), final_prompt)
+            worker.join()
+            if deadline is not None:
+                deadline.check()
+
+        else:
+            raise ValueError(f"Unsupported mode: {self.mode}")
+
+    def run_batch(self, input_texts: List[str], deadline=None) -> List[str]:
+        """
+        Generate summaries for several notes.
+
+        In local mode the prompts are grouped into length buckets and each
+        bucket is tokenized with padding and decoded in a single `generate`
+        call. Results are returned in the order of `input_texts`.
+        """
+        if self.mode != "local" or self.draft_model is not None:
+            # Assisted decoding only supports a batch size of one
+            return [self.run(text, deadline) for text in input_texts]
+
+        prompts = [self._format(text) for text in input_texts]
+        with span("tokenize", self.mode):
+            prompt_ids = self._prompt_ids(input_texts, prompts)
+        buckets = bucket_by_length([len(ids) for ids in prompt_ids], self.batch_size, self.max_batch_tokens)
+
+        results: List[Optional[str]] = [None] * len(prompts)
+        for bucket in buckets:
+            bucket_ids = [prompt_ids[i] for i in bucket]
+            summaries = self._generate_bucket(bucket_ids, [input_texts[i] for i in bucket], deadline)
+            if deadline is not None:
+                deadline.check()
+            for idx, summary in zip(bucket, summaries):
+                results[idx] = summary
+        return results
+
+    async def arun_batch(self, input_texts: List[str], deadline=None) -> List[str]:
+        """
+        Generate summaries for several notes without blocking the event loop.
+
+        In gemini mode prompts are fanned out concurrently through the async
+        runner; local mode runs the bucketed batch path in a worker thread.
+        """
+        if self.mode != "gemini":
+            return await asyncio.to_thread(self.run_batch, input_texts, deadline)
+        if deadline is not None:
+            deadline.check()
+
+        prompts = [self._format(text) for text in input_texts]
+        responses = await self.async_runner.generate_many(prompts)
+        return [response.strip() for response in responses]
+
+    def _generate_bucket(self, prompt_ids: List[List[int]], input_texts: List[str], deadline=None) -> List[str]:
+        """Run one padded `generate` call on pre-tokenized prompts and strip the prompt from each row."""
+        import torch
+        from src.stopping import stopping_criteria
+
+        # Prompts are tokenized once in `run_batch`; here they are only padded
+        encoded = self.tokenizer.pad({"input_ids": prompt_ids}, return_tensors="pt")
+        row_lengths = encoded["attention_mask"].sum(dim=1).tolist()
+        padded_width = encoded["input_ids"].shape[1]
+
+        # Each row stops on its own budget or once its answer is complete; the
+        # call runs until the last row is done
+        criteria, max_new_tokens = stopping_criteria(self.tokenizer, padded_width, input_texts, deadline)
+        budgets = criteria[0].budgets
+        start = time.perf_counter()
+        with span("generate", self.mode), torch.no_grad():
+            output_ids = self.model.generate(
+                **encoded,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=criteria,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+
+        generate_seconds = time.perf_counter() - start
+
+        summaries = []
+        for row, prompt_len, budget in zip(output_ids, row_lengths, budgets):
+            new_tokens = row[padded_width:padded_width + budget]
+            record_tokens(self.mode, prompt_len, len(new_tokens), generate_seconds)
+            with span("decode", self.mode):
+                text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+                summaries.append(trim_trailing_header(trim_at_stop(text)).strip())
+        return summaries
+
 
 if __name__ == "__main__":
     # Quick debug test
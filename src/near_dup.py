@@ -0,0 +1,192 @@
+# src/near_dup.py
+# MinHash/LSH index of summarized notes, so a note that is a near-copy of one
+# already summarized (same case, different nurse introduction or wording) can
+# reuse or warm-start from the stored summary.
+#
+# Signatures and LSH band buckets live in SQLite. A lookup is one indexed
+# IN-query over the note's band keys plus a signature comparison for the few
+# candidates, so it stays fast as the store grows to millions of notes.
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+# "I am a nurse ..." up to "in kenya" or the first sentence end; a "." inside
+# a number (temp 38.5) is not one. The dataset's notes are often lowercased
+# and unpunctuated, so "kenya" is usually the only marker.
+_INTRODUCTION = re.compile(r"^\s*i(?: am|'m) an? [^.!?]*?\bnurse\b.*?(?:\bkenya\b[.!?]?|[.!?](?=\s|$))",
+                           re.IGNORECASE | re.DOTALL)
+
+
+class NearDupMatch(NamedTuple):
+    note_id: int
+    summary: str
+    similarity: float
+
+
+def strip_boilerplate(note: str) -> str:
+    """Drop the nurse's self-introduction ("I am a nurse with ... in kenya"); other notes are returned as is."""
+    match = _INTRODUCTION.match(note)
+    description = note[match.end():].strip() if match else ""
+    return description or note
+
+
+def shingles(note: str, size: int = 3) -> set:
+    words = _WORD.findall(strip_boilerplate(note).lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1/bands)^(1/rows) is closest to `threshold` without exceeding it, so
+    true matches are rarely missed; candidates are verified exactly.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below or options, key=lambda br: (1 / br[0]) ** (1 / br[1]))
+
+
+def warm_start_text(note: str, reference_summary: str) -> str:
+    """Note text extended with the summary of a near-identical note as guidance."""
+    return f"{note}\n\nReference summary of a near-identical case (adapt it to this note):\n{reference_summary}"
+
+
+class NearDupIndex:
+    """
+    Finds stored notes whose boilerplate-stripped word 3-gram Jaccard
+    similarity to a query note is at least `threshold`.
+
+    Notes are partitioned by `scope` (backend, model, prompt template), so
+    summaries are never reused across models or templates.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.9, num_perm: int = 128, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            " id INTEGER PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " bucket INTEGER NOT NULL,"
+            " note_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bucket ON buckets(bucket)")
+        self._conn.commit()
+        self._stats = {"lookups": 0, "matches": 0, "lookup_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> Optional["NearDupIndex"]:
+        """Build from NEAR_DUP_* env vars; None unless NEAR_DUP_ENABLED=1."""
+        if os.getenv("NEAR_DUP_ENABLED", "0") != "1":
+            return None
+        return cls(
+            os.getenv("NEAR_DUP_PATH", "cache/near_dup.sqlite3"),
+            threshold=float(os.getenv("NEAR_DUP_THRESHOLD", 0.9)),
+            num_perm=int(os.getenv("NEAR_DUP_NUM_PERM", 128))
+        )
+
+    def signature(self, note: str) -> np.ndarray:
+        grams = shingles(note)
+        if not grams:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams],
+            dtype=np.uint64
+        )
+        # One universal hash per permutation, applied to every shingle at once
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray, scope: str) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(scope.encode("utf-8") + bytes([band % 256]) + chunk, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    def query(self, note: str, scope: str) -> Optional[NearDupMatch]:
+        """Most similar stored note in `scope` at or above the threshold, if any."""
+        start = time.perf_counter()
+        signature = self.signature(note)
+        keys = self._band_keys(signature, scope)
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, signature, summary FROM notes WHERE scope = ? AND id IN ("
+                f" SELECT note_id FROM buckets WHERE bucket IN ({placeholders}))",
+                (scope, *keys)
+            ).fetchall()
+
+        best = None
+        for note_id, blob, summary in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = NearDupMatch(note_id, summary, round(similarity, 4))
+
+        with self._lock:
+            self._stats["lookups"] += 1
+            self._stats["matches"] += best is not None
+            self._stats["lookup_seconds"] += time.perf_counter() - start
+        return best
+
+    def add(self, note: str, summary: str, scope: str) -> int:
+        signature = self.signature(note)
+        keys = self._band_keys(signature, scope)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO notes (scope, signature, summary, created_at) VALUES (?, ?, ?, ?)",
+                (scope, signature.tobytes(), summary, time.time())
+            )
+            note_id = cursor.lastrowid
+            self._conn.executemany("INSERT INTO buckets (bucket, note_id) VALUES (?, ?)",
+                                   [(key, note_id) for key in keys])
+            self._conn.commit()
+        return note_id
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats.pop("lookups")
+        return {
+            "entries": len(self),
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "lookups": lookups,
+            "matches": stats["matches"],
+            "mean_lookup_ms": round(1000 * stats["lookup_seconds"] / lookups, 4) if lookups else None
+        }
@@ -0,0 +1,89 @@
+# src/onnx_backend.py
+# ONNX Runtime backend for local mode: exports the causal LM (with KV cache)
+# once, optionally applies dynamic int8 quantization, and caches the result on disk.
+
+import os
+import shutil
+from pathlib import Path
+
+from src.shared_weights import source_fingerprint
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def onnx_export_dir(model_path: str, quantize: bool, root: str = "cache/onnx") -> Path:
+    """Export directory keyed like the shared weights, so retrained models re-export."""
+    variant = "int8" if quantize else "fp32"
+    return Path(root) / source_fingerprint(model_path) / variant
+
+
+def _staging_dir(target: Path) -> Path:
+    staging = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def _publish(staging: Path, target: Path):
+    """Rename a finished export into place; if another process finished first, keep theirs."""
+    try:
+        os.replace(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def export_onnx(model_path: str, quantize: bool = False, root: str = "cache/onnx") -> Path:
+    """
+    Export `model_path` to ONNX with past key/values, reusing a cached export if present.
+
+    Each export is written to a temporary directory and renamed into place,
+    so concurrent workers never load a half-written model.
+
+    Args:
+        model_path (str): Local model dir or HF Hub ID.
+        quantize (bool): Apply dynamic int8 quantization to the exported graph.
+        root (str): Cache root for exported artifacts.
+    """
+    from optimum.onnxruntime import ORTModelForCausalLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir = onnx_export_dir(model_path, quantize=False, root=root)
+    if not (fp32_dir / "config.json").exists():
+        staging = _staging_dir(fp32_dir)
+        model = ORTModelForCausalLM.from_pretrained(model_path, export=True, use_cache=True)
+        model.save_pretrained(staging)
+        AutoTokenizer.from_pretrained(model_path).save_pretrained(staging)
+        _publish(staging, fp32_dir)
+        print(f"✅ Exported {model_path} to ONNX at: {fp32_dir}")
+
+    if not quantize:
+        return fp32_dir
+
+    int8_dir = onnx_export_dir(model_path, quantize=True, root=root)
+    if not (int8_dir / QUANTIZED_FILE).exists():
+        staging = _staging_dir(int8_dir)
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=staging, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(staging)
+        _publish(staging, int8_dir)
+        print(f"✅ Quantized ONNX model saved at: {int8_dir}")
+    return int8_dir
+
+
+def load_onnx_model(model_path: str, quantize: bool = False, root: str = "cache/onnx"):
+    """Return (tokenizer, ORTModelForCausalLM) served by ONNX Runtime on CPU."""
+    from optimum.onnxruntime import ORTModelForCausalLM
+    from transformers import AutoTokenizer
+
+    export_dir = export_onnx(model_path, quantize=quantize, root=root)
+    kwargs = {"file_name": QUANTIZED_FILE} if quantize else {}
+    model = ORTModelForCausalLM.from_pretrained(
+        export_dir,
+        use_cache=True,
+        provider=os.getenv("ONNX_PROVIDER", "CPUExecutionProvider"),
+        **kwargs
+    )
+    tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    return tokenizer, model
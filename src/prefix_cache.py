@@ -0,0 +1,103 @@
+# src/prefix_cache.py
+# Reuses the attention key/value state of a static prompt prefix across requests.
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import torch
+
+
+class PrefixKVCache:
+    """
+    Computes `past_key_values` for a fixed prompt prefix (the few-shot block
+    of `prompt_templates`) once per model and prefix text, then starts every
+    generation from that state so only the note itself has to be prefilled.
+
+    Entries are keyed by a hash of the prefix text, so editing the prompt
+    template produces a new entry; only the `max_entries` most recent
+    prefixes are kept.
+    """
+
+    def __init__(self, model, tokenizer, model_name: str, max_entries: int = 4):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "boundary_misses": 0, "prefix_tokens": 0,
+                       "prefill_seconds_saved": 0.0}
+
+    def _key(self, prefix: str) -> str:
+        material = f"{self.model_name}\x1f{prefix}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _build(self, prefix: str) -> dict:
+        input_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"]
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model(input_ids=input_ids, use_cache=True)
+        return {
+            "input_ids": input_ids,
+            "past_key_values": outputs.past_key_values,
+            "prefill_seconds": time.perf_counter() - start,
+        }
+
+    def get(self, prefix: str) -> dict:
+        """Return the cached prefix state, computing it on first use."""
+        key = self._key(prefix)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+            entry = self._build(prefix)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats["misses"] += 1
+            self._stats["prefix_tokens"] = entry["input_ids"].shape[1]
+            return entry
+
+    def generate(self, prefix: str, input_ids: torch.Tensor, **generate_kwargs) -> Tuple[torch.Tensor, int]:
+        """
+        Generate from `input_ids`, the whole prompt tokenized in one piece,
+        reusing the cached state of `prefix`.
+
+        The cache is only used when the prefix's own tokens are exactly the
+        first tokens of `input_ids`; if BPE merges across the boundary
+        differently, the prompt is generated uncached so the output never
+        differs from plain `generate`. Returns the newly generated ids and
+        the prompt length.
+        """
+        entry = self.get(prefix)
+        cached_ids = entry["input_ids"]
+        prefix_len = cached_ids.shape[1]
+        aligned = input_ids.shape[1] > prefix_len and torch.equal(input_ids[:, :prefix_len], cached_ids)
+
+        kwargs = dict(generate_kwargs)
+        with self._lock:
+            if aligned:
+                self._stats["hits"] += 1
+                self._stats["prefill_seconds_saved"] += entry["prefill_seconds"]
+                # generate() extends the cache in place, so each request works on its own copy
+                kwargs["past_key_values"] = copy.deepcopy(entry["past_key_values"])
+            else:
+                self._stats["boundary_misses"] += 1
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                **kwargs
+            )
+        prompt_len = input_ids.shape[1]
+        return output_ids[0, prompt_len:], prompt_len
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
@@ -1,34 +1,192 @@
+import gzip
+import hashlib
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional
+
 from data_loader import ClinicalDataLoader
 
+SPLITS = ("train", "val")
+
+
+def split_for(prompt: str, val_fraction: float) -> str:
+    """Deterministic train/val assignment from a hash of the note, so a row never changes split between exports."""
+    bucket = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big") / 2 ** 64
+    return "val" if bucket < val_fraction else "train"
+
+
+def shard_name(split: str, index: int, compress: bool) -> str:
+    return f"{split}-{index:05d}" + (".jsonl.gz" if compress else ".jsonl")
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_shard(task: dict) -> List[dict]:
+    """Serialize one chunk into a train and a val shard; runs in a worker process."""
+    index, prompts, summaries = task["index"], task["prompts"], task["summaries"]
+    output_dir, compress, val_fraction = Path(task["output_dir"]), task["compress"], task["val_fraction"]
+
+    lines = {split: [] for split in SPLITS}
+    for prompt, summary in zip(prompts, summaries):
+        record = json.dumps({"input_text": prompt, "output_text": summary}, ensure_ascii=False)
+        lines[split_for(prompt, val_fraction)].append(record + "\n")
+
+    entries = []
+    for split in SPLITS:
+        payload = "".join(lines[split]).encode("utf-8")
+        input_digest = hashlib.sha256(payload).hexdigest()
+        path = output_dir / shard_name(split, index, compress)
+        previous = task["previous"].get(path.name)
+        if previous and previous["input_digest"] == input_digest and path.exists() \
+                and path.stat().st_size == previous["bytes"]:
+            entries.append(dict(previous, skipped=True))
+            continue
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        if compress:
+            # mtime=0 keeps the gzip bytes (and checksum) reproducible
+            with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(payload)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+        os.replace(tmp_path, path)
+        entries.append({
+            "path": path.name,
+            "split": split,
+            "shard": index,
+            "rows": len(lines[split]),
+            "bytes": path.stat().st_size,
+            "sha256": _sha256(path),
+            "input_digest": input_digest,
+            "skipped": False
+        })
+    return entries
+
+
 class FinetuneDatasetPreparer:
     """
     Converts the clinical prompt dataset into a JSONL format
     compatible with Gemini fine-tuning.
+
+    The CSV is streamed in chunks of `shard_rows`, and each chunk becomes
+    one train and one val shard, written by a pool of worker processes.
+    A manifest.json records every shard's row count and sha256. On
+    re-export, a shard whose content is unchanged is not rewritten.
     """
 
-    def __init__(self, input_csv: str, output_dir: str = "data/processed"):
+    def __init__(
+        self,
+        input_csv: str,
+        output_dir: str = "data/processed",
+        shard_rows: int = 50_000,
+        val_fraction: float = 0.1,
+        compress: bool = False,
+        num_workers: Optional[int] = None
+    ):
         self.input_csv = input_csv
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_rows = shard_rows
+        self.val_fraction = val_fraction
+        self.compress = compress
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.manifest_path = self.output_dir / "manifest.json"
 
-    def prepare(self):
+    def _previous_shards(self) -> dict:
+        if not self.manifest_path.exists():
+            return {}
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("val_fraction") != self.val_fraction:
+            return {}
+        return {entry["path"]: entry for entry in manifest.get("shards", [])}
+
+    def _tasks(self, previous: dict):
         loader = ClinicalDataLoader(self.input_csv)
-        df = loader.load_data()
+        for index, chunk in enumerate(loader.iter_chunks(chunksize=self.shard_rows)):
+            chunk = chunk.dropna(subset=["Prompt", "Clinician"])
+            names = [shard_name(split, index, self.compress) for split in SPLITS]
+            yield {
+                "index": index,
+                "prompts": chunk["Prompt"].tolist(),
+                "summaries": chunk["Clinician"].tolist(),
+                "output_dir": str(self.output_dir),
+                "compress": self.compress,
+                "val_fraction": self.val_fraction,
+                # Only this shard's manifest entries are pickled to the worker
+                "previous": {name: previous[name] for name in names if name in previous}
+            }
+
+    def prepare(self) -> dict:
+        previous = self._previous_shards()
+        shards = []
+        with ProcessPoolExecutor(max_workers=self.num_workers) as pool:
+            # Keep a bounded number of chunks in flight so memory stays flat on large inputs
+            in_flight = []
+            for task in self._tasks(previous):
+                in_flight.append(pool.submit(_write_shard, task))
+                if len(in_flight) >= self.num_workers * 2:
+                    shards.extend(in_flight.pop(0).result())
+            for future in in_flight:
+                shards.extend(future.result())
+
+        # Drop shards left over from a previous, longer export
+        current = {entry["path"] for entry in shards}
+        for name in previous:
+            if name not in current and (self.output_dir / name).exists():
+                (self.output_dir / name).unlink()
 
-        # Create training JSONL
-        train_path = self.output_dir / "train.jsonl"
-        with open(train_path, "w", encoding="utf-8") as f:
-            for _, row in df.iterrows():
-                record = {
-                    "input_text": row["prompt"],
-                    "output_text": row["gold_summary"]
-                }
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        manifest = {
+            "source": str(self.input_csv),
+            "val_fraction": self.val_fraction,
+            "compress": self.compress,
+            "rows": {split: sum(e["rows"] for e in shards if e["split"] == split) for split in SPLITS},
+            "shards": [{k: v for k, v in e.items() if k != "skipped"} for e in shards]
+        }
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+        written = sum(1 for e in shards if not e["skipped"])
+        print(f"✅ Exported {manifest['rows']['train']} train / {manifest['rows']['val']} val rows "
+              f"into {len(shards)} shards ({written} written, {len(shards) - written} unchanged) "
+              f"at: {self.output_dir}")
+        return manifest
+
+
+def shard_paths(manifest_path: str, split: str = "train") -> List[str]:
+    """Shard files for `split` listed in a manifest, e.g. for `load_dataset("json", data_files=...)`."""
+    manifest_path = Path(manifest_path)
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    return [str(manifest_path.parent / e["path"]) for e in manifest["shards"] if e["split"] == split]
 
-        print(f"✅ Training dataset saved at: {train_path}")
 
 if __name__ == "__main__":
-    preparer = FinetuneDatasetPreparer("data/clinical_prompts.csv")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the clinical dataset as sharded JSONL.")
+    parser.add_argument("--csv", default="data/clinical_prompts.csv")
+    parser.add_argument("--out", default="data/processed")
+    parser.add_argument("--shard-rows", type=int, default=50_000)
+    parser.add_argument("--val-fraction", type=float, default=0.1)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    preparer = FinetuneDatasetPreparer(
+        args.csv,
+        output_dir=args.out,
+        shard_rows=args.shard_rows,
+        val_fraction=args.val_fraction,
+        compress=args.gzip,
+        num_workers=args.workers
+    )
     preparer.prepare()
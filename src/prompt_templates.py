@@ -1,11 +1,15 @@
-EXAMPLE_FEW_SHOT = """
+from typing import List, Optional
+
+INSTRUCTIONS = """
 You are a Kenyan clinical officer. Given a medical scenario written by a nurse, your task is to:
 
 1. Summarize the patient case using professional clinical language.
 2. Provide a structured response with diagnosis, investigations, management, and follow-up.
 3. Ensure the format and style matches the following examples exactly.
 
-### Example 1:
+"""
+
+EXAMPLE_FEW_SHOT = INSTRUCTIONS + """### Example 1:
 I am a nurse with 18 years of experience in General nursing working in a Sub-county Hospitals and Nursing Homes in Uasin Gishu county in Kenya. A 4-year-old child presents to the emergency department with second-degree burns on the forearm after accidentally touching a hot stove. The child was playing in the kitchen when they reached out to touch the stove. The burns cover about 5% of the total body surface area. The child is alert and crying, with redness, blisters, and swelling on the affected area...
 Questions:
 1. What is the immediate treatment protocol for second-degree burns in paediatric patients?
@@ -58,10 +62,41 @@ Immediate Management:
 """
 
 
-def build_prompt(clinical_note: str) -> str:
-    directive = (
-        "Now summarize the following clinical nurse note. Output must be structured exactly as in examples "
-        "(Summary, Diagnosis:, Immediate Management:, Investigations:, Follow-up Care:, Medications:). "
-        "Medications should be a bullet list with name, dose (if known or 'tbd'), route, and frequency if available.\n\n"
-    )
-    return EXAMPLE_FEW_SHOT + "\n\n" + directive + "Clinical note:\n" + clinical_note + "\n\n----\nResponse:\n"
+DIRECTIVE = (
+    "Now summarize the following clinical nurse note. Output must be structured exactly as in examples "
+    "(Summary, Diagnosis:, Immediate Management:, Investigations:, Follow-up Care:, Medications:). "
+    "Medications should be a bullet list with name, dose (if known or 'tbd'), route, and frequency if available.\n\n"
+)
+
+
+EXAMPLE_SEPARATOR = "\n**********************************\n\n"
+
+# Follows the note in every few-shot prompt
+PROMPT_SUFFIX = "\n\n----\nResponse:\n"
+
+
+def render_examples(examples: List[dict]) -> str:
+    """Few-shot block for retrieved examples, in the same layout as EXAMPLE_FEW_SHOT."""
+    blocks = [
+        f"### Example {i}:\n{ex['note'].strip()}\n{'-' * 100}\n{ex['summary'].strip()}\n"
+        for i, ex in enumerate(examples, start=1)
+    ]
+    return INSTRUCTIONS + EXAMPLE_SEPARATOR.join(blocks)
+
+
+def prompt_prefix(examples: Optional[List[dict]] = None) -> str:
+    """
+    Part of the prompt before the note: few-shot block and directive. The
+    static examples are used unless `examples` has at least one entry.
+    """
+    few_shot = render_examples(examples) if examples else EXAMPLE_FEW_SHOT
+    return few_shot + "\n\n" + DIRECTIVE + "Clinical note:\n"
+
+
+def build_prompt(clinical_note: str, examples: Optional[List[dict]] = None) -> str:
+    """
+    Full prompt for one note. `examples` (dicts with 'note' and 'summary',
+    e.g. from `FewShotIndex.select`) replace the two hard-coded examples;
+    when nothing was retrieved the hard-coded ones are kept.
+    """
+    return prompt_prefix(examples) + clinical_note + PROMPT_SUFFIX
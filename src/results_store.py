@@ -0,0 +1,186 @@
+# src/results_store.py
+# Columnar store for evaluation runs. Generations and per-metric scores are
+# kept as Parquet parts under one directory and keyed by
+# (note hash, model, template fingerprint), so re-running an evaluation only
+# generates unseen keys and only rescores metrics whose version changed.
+
+import hashlib
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.summary_cache import normalize_note
+
+GENERATION_SCHEMA = pa.schema([
+    ("key", pa.string()),
+    ("note_hash", pa.string()),
+    ("row_id", pa.string()),
+    ("model", pa.string()),
+    ("template_fp", pa.string()),
+    ("run_id", pa.string()),
+    ("generated_summary", pa.string()),
+    ("latency_s", pa.float64()),
+    ("created_at", pa.float64()),
+])
+
+SCORE_SCHEMA = pa.schema([
+    ("key", pa.string()),
+    ("metric", pa.string()),
+    ("metric_version", pa.int32()),
+    ("value", pa.float64()),
+    ("run_id", pa.string()),
+    ("created_at", pa.float64()),
+])
+
+
+def note_hash(note: str) -> str:
+    return hashlib.sha256(normalize_note(note).encode("utf-8")).hexdigest()
+
+
+def result_key(note: str, model: str, template_fp: str) -> str:
+    material = "\x1f".join([note_hash(note), model, template_fp])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultsStore:
+    """
+    Append-only Parquet store with `generations/` and `scores/` datasets.
+
+    Reads go through `pyarrow.dataset` with column projection and key
+    filters, so lookups and diffs never materialize unrelated runs.
+    """
+
+    def __init__(self, root: str = "results"):
+        self.root = Path(root)
+        self.generations_dir = self.root / "generations"
+        self.scores_dir = self.root / "scores"
+        self.generations_dir.mkdir(parents=True, exist_ok=True)
+        self.scores_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def new_run_id() -> str:
+        return time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+    def _dataset(self, directory: Path, schema: pa.Schema) -> Optional[ds.Dataset]:
+        if not any(directory.glob("*.parquet")):
+            return None
+        return ds.dataset(directory, format="parquet", schema=schema)
+
+    def _write(self, directory: Path, schema: pa.Schema, records: List[dict], run_id: str):
+        if not records:
+            return
+        table = pa.Table.from_pylist(records, schema=schema)
+        pq.write_table(table, directory / f"part-{run_id}-{uuid.uuid4().hex[:8]}.parquet")
+
+    # Generations
+
+    def get_generations(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Latest stored summary for each of `keys` that has one."""
+        dataset = self._dataset(self.generations_dir, GENERATION_SCHEMA)
+        keys = list(set(keys))
+        if dataset is None or not keys:
+            return {}
+        table = dataset.to_table(
+            columns=["key", "generated_summary", "created_at"],
+            filter=pc.field("key").isin(keys)
+        ).sort_by("created_at")
+        return dict(zip(table.column("key").to_pylist(), table.column("generated_summary").to_pylist()))
+
+    def append_generations(self, records: List[dict], run_id: str):
+        now = time.time()
+        rows = [dict(r, run_id=run_id, created_at=now) for r in records]
+        self._write(self.generations_dir, GENERATION_SCHEMA, rows, run_id)
+
+    # Scores
+
+    def get_scores(self, keys: Iterable[str], metric_versions: Dict[str, int]) -> Dict[Tuple[str, str], float]:
+        """Stored scores at the current metric versions, as {(key, metric): value}."""
+        dataset = self._dataset(self.scores_dir, SCORE_SCHEMA)
+        keys = list(set(keys))
+        if dataset is None or not keys:
+            return {}
+        table = dataset.to_table(
+            columns=["key", "metric", "metric_version", "value", "created_at"],
+            filter=pc.field("key").isin(keys) & pc.field("metric").isin(list(metric_versions))
+        ).sort_by("created_at")
+        scores = {}
+        for key, metric, version, value in zip(
+            table.column("key").to_pylist(),
+            table.column("metric").to_pylist(),
+            table.column("metric_version").to_pylist(),
+            table.column("value").to_pylist()
+        ):
+            if metric_versions.get(metric) == version:
+                scores[(key, metric)] = value
+        return scores
+
+    def append_scores(self, records: List[dict], run_id: str):
+        now = time.time()
+        rows = [dict(r, run_id=run_id, created_at=now) for r in records]
+        self._write(self.scores_dir, SCORE_SCHEMA, rows, run_id)
+
+    # Queries
+
+    def run_table(self, model: str, template_fp: str, metric: str) -> pd.DataFrame:
+        """One row per note for a (model, template) run with its latest `metric` score."""
+        generations = self._dataset(self.generations_dir, GENERATION_SCHEMA)
+        if generations is None:
+            return pd.DataFrame(columns=["note_hash", "row_id", "key", metric])
+        gen = generations.to_table(
+            columns=["key", "note_hash", "row_id", "created_at"],
+            filter=(pc.field("model") == model) & (pc.field("template_fp") == template_fp)
+        ).to_pandas().sort_values("created_at").drop_duplicates("key", keep="last")
+
+        scores = self.get_scores(gen["key"].tolist(), {metric: self._latest_version(metric)})
+        gen[metric] = [scores.get((key, metric)) for key in gen["key"]]
+        return gen.drop(columns=["created_at"])
+
+    def _latest_version(self, metric: str) -> Optional[int]:
+        dataset = self._dataset(self.scores_dir, SCORE_SCHEMA)
+        if dataset is None:
+            return None
+        versions = dataset.to_table(columns=["metric_version"], filter=pc.field("metric") == metric)
+        return pc.max(versions.column("metric_version")).as_py() if versions.num_rows else None
+
+    def diff_runs(self, run_a: Tuple[str, str], run_b: Tuple[str, str], metric: str = "rougeL") -> pd.DataFrame:
+        """
+        Compare two (model, template_fp) runs note by note on `metric`.
+
+        Returns note_hash, row_id, the two scores and their delta (b - a).
+        """
+        a = self.run_table(*run_a, metric=metric)[["note_hash", "row_id", metric]]
+        b = self.run_table(*run_b, metric=metric)[["note_hash", metric]]
+        merged = a.merge(b, on="note_hash", suffixes=("_a", "_b"))
+        merged["delta"] = merged[f"{metric}_b"] - merged[f"{metric}_a"]
+        return merged
+
+    def ingest_predictions(self, predictions_csv: str, notes_csv: str, model: str, template_fp: str) -> str:
+        """
+        Import an existing `Master_Index,Clinician` predictions file (e.g. the
+        Data/optimized*_test_*.csv outputs) by joining it to its source notes.
+        Returns the run id used.
+        """
+        notes = pd.read_csv(notes_csv, usecols=["Master_Index", "Prompt"])
+        preds = pd.read_csv(predictions_csv, usecols=["Master_Index", "Clinician"])
+        joined = notes.merge(preds, on="Master_Index")
+        run_id = self.new_run_id()
+        self.append_generations([
+            {
+                "key": result_key(prompt, model, template_fp),
+                "note_hash": note_hash(prompt),
+                "row_id": str(master_index),
+                "model": model,
+                "template_fp": template_fp,
+                "generated_summary": summary,
+                "latency_s": None,
+            }
+            for master_index, prompt, summary in zip(joined["Master_Index"], joined["Prompt"], joined["Clinician"])
+        ], run_id)
+        return run_id
@@ -0,0 +1,30 @@
+# src/serve.py
+# Multi-worker launcher. In local mode the parent process exports the model
+# weights once, then every uvicorn worker memory-maps that single copy.
+
+import argparse
+import os
+
+import uvicorn
+
+from src.shared_weights import prepare_shared_weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the summarization API with several workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    args = parser.parse_args()
+
+    if os.getenv("MODE", "local").lower() == "local" and not os.getenv("SHARED_WEIGHTS_DIR"):
+        model_path = os.getenv("LOCAL_MODEL_PATH", "distilgpt2")
+        root = os.getenv("SHARED_WEIGHTS_ROOT", "cache/shared_weights")
+        # Workers inherit the environment, so they all load from the same export
+        os.environ["SHARED_WEIGHTS_DIR"] = str(prepare_shared_weights(model_path, root))
+
+    uvicorn.run("src.app:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# src/shared_weights.py
+# Stores local model weights once on disk so every API worker can memory-map
+# the same read-only pages instead of holding its own copy in RAM.
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import Dict
+
+WEIGHTS_FILE = "weights.pt"
+# Non-persistent buffers (causal masks, rotary inv_freq) are not in the state dict
+BUFFERS_FILE = "buffers.pt"
+SOURCE_FILE_PATTERNS = ("config.json", "*.safetensors", "*.bin", "*.pt")
+
+
+def source_fingerprint(model_path: str) -> str:
+    """
+    Model path plus, for local checkpoints, the mtime and size of the config
+    and weight files, so a model retrained into the same directory gets a
+    fresh export.
+    """
+    material = model_path
+    source = Path(model_path)
+    if source.is_dir():
+        files = sorted({f for pattern in SOURCE_FILE_PATTERNS for f in source.glob(pattern)})
+        for f in files:
+            stat = f.stat()
+            material += f"\x1f{f.name}@{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def shared_weights_dir(model_path: str, root: str = "cache/shared_weights") -> Path:
+    """Directory holding the shareable export of `model_path` as it is on disk now."""
+    return Path(root) / source_fingerprint(model_path)
+
+
+def prepare_shared_weights(model_path: str, root: str = "cache/shared_weights") -> Path:
+    """
+    Export `model_path` once into a directory that workers can memory-map.
+
+    Run this in the parent (loader) process before starting workers.
+    The export is written to a temporary directory and renamed into place,
+    so concurrent callers never see a half-written checkpoint.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    target = shared_weights_dir(model_path, root)
+    if (target / WEIGHTS_FILE).exists():
+        return target
+
+    staging = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    model = AutoModelForCausalLM.from_pretrained(model_path)
+    model.config.save_pretrained(staging)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(staging)
+    state_dict = model.state_dict()
+    torch.save(state_dict, staging / WEIGHTS_FILE)
+    buffers = {name: buf for name, buf in model.named_buffers() if name not in state_dict}
+    torch.save(buffers, staging / BUFFERS_FILE)
+    (staging / "SOURCE").write_text(model_path, encoding="utf-8")
+
+    try:
+        staging.rename(target)
+    except OSError:
+        # Another process finished the export first
+        shutil.rmtree(staging, ignore_errors=True)
+    print(f"✅ Shared weights for {model_path} ready at: {target}")
+    return target
+
+
+def load_shared_model(weights_dir: str):
+    """
+    Build the model on the meta device and attach memory-mapped weights.
+
+    Tensors are backed by the page cache of `weights.pt`, so every worker
+    that loads the same file shares the physical pages. Non-persistent
+    buffers are small and are loaded from `buffers.pt` into each worker.
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+
+    weights_dir = Path(weights_dir)
+    config = AutoConfig.from_pretrained(weights_dir)
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config)
+
+    state_dict = torch.load(weights_dir / WEIGHTS_FILE, mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    buffers_path = weights_dir / BUFFERS_FILE
+    buffers = torch.load(buffers_path, weights_only=True) if buffers_path.exists() else {}
+    for name, tensor in buffers.items():
+        module_name, _, buffer_name = name.rpartition(".")
+        model.get_submodule(module_name).register_buffer(buffer_name, tensor, persistent=False)
+    model.tie_weights()
+    model.eval()
+
+    on_meta = [name for name, t in [*model.named_parameters(), *model.named_buffers()] if t.is_meta]
+    if on_meta:
+        raise RuntimeError(
+            f"{weights_dir} does not cover {', '.join(on_meta[:3])}; "
+            "re-export it with prepare_shared_weights."
+        )
+
+    tokenizer = AutoTokenizer.from_pretrained(weights_dir)
+    return tokenizer, model
+
+
+def memory_report() -> Dict[str, int]:
+    """
+    Resident and shared memory of the current process in kB, from /proc.
+
+    `shared_kb` counts pages also mapped by other processes (e.g. the
+    memory-mapped weights); `pss_kb` splits shared pages between them.
+    """
+    report = {"pid": os.getpid()}
+    fields = {
+        "Rss": "rss_kb",
+        "Pss": "pss_kb",
+        "Shared_Clean": "shared_clean_kb",
+        "Shared_Dirty": "shared_dirty_kb",
+        "Private_Clean": "private_clean_kb",
+        "Private_Dirty": "private_dirty_kb",
+    }
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    report[fields[name]] = int(rest.split()[0])
+    except FileNotFoundError:
+        return report
+
+    report["shared_kb"] = report.get("shared_clean_kb", 0) + report.get("shared_dirty_kb", 0)
+    report["private_kb"] = report.get("private_clean_kb", 0) + report.get("private_dirty_kb", 0)
+    return report
@@ -0,0 +1,229 @@
+# src/stopping.py
+# Structure-aware stopping for local generation. The sections a note asks
+# for are inferred from its questions; generation ends once they have all
+# been written and closed, when the model starts another few-shot example,
+# or when the note's token budget (scaled by its question count) runs out.
+
+import re
+from typing import List, Optional, Sequence
+
+# The model has finished its answer and is imitating the few-shot layout
+STOP_MARKERS = ("**********", "### Example")
+
+# Section header (as in the build_prompt directive) -> question words asking for it,
+# as regexes matched on whole words of the note's questions
+SECTION_KEYWORDS = {
+    "Diagnosis:": (r"diagnos\w*", r"differentials?", r"conditions?", r"problems?", r"suffering"),
+    "Investigations:": (r"investigat\w*", r"tests?", r"labs?", r"laboratory", r"work ?up", r"imaging", r"scans?",
+                        r"x-rays?", r"rule out"),
+    "Immediate Management:": (r"manag\w*", r"treat\w*", r"interventions?", r"first aid", r"protocols?",
+                              r"remov\w*", r"refer\w*"),
+    "Follow-up Care:": (r"follow\w*", r"educat\w*", r"counsel\w*", r"advice", r"advise", r"prevent\w*",
+                        r"discharge\w*"),
+    "Medications:": (r"medicat\w*", r"medicines?", r"drugs?", r"doses?", r"dosage", r"prescri\w*", r"antibiotics?"),
+}
+_SECTION_PATTERNS = {
+    header: re.compile(r"\b(?:" + "|".join(keywords) + r")\b", re.IGNORECASE)
+    for header, keywords in SECTION_KEYWORDS.items()
+}
+
+# "when"/"where" are left out: in the narrative they rarely open a question
+_QUESTION_OPENER = re.compile(r"\b(?:what|how|which|why|should|do i|can i|is there|are there|is it)\b", re.IGNORECASE)
+# "Question:" / "Questions 1 ..." introduces the questions, with or without punctuation
+_QUESTIONS_HEADER = re.compile(r"\bquestions?\b:?", re.IGNORECASE)
+_SENTENCE = re.compile(r"[^.?!\n]+[.?!]*")
+# Header stem matched case-insensitively, so "Management:" also counts as "Immediate Management:"
+SECTION_STEMS = {
+    "Diagnosis:": "diagnos",
+    "Investigations:": "investigation",
+    "Immediate Management:": "management",
+    "Follow-up Care:": "follow",
+    "Medications:": "medication",
+}
+# A header starts a line and may have content on the same line ("Diagnosis: DKA")
+_HEADER = re.compile(r"^[ \t]*([A-Z][A-Za-z /-]{2,40}):", re.MULTILINE)
+
+BASE_NEW_TOKENS = 64
+TOKENS_PER_QUESTION = 48
+MIN_NEW_TOKENS = 128
+MAX_NEW_TOKENS = 256
+
+
+def _punctuated(note: str) -> bool:
+    return any(mark in note for mark in ".?!")
+
+
+def question_sentences(note: str) -> List[str]:
+    """
+    The parts of a note that ask something, so the patient narrative is not
+    read as a request: every sentence after a "Question(s)" header,
+    otherwise the sentences that end in '?' or open with an interrogative
+    (falling back to the last sentence). The test notes are lower-cased
+    with punctuation stripped; for those it is the text from the first
+    interrogative on.
+    """
+    header = _QUESTIONS_HEADER.search(note)
+    text = note[header.end():] if header else note
+    if not _punctuated(note):
+        opener = _QUESTION_OPENER.search(text)
+        text = text[opener.start():] if opener else text
+        return [text] if text.strip() else []
+    # Skips list numbering such as "1."
+    sentences = [s.strip() for s in _SENTENCE.findall(text) if re.search(r"[a-z]", s, re.IGNORECASE)]
+    if header:
+        return sentences
+    return [s for s in sentences if "?" in s or _QUESTION_OPENER.match(s)] or sentences[-1:]
+
+
+def count_questions(note: str, cap: int = 6) -> int:
+    """
+    Questions asked in a note: its question sentences, or the
+    interrogatives among them when the note has no punctuation. Always at
+    least one.
+    """
+    questions = question_sentences(note)
+    if _punctuated(note):
+        count = len(questions)
+    else:
+        count = sum(len(_QUESTION_OPENER.findall(q)) for q in questions)
+    return max(1, min(cap, count))
+
+
+def required_sections(note: str) -> List[str]:
+    """Section headers the note's questions ask for, in template order."""
+    text = "\n".join(question_sentences(note))
+    return [header for header, pattern in _SECTION_PATTERNS.items() if pattern.search(text)]
+
+
+def new_token_budget(note: str, cap: int = MAX_NEW_TOKENS) -> int:
+    """`max_new_tokens` for a note: a fixed summary allowance plus a share per question."""
+    budget = BASE_NEW_TOKENS + TOKENS_PER_QUESTION * count_questions(note)
+    return min(cap, max(MIN_NEW_TOKENS, budget))
+
+
+def trim_at_stop(text: str) -> str:
+    """Cut generated text at the first stop marker."""
+    cut = min((i for i in (text.find(m) for m in STOP_MARKERS) if i >= 0), default=len(text))
+    return text[:cut]
+
+
+def _section_headers(text: str) -> List[re.Match]:
+    """Header lines naming one of the answer sections; other `Label:` lines are section content."""
+    return [m for m in _HEADER.finditer(text)
+            if any(stem in m.group(1).lower() for stem in SECTION_STEMS.values())]
+
+
+def trim_trailing_header(text: str) -> str:
+    """Drop a section header the text ends on with nothing under it (where generation was stopped)."""
+    headers = _section_headers(text)
+    if headers and not text[headers[-1].end():].strip():
+        return text[:headers[-1].start()]
+    return text
+
+
+def is_complete(text: str, sections: Sequence[str]) -> bool:
+    """
+    True once generated `text` hits a stop marker, or every required
+    section header has appeared and the last of them has content closed by
+    a blank line or by the next section header.
+    """
+    if any(marker in text for marker in STOP_MARKERS):
+        return True
+    if not sections:
+        return False
+
+    headers = _section_headers(text)
+    found = []
+    for section in sections:
+        stem = SECTION_STEMS[section]
+        match = next((m for m in headers if stem in m.group(1).lower()), None)
+        if match is None:
+            return False
+        found.append(match)
+    last = max(found, key=lambda m: m.start())
+    following = next((m for m in headers if m.start() > last.start()), None)
+    if following is not None:
+        return bool(text[last.end():following.start()].strip())
+    # Closed: some content, then a blank line
+    content = text[last.end():].lstrip("\n")
+    return "\n\n" in content and bool(content.split("\n\n", 1)[0].strip())
+
+
+class SectionStoppingCriteria:
+    """
+    Per-row `transformers` stopping criterion (pass it inside a
+    `StoppingCriteriaList`): a row is finished when `is_complete` holds for
+    its generated text or it has used its own token budget.
+
+    `prompt_len` is the (padded) input width, so generated tokens start at
+    the same column in every row. If it is None it is taken from the first
+    call, when `generate` has appended exactly one token. Finished rows stay
+    finished and are not decoded again.
+
+    Only the tokens of a row's unfinished last line are decoded at each
+    step; completed lines are kept as text, so a call costs one line rather
+    than the whole answer.
+    """
+
+    def __init__(self, tokenizer, prompt_len: Optional[int], sections: Sequence[Sequence[str]],
+                 budgets: Optional[Sequence[int]] = None):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.sections = [list(s) for s in sections]
+        self.budgets = list(budgets) if budgets is not None else [None] * len(self.sections)
+        self.done = [False] * len(self.sections)
+        self._lines = [""] * len(self.sections)
+        self._line_start: List[Optional[int]] = [None] * len(self.sections)
+
+    def _generated_text(self, input_ids, row: int) -> str:
+        start = self._line_start[row] if self._line_start[row] is not None else self.prompt_len
+        tail = self.tokenizer.decode(input_ids[row, start:], skip_special_tokens=True)
+        if tail.endswith("\n"):
+            # A newline ends a character, so the tokens after it decode on their own
+            self._lines[row] += tail
+            self._line_start[row] = input_ids.shape[1]
+            tail = ""
+        return self._lines[row] + tail
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.prompt_len is None:
+            self.prompt_len = input_ids.shape[1] - 1
+        generated = input_ids.shape[1] - self.prompt_len
+        for row, finished in enumerate(self.done):
+            if finished:
+                continue
+            budget = self.budgets[row]
+            if budget is not None and generated >= budget:
+                self.done[row] = True
+                continue
+            self.done[row] = is_complete(self._generated_text(input_ids, row), self.sections[row])
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+
+class DeadlineStoppingCriteria:
+    """Stops every row once the request's deadline (src/admission.py) passes or it is cancelled."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        return torch.full((input_ids.shape[0],), self.deadline.expired, dtype=torch.bool, device=input_ids.device)
+
+
+def stopping_criteria(tokenizer, prompt_len: Optional[int], notes: Sequence[str], deadline=None):
+    """
+    `StoppingCriteriaList` and the shared `max_new_tokens` for a batch of
+    notes. The section criterion is always first; a `deadline` adds a
+    criterion that cancels the whole call.
+    """
+    from transformers import StoppingCriteriaList
+
+    budgets = [new_token_budget(note) for note in notes]
+    criteria = [SectionStoppingCriteria(tokenizer, prompt_len, [required_sections(n) for n in notes], budgets)]
+    if deadline is not None:
+        criteria.append(DeadlineStoppingCriteria(deadline))
+    return StoppingCriteriaList(criteria), max(budgets)
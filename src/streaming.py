@@ -0,0 +1,89 @@
+# src/streaming.py
+# Helpers for streaming summaries token by token to API clients.
+
+import json
+from typing import Iterable, Iterator, Sequence
+
+
+def strip_prompt_stream(chunks: Iterable[str], prompt: str) -> Iterator[str]:
+    """
+    Streaming counterpart of `text.replace(prompt, "").strip()`.
+
+    Drops the prompt if the backend echoes it at the start of the output,
+    skips leading whitespace and holds back trailing whitespace until more
+    text arrives, so the concatenated chunks equal the non-streaming result.
+    """
+    buffer = ""
+    matching_prompt = bool(prompt)
+    started = False
+    pending_ws = ""
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if matching_prompt:
+            buffer += chunk
+            if len(buffer) < len(prompt) and prompt.startswith(buffer):
+                continue
+            matching_prompt = False
+            chunk = buffer[len(prompt):] if buffer.startswith(prompt) else buffer
+            buffer = ""
+
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+
+        text = pending_ws + chunk
+        body = text.rstrip()
+        pending_ws = text[len(body):]
+        if body:
+            yield body
+
+    # The stream ended while it still looked like an echo of the prompt
+    if matching_prompt and buffer and buffer != prompt:
+        stripped = buffer.strip()
+        if stripped:
+            yield stripped
+
+
+def stop_at_markers(chunks: Iterable[str], markers: Sequence[str]) -> Iterator[str]:
+    """
+    Streaming counterpart of `stopping.trim_at_stop`: ends the stream
+    before the first marker, holding back just enough text to recognise
+    a marker split across chunks.
+    """
+    hold = max(len(marker) for marker in markers) - 1
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        cut = min((i for i in (buffer.find(m) for m in markers) if i >= 0), default=-1)
+        if cut >= 0:
+            if cut:
+                yield buffer[:cut]
+            return
+        safe = len(buffer) - hold
+        if safe > 0:
+            yield buffer[:safe]
+            buffer = buffer[safe:]
+    if buffer:
+        yield buffer
+
+
+def ndjson_events(chunks: Iterable[str]) -> Iterator[str]:
+    """Encode chunks as newline-delimited JSON, ending with the full summary."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield json.dumps({"token": chunk}) + "\n"
+    yield json.dumps({"done": True, "summary": "".join(parts)}) + "\n"
+
+
+def sse_events(chunks: Iterable[str]) -> Iterator[str]:
+    """Encode chunks as Server-Sent Events, ending with a `done` event."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield f"data: {json.dumps({'token': chunk})}\n\n"
+    yield f"event: done\ndata: {json.dumps({'summary': ''.join(parts)})}\n\n"
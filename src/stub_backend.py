@@ -0,0 +1,89 @@
+# src/stub_backend.py
+# Deterministic stand-in for LangChainSummarizer used for load tests and
+# benchmarks that must run without a model or network access.
+
+import asyncio
+import hashlib
+import time
+from typing import Iterator, List
+
+
+class StubPromptTemplate:
+    """Minimal PromptTemplate look-alike so the service can fingerprint and format prompts."""
+
+    template = "Clinician's Note:\n{prompt}\n\nSummary:"
+
+    def format(self, prompt: str) -> str:
+        return self.template.format(prompt=prompt)
+
+
+class StubSummarizer:
+    """
+    Returns a deterministic summary derived from the note after sleeping for
+    `latency_ms` plus the time needed to "decode" the output at `tokens_per_sec`.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, tokens_per_sec: float = 200.0):
+        """
+        Args:
+            latency_ms (float): Fixed per-request latency (prefill / network).
+            tokens_per_sec (float): Simulated decode speed; 0 disables decode delay.
+        """
+        self.mode = "stub"
+        self.latency_ms = latency_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_template = StubPromptTemplate()
+
+    def _summary(self, input_text: str) -> str:
+        digest = hashlib.sha256(input_text.encode("utf-8")).hexdigest()[:8]
+        words = input_text.split()
+        return (
+            f"Summary:\n{' '.join(words[:24])}\n\n"
+            f"Immediate Management:\n * Stub plan {digest}\n * Review in {len(words) % 7 + 1} days"
+        )
+
+    def _delay(self, summary: str) -> float:
+        decode = len(summary.split()) / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        return self.latency_ms / 1000.0 + decode
+
+    @staticmethod
+    def _sleep(seconds: float, deadline=None):
+        """Sleep like a generation would, stopping early (DeadlineExceeded) when `deadline` expires."""
+        if deadline is None:
+            time.sleep(seconds)
+            return
+        end = time.monotonic() + seconds
+        while True:
+            deadline.check()
+            left = end - time.monotonic()
+            if left <= 0:
+                return
+            time.sleep(min(left, 0.01))
+
+    def run(self, input_text: str, deadline=None) -> str:
+        summary = self._summary(input_text)
+        self._sleep(self._delay(summary), deadline)
+        return summary
+
+    def stream(self, input_text: str, deadline=None) -> Iterator[str]:
+        summary = self._summary(input_text)
+        self._sleep(self.latency_ms / 1000.0, deadline)
+        words = summary.split(" ")
+        for i, word in enumerate(words):
+            if self.tokens_per_sec > 0:
+                self._sleep(1.0 / self.tokens_per_sec, deadline)
+            yield word if i == 0 else " " + word
+
+    def run_batch(self, input_texts: List[str], deadline=None) -> List[str]:
+        return [self.run(text, deadline) for text in input_texts]
+
+    async def arun_batch(self, input_texts: List[str], deadline=None) -> List[str]:
+        if deadline is not None:
+            deadline.check()
+
+        async def one(text: str) -> str:
+            summary = self._summary(text)
+            await asyncio.sleep(self._delay(summary))
+            return summary
+
+        return list(await asyncio.gather(*(one(text) for text in input_texts)))
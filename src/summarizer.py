@@ -1,8 +1,11 @@
 # so the rest of the system can call one simple API irregardless of whether it’s running Google Gemini or local fine-tuned mode.
 
 import os
-from typing import Optional
+import time
+from typing import Iterator, Optional
 from src.langchain_pipeline import LangChainSummarizer
+from src.stub_backend import StubSummarizer
+from src.summary_cache import SummaryCache, cache_key, template_fingerprint
 
 
 class SummarizerService:
@@ -12,29 +15,219 @@ class SummarizerService:
     can all use the same interface.
     """
 
-    def __init__(self, mode: Optional[str] = None, model_name: Optional[str] = None):
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        cache: Optional[SummaryCache] = None,
+        backend: Optional[str] = None,
+        token_cache_dir: Optional[str] = None,
+        near_dup=None,
+        near_dup_policy: Optional[str] = None,
+        draft_model_name: Optional[str] = None,
+        prompt_style: Optional[str] = None
+    ):
         """
         Args:
-            mode (str): "gemini" or "local". Defaults to env MODE or 'local'.
+            mode (str): "gemini", "local" or "stub". Defaults to env MODE or 'local'.
+                "stub" is a deterministic fake backend for load tests
+                (STUB_LATENCY_MS, STUB_TOKENS_PER_SEC).
             model_name (str): Local model path or HF Hub ID if in local mode.
+            batch_size (int): Notes per local generate call. Defaults to env LOCAL_BATCH_SIZE or 8.
+            max_batch_tokens (int): Padded prompt tokens per local batch.
+                Defaults to env LOCAL_MAX_BATCH_TOKENS or 4096.
+            cache (SummaryCache): Summary cache. Defaults to one built from SUMMARY_CACHE_* env vars.
+            backend (str): Local backend "torch", "onnx" or "onnx-int8". Defaults to env LOCAL_BACKEND or 'torch'.
+            token_cache_dir (str): On-disk cache of local prompt token ids. Defaults to env
+                TOKEN_CACHE_DIR; disabled when neither is set.
+            near_dup (NearDupIndex): Near-duplicate note index. Defaults to one built from
+                NEAR_DUP_* env vars (off unless NEAR_DUP_ENABLED=1).
+            near_dup_policy (str): "reuse" returns a near-duplicate's summary as is; "warm_start"
+                generates with it as a reference. Defaults to env NEAR_DUP_POLICY or 'reuse'.
+            draft_model_name (str): Draft model for assisted decoding in local mode. Defaults to
+                env LOCAL_DRAFT_MODEL; off when neither is set. Greedy output is unchanged, so
+                cache keys are shared with plain decoding.
+            prompt_style (str): "concise", "fewshot" (worked examples from src/prompt_templates.py)
+                or "retrieved" (per-note examples from src/fewshot_index.py). Defaults to env
+                PROMPT_STYLE or 'concise'.
         """
         self.mode = (mode or os.getenv("MODE", "local")).lower()
         self.model_name = model_name or os.getenv("LOCAL_MODEL_PATH", "distilgpt2")
-        self.pipeline = LangChainSummarizer(mode=self.mode, model_name=self.model_name)
+        self.batch_size = batch_size or int(os.getenv("LOCAL_BATCH_SIZE", 8))
+        self.max_batch_tokens = max_batch_tokens or int(os.getenv("LOCAL_MAX_BATCH_TOKENS", 4096))
+        self.backend = (backend or os.getenv("LOCAL_BACKEND", "torch")).lower()
+        self.token_cache_dir = token_cache_dir or os.getenv("TOKEN_CACHE_DIR")
+        self.draft_model_name = draft_model_name or os.getenv("LOCAL_DRAFT_MODEL")
+        self.prompt_style = (prompt_style or os.getenv("PROMPT_STYLE", "concise")).lower()
+        if self.mode == "stub":
+            self.pipeline = StubSummarizer(
+                latency_ms=float(os.getenv("STUB_LATENCY_MS", 50)),
+                tokens_per_sec=float(os.getenv("STUB_TOKENS_PER_SEC", 200))
+            )
+        else:
+            self.pipeline = LangChainSummarizer(
+                mode=self.mode,
+                model_name=self.model_name,
+                batch_size=self.batch_size,
+                max_batch_tokens=self.max_batch_tokens,
+                backend=self.backend,
+                token_cache_dir=self.token_cache_dir,
+                draft_model_name=self.draft_model_name,
+                prompt_style=self.prompt_style
+            )
+        self.cache = cache if cache is not None else SummaryCache.from_env()
+        template = self.pipeline.prompt_template.template
+        fewshot_index = getattr(self.pipeline, "fewshot_index", None)
+        if fewshot_index is not None:
+            # Retrieved examples depend on the index contents and selection limits
+            template += (f"\x1fretrieved:{fewshot_index.fingerprint()}:"
+                         f"{self.pipeline.fewshot_k}:{self.pipeline.fewshot_token_budget}")
+        self.template_fp = template_fingerprint(template)
+        if near_dup is None and os.getenv("NEAR_DUP_ENABLED", "0") == "1":
+            # numpy is only needed when the near-duplicate index is on
+            from src.near_dup import NearDupIndex
 
-    def summarize(self, text: str) -> str:
-        """Summarize the given text."""
+            near_dup = NearDupIndex.from_env()
+        self.near_dup = near_dup
+        self.near_dup_policy = (near_dup_policy or os.getenv("NEAR_DUP_POLICY", "reuse")).lower()
+        if self.near_dup_policy not in ("reuse", "warm_start"):
+            raise ValueError("near_dup_policy must be 'reuse' or 'warm_start'.")
+
+    def warmup(self, text: str = "Patient reports mild headache since morning.") -> float:
+        """Run one uncached generation so lazy kernels and weights are ready; returns seconds taken."""
+        start = time.perf_counter()
+        self.pipeline.run(text)
+        return time.perf_counter() - start
+
+    def flush(self):
+        """Persist state the backend buffers in memory (the token id cache); call on shutdown."""
+        flush = getattr(self.pipeline, "flush", None)
+        if flush is not None:
+            flush()
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the model actually producing summaries, used to key caches and results."""
+        if self.mode == "gemini":
+            return LangChainSummarizer.GEMINI_MODEL
+        # Quantized backends can produce different text, so they get their own entries
+        return f"{self.model_name}@{self.backend}"
+
+    def _cache_key(self, text: str) -> str:
+        return cache_key(text, self.mode, self.model_id, self.template_fp)
+
+    @property
+    def near_dup_scope(self) -> str:
+        """Near-duplicate summaries are only reused within one backend, model and template."""
+        return f"{self.mode}\x1f{self.model_id}\x1f{self.template_fp}"
+
+    def summarize(self, text: str, bypass_cache: bool = False, deadline=None) -> str:
+        """Summarize the given text, serving repeats from the summary cache."""
+        return self.summarize_with_audit(text, bypass_cache, deadline)["summary"]
+
+    def summarize_with_audit(self, text: str, bypass_cache: bool = False, deadline=None) -> dict:
+        """
+        Summarize `text` and report where the summary came from.
+
+        `source` is "cache" (exact repeat), "near_duplicate" (a stored summary
+        of a near-identical note, reused as is), "warm_start" (generated with
+        that summary as a reference) or "generated". Near-duplicate results
+        also carry `similarity` (estimated Jaccard) and `near_duplicate_of`.
+
+        A `deadline` (src/admission.py) is passed to generation, which raises
+        DeadlineExceeded once it passes; nothing is cached in that case.
+        """
         if not text or not text.strip():
-            return "Error: Empty input text."
-        return self.pipeline.run(text)
-
-    def batch_summarize(self, texts: list[str]) -> list[str]:
-        """Summarize multiple texts in a batch."""
-        results = []
-        for txt in texts:
-            results.append(self.summarize(txt))
+            return {"summary": "Error: Empty input text.", "source": "error"}
+        if bypass_cache:
+            return {"summary": self.pipeline.run(text, deadline), "source": "generated"}
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {"summary": cached, "source": "cache"}
+
+        audit = {"source": "generated"}
+        match = self.near_dup.query(text, self.near_dup_scope) if self.near_dup is not None else None
+        if match is not None:
+            audit.update(near_duplicate_of=match.note_id, similarity=match.similarity)
+            if self.near_dup_policy == "reuse":
+                # Not written to the exact cache, so repeats keep their near-duplicate audit trail
+                return dict(audit, summary=match.summary, source="near_duplicate")
+            from src.near_dup import warm_start_text
+
+            summary = self.pipeline.run(warm_start_text(text, match.summary), deadline)
+            audit["source"] = "warm_start"
+        else:
+            summary = self.pipeline.run(text, deadline)
+
+        if key is not None:
+            self.cache.set(key, summary)
+        if self.near_dup is not None:
+            self.near_dup.add(text, summary, self.near_dup_scope)
+        return dict(audit, summary=summary)
+
+    def stream(self, text: str, bypass_cache: bool = False, deadline=None) -> Iterator[str]:
+        """Yield the summary in chunks; cached summaries are sent as a single chunk."""
+        if not text or not text.strip():
+            yield "Error: Empty input text."
+            return
+        if self.cache is None or bypass_cache:
+            yield from self.pipeline.stream(text, deadline)
+            return
+
+        key = self._cache_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        for chunk in self.pipeline.stream(text, deadline):
+            parts.append(chunk)
+            yield chunk
+        self.cache.set(key, "".join(parts))
+
+    def _plan_batch(self, texts: list[str], bypass_cache: bool):
+        """Fill empty-input errors and cache hits; return results, pending indices and their keys."""
+        results = ["Error: Empty input text."] * len(texts)
+        pending, keys = [], []
+        for i, txt in enumerate(texts):
+            if not txt or not txt.strip():
+                continue
+            if self.cache is not None and not bypass_cache:
+                key = self._cache_key(txt)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+                keys.append(key)
+            pending.append(i)
+        return results, pending, keys
+
+    def _fill_batch(self, results: list[str], pending: list[int], keys: list[str], summaries: list[str]):
+        for i, summary in zip(pending, summaries):
+            results[i] = summary
+        for key, summary in zip(keys, summaries):
+            self.cache.set(key, summary)
         return results
 
+    def batch_summarize(self, texts: list[str], bypass_cache: bool = False, deadline=None) -> list[str]:
+        """Summarize multiple texts in a batch, preserving input order."""
+        results, pending, keys = self._plan_batch(texts, bypass_cache)
+        summaries = self.pipeline.run_batch([texts[i] for i in pending], deadline) if pending else []
+        return self._fill_batch(results, pending, keys, summaries)
+
+    async def abatch_summarize(self, texts: list[str], bypass_cache: bool = False, deadline=None) -> list[str]:
+        """Async variant of `batch_summarize`; fans out concurrently in gemini mode."""
+        results, pending, keys = self._plan_batch(texts, bypass_cache)
+        summaries = await self.pipeline.arun_batch([texts[i] for i in pending], deadline) if pending else []
+        return self._fill_batch(results, pending, keys, summaries)
+
 
 if __name__ == "__main__":
     # Quick manual test
@@ -0,0 +1,202 @@
+# src/summary_cache.py
+# Two-tier content-addressed cache for generated summaries:
+# a bounded in-process LRU in front of an opt-in persistent SQLite store.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+def normalize_note(text: str) -> str:
+    """Collapse whitespace so trivially re-formatted notes share a key."""
+    return " ".join(text.split())
+
+
+def template_fingerprint(template: str) -> str:
+    """Short, stable fingerprint of a prompt template."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(note: str, mode: str, model_name: str, template_fp: str) -> str:
+    """Content address for a (note, backend, prompt) combination."""
+    material = "\x1f".join([normalize_note(note), mode, model_name, template_fp])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU mapping of key -> summary. Entries older than
+    `ttl_seconds` (if set) are dropped on access, as in the disk tier.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            value, created_at = self._data[key]
+            if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created_at: Optional[float] = None):
+        """Store `value`; `created_at` keeps the age of an entry promoted from another tier."""
+        with self._lock:
+            self._data[key] = (value, time.time() if created_at is None else created_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Persistent summary store with TTL expiry and a maximum entry count.
+    Least recently accessed rows are evicted first once the store is full.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON summaries(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[Tuple[str, float]]:
+        """(summary, created_at) for an unexpired entry, else None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                " SELECT key FROM summaries ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SummaryCache:
+    """
+    Memory tier backed by an optional disk tier, with hit/miss counters.
+    Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["SummaryCache"]:
+        """
+        Build the cache from SUMMARY_CACHE_* environment variables, or None
+        if disabled. Notes and summaries are only written to disk when
+        SUMMARY_CACHE_PATH is set.
+        """
+        if os.getenv("SUMMARY_CACHE_ENABLED", "1") == "0":
+            return None
+        ttl_seconds = float(os.getenv("SUMMARY_CACHE_TTL", 7 * 24 * 3600))
+        memory = LRUCache(int(os.getenv("SUMMARY_CACHE_SIZE", 1024)), ttl_seconds=ttl_seconds)
+        disk_path = os.getenv("SUMMARY_CACHE_PATH")
+        disk = None
+        if disk_path:
+            disk = SQLiteCache(
+                disk_path,
+                ttl_seconds=ttl_seconds,
+                max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 100_000))
+            )
+        return cls(memory, disk)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                # Promoted with its original age, so it expires from memory when it would on disk
+                self.memory.set(key, *entry)
+                self._count("disk_hits")
+                return entry[0]
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["memory_entries"] = len(self.memory)
+        stats["disk_entries"] = len(self.disk) if self.disk is not None else 0
+        return stats
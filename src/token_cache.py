@@ -0,0 +1,214 @@
+# src/token_cache.py
+# Persistent pre-tokenized cache shared by fine-tuning and local evaluation.
+# Token ids are stored as Arrow IPC parts, which are memory-mapped on load.
+# Each text is tokenized at most once per (tokenizer, prefix, suffix, max lengths).
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+
+SCHEMA = pa.schema([
+    ("key", pa.string()),
+    ("input_ids", pa.list_(pa.int32())),
+    ("labels", pa.list_(pa.int32())),
+])
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Identify a tokenizer by its vocabulary and rules, not just its name."""
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    vocab_file = getattr(tokenizer, "vocab_file", None)
+    digest = hashlib.sha256()
+    digest.update(f"{type(tokenizer).__name__}\x1f{len(tokenizer)}\x1f{tokenizer.truncation_side}".encode("utf-8"))
+    if backend is not None:
+        digest.update(backend.to_str().encode("utf-8"))
+    elif vocab_file and Path(vocab_file).exists():
+        digest.update(Path(vocab_file).read_bytes())
+    else:
+        digest.update(str(tokenizer.name_or_path).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class TokenCache:
+    """
+    Tokenizes `prefix + text + suffix` (and optionally a target) and caches
+    the resulting ids on disk.
+
+    The cache directory is derived from the tokenizer fingerprint, the
+    prefix/suffix and the max lengths, so changing any of them starts a
+    fresh cache. New rows are buffered and appended as a new part file
+    every `flush_every` misses (and on `flush()`). Existing parts are
+    never rewritten.
+
+    At most about `max_entries` rows are indexed in memory: once the newest
+    parts hold more, the oldest parts are dropped from the index (their
+    files stay on disk), so a long-running server does not grow without
+    bound. Dropped texts are simply tokenized again on their next use.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        prefix: str = "",
+        suffix: str = "",
+        max_length: Optional[int] = None,
+        label_max_length: Optional[int] = None,
+        add_special_tokens: bool = True,
+        root: Optional[str] = None,
+        flush_every: int = 1024,
+        max_entries: int = 500_000
+    ):
+        self.tokenizer = tokenizer
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_length = max_length
+        self.label_max_length = label_max_length
+        self.add_special_tokens = add_special_tokens
+        self.flush_every = flush_every
+        self.max_entries = max_entries
+
+        config = {
+            "tokenizer": tokenizer_fingerprint(tokenizer),
+            "prefix": prefix,
+            "suffix": suffix,
+            "max_length": max_length,
+            "label_max_length": label_max_length,
+            "add_special_tokens": add_special_tokens
+        }
+        fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.dir = Path(root or os.getenv("TOKEN_CACHE_DIR", "cache/tokens")) / fingerprint
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            meta_path.write_text(json.dumps(config, indent=2), encoding="utf-8")
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}
+        self._stats = {"hits": 0, "misses": 0}
+        self._load()
+
+    @staticmethod
+    def _read_part(path: Path) -> pa.Table:
+        with pa.memory_map(str(path)) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _load(self):
+        self._table = SCHEMA.empty_table()
+        self._index: Dict[str, int] = {}
+        # Rows per part held in `_table`, oldest first
+        self._part_rows = deque()
+        # Oldest first, so the newest parts are the ones kept under `max_entries`
+        parts = sorted(self.dir.glob("part-*.arrow"), key=lambda p: (p.stat().st_mtime_ns, p.name))
+        for part in parts:
+            self._append(self._read_part(part))
+
+    def _append(self, table: pa.Table):
+        offset = self._table.num_rows
+        self._table = pa.concat_tables([self._table, table])
+        self._part_rows.append(table.num_rows)
+        for row, key in enumerate(table.column("key").to_pylist()):
+            self._index[key] = offset + row
+        self._trim()
+
+    def _trim(self):
+        """Drop the oldest parts from memory until at most `max_entries` rows remain (keeping the newest part)."""
+        dropped = 0
+        while len(self._part_rows) > 1 and self._table.num_rows - dropped > self.max_entries:
+            dropped += self._part_rows.popleft()
+        if dropped:
+            self._table = self._table.slice(dropped)
+            self._index = {key: row - dropped for key, row in self._index.items() if row >= dropped}
+
+    @staticmethod
+    def _key(text: str, target: Optional[str]) -> str:
+        material = text if target is None else f"{text}\x1f{target}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _tokenize(self, texts: List[str], targets: Optional[List[str]]) -> List[dict]:
+        truncate = self.max_length is not None
+        encoded = self.tokenizer(
+            [self.prefix + text + self.suffix for text in texts],
+            max_length=self.max_length,
+            truncation=truncate,
+            add_special_tokens=self.add_special_tokens
+        )["input_ids"]
+        labels = [None] * len(texts)
+        if targets is not None:
+            labels = self.tokenizer(
+                text_target=targets,
+                max_length=self.label_max_length,
+                truncation=self.label_max_length is not None
+            )["input_ids"]
+        return [{"input_ids": ids, "labels": lab} for ids, lab in zip(encoded, labels)]
+
+    def encode(self, texts: List[str], targets: Optional[List[str]] = None) -> Dict[str, list]:
+        """
+        Token ids for `texts` (and `targets` as labels), in input order.
+
+        Only texts missing from the cache are tokenized, in one batched call.
+        """
+        keys = [self._key(t, None if targets is None else targets[i]) for i, t in enumerate(texts)]
+        rows: List[Optional[dict]] = [None] * len(texts)
+        missing = []
+        with self._lock:
+            cached = [i for i, k in enumerate(keys) if k in self._index]
+            if cached:
+                taken = self._table.take([self._index[keys[i]] for i in cached])
+                for i, ids, lab in zip(cached, taken.column("input_ids").to_pylist(),
+                                       taken.column("labels").to_pylist()):
+                    rows[i] = {"input_ids": ids, "labels": lab}
+            for i, key in enumerate(keys):
+                if rows[i] is None:
+                    if key in self._pending:
+                        rows[i] = self._pending[key]
+                    else:
+                        missing.append(i)
+            self._stats["hits"] += len(texts) - len(missing)
+            self._stats["misses"] += len(missing)
+
+        if missing:
+            fresh = self._tokenize(
+                [texts[i] for i in missing],
+                None if targets is None else [targets[i] for i in missing]
+            )
+            with self._lock:
+                for i, row in zip(missing, fresh):
+                    rows[i] = row
+                    self._pending[keys[i]] = row
+                if len(self._pending) >= self.flush_every:
+                    self._flush_locked()
+
+        return {
+            "input_ids": [row["input_ids"] for row in rows],
+            "labels": [row["labels"] for row in rows]
+        }
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        part = pa.Table.from_pylist(
+            [{"key": key, **row} for key, row in self._pending.items()], schema=SCHEMA
+        )
+        path = self.dir / f"part-{uuid.uuid4().hex[:12]}.arrow"
+        tmp_path = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(part)
+        os.replace(tmp_path, path)
+        self._pending.clear()
+        self._append(self._read_part(path))
+
+    def flush(self):
+        """Append buffered rows to disk as a new part."""
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._index) + len(self._pending))
@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def tiny_gpt2_dir(tmp_path):
+    """A randomly initialised two-layer GPT-2 with a byte-level tokenizer, saved without downloads."""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    model_dir = tmp_path / "tiny-gpt2"
+    model_dir.mkdir()
+    vocab = {ch: i for i, ch in enumerate(bytes_to_unicode().values())}
+    vocab["<|endoftext|>"] = len(vocab)
+    (model_dir / "vocab.json").write_text(json.dumps(vocab), encoding="utf-8")
+    (model_dir / "merges.txt").write_text("#version: 0.2\n", encoding="utf-8")
+    transformers.GPT2Tokenizer(str(model_dir / "vocab.json"), str(model_dir / "merges.txt")).save_pretrained(model_dir)
+
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=len(vocab), n_positions=64, n_embd=32, n_layer=2, n_head=2)
+    transformers.GPT2LMHeadModel(config).save_pretrained(model_dir)
+    return model_dir
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected, Deadline, DeadlineExceeded
+from src.summarizer import SummarizerService
+
+NOTE = "A 4-year-old child presents with second-degree burns on the forearm."
+
+
+def test_rejects_past_client_and_queue_limits():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, per_client=1)
+    controller.reserve("a")
+
+    with pytest.raises(AdmissionRejected) as e:
+        controller.reserve("a")
+    assert e.value.reason == "client_limit"
+
+    controller.reserve("b")
+    with pytest.raises(AdmissionRejected) as e:
+        controller.reserve("c")
+    assert e.value.reason == "queue_full" and e.value.retry_after >= 1
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    controller = AdmissionController(max_concurrency=1, max_queue=4)
+    order = []
+
+    async def job(name):
+        async with controller.slot(name, Deadline()):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(job(name) for name in "abcd"))
+
+    asyncio.run(main())
+    assert order == list("abcd")
+    assert controller.stats()["active"] == 0 and controller.stats()["waiting"] == 0
+
+
+def test_expired_requests_leave_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=4)
+
+    async def main():
+        async with controller.slot("a", Deadline()):
+            with pytest.raises(DeadlineExceeded):
+                async with controller.slot("b", Deadline(0.02)):
+                    pass
+
+    asyncio.run(main())
+    stats = controller.stats()
+    assert (stats["active"], stats["waiting"], stats["clients"], stats["expired_in_queue"]) == (0, 0, 0, 1)
+
+
+def test_deadline_stops_generation_and_skips_the_cache(monkeypatch):
+    monkeypatch.setenv("STUB_LATENCY_MS", "2000")
+    monkeypatch.setenv("SUMMARY_CACHE_ENABLED", "1")
+    monkeypatch.setenv("SUMMARY_CACHE_PATH", "")
+    service = SummarizerService(mode="stub")
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        service.summarize(NOTE, deadline=Deadline(0.05))
+    assert time.perf_counter() - start < 0.5
+    assert service.cache.get(service._cache_key(NOTE)) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from src import app as app_module
+
+    monkeypatch.setenv("STUB_LATENCY_MS", "300")
+    monkeypatch.setenv("STUB_TOKENS_PER_SEC", "0")
+    monkeypatch.setenv("SUMMARY_CACHE_ENABLED", "0")
+    monkeypatch.setattr(app_module, "summarizer_service", SummarizerService(mode="stub"))
+    monkeypatch.setattr(app_module, "admission", AdmissionController(max_concurrency=1, max_queue=1))
+    return TestClient(app_module.app), app_module.admission
+
+
+def test_api_returns_429_with_retry_after_when_full(client):
+    http, admission = client
+    admission.reserve("x")
+    admission.reserve("y")
+
+    response = http.post("/summarize", json={"text": NOTE})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_api_deadline_header_cancels_generation(client):
+    http, admission = client
+
+    start = time.perf_counter()
+    response = http.post("/summarize", json={"text": NOTE}, headers={"X-Deadline-Ms": "50"})
+    assert response.status_code == 504
+    assert time.perf_counter() - start < 0.3
+    assert http.post("/summarize", json={"text": NOTE}).status_code == 200
+    assert http.get("/admission/stats").json()["active"] == 0
+
+
+def test_requests_without_a_deadline_header_have_no_time_limit(client):
+    from src import app as app_module
+
+    request = type("Request", (), {"headers": {}})()
+    assert app_module.request_deadline(request).remaining() is None
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from src.assisted import AssistedDecodingStats
+
+
+class Module:
+    """Just enough of torch.nn.Module for forward hooks."""
+
+    def __init__(self):
+        self.hooks = []
+
+    def register_forward_hook(self, hook):
+        self.hooks.append(hook)
+        return self
+
+    def remove(self):
+        self.hooks.clear()
+
+    def __call__(self):
+        for hook in self.hooks:
+            hook(self, (), None)
+
+
+def forward(module, times):
+    for _ in range(times):
+        module()
+
+
+def test_acceptance_rate_and_tokens_per_main_forward():
+    main, draft = Module(), Module()
+    stats = AssistedDecodingStats(main, draft)
+
+    before = stats.snapshot()
+    forward(main, 4)
+    forward(draft, 6)
+    stats.record(before, new_tokens=7)
+
+    report = stats.stats()
+    assert (report["generations"], report["main_forwards"], report["draft_forwards"]) == (1, 4, 6)
+    # 7 tokens from 4 main forwards: 3 draft proposals were accepted out of 6
+    assert report["acceptance_rate"] == 0.5
+    assert report["tokens_per_main_forward"] == 1.75
+
+
+def test_concurrent_generations_count_only_their_own_forwards():
+    main, draft = Module(), Module()
+    stats = AssistedDecodingStats(main, draft)
+    started, finished = threading.Barrier(2), threading.Barrier(2)
+
+    def generation(main_forwards, draft_forwards, new_tokens):
+        before = stats.snapshot()
+        started.wait()
+        forward(main, main_forwards)
+        forward(draft, draft_forwards)
+        # Both generations are done before either records its window
+        finished.wait()
+        stats.record(before, new_tokens)
+
+    threads = [threading.Thread(target=generation, args=(2, 4, 4)),
+               threading.Thread(target=generation, args=(5, 5, 8))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = stats.stats()
+    assert (report["main_forwards"], report["draft_forwards"], report["new_tokens"]) == (7, 9, 12)
+    assert report["acceptance_rate"] == round(5 / 9, 4)
+
+
+def test_run_batch_falls_back_to_one_run_per_note(monkeypatch, tiny_gpt2_dir):
+    pytest.importorskip("langchain")
+    from src.langchain_pipeline import LangChainSummarizer
+
+    summarizer = LangChainSummarizer(mode="local", model_name=str(tiny_gpt2_dir),
+                                     draft_model_name=str(tiny_gpt2_dir))
+    calls = []
+    monkeypatch.setattr(summarizer, "run", lambda text, deadline=None: calls.append(text) or f"summary of {text}")
+
+    assert summarizer.run_batch(["a", "b"]) == ["summary of a", "summary of b"]
+    assert calls == ["a", "b"]
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.async_gemini import (
+    AsyncGeminiRunner,
+    GeminiRestTransport,
+    TokenBucket,
+    TransportError,
+    parse_retry_after,
+)
+
+
+@pytest.fixture
+def fake_gemini():
+    """Local stand-in for generateContent that fails the first call with a 429 (HTTP-date Retry-After)."""
+    state = {"calls": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            state["calls"] += 1
+            state["key_in_url"] = "key=" in self.path
+            state["key_header"] = self.headers["x-goog-api-key"]
+            if state["calls"] == 1:
+                self.send_response(429)
+                self.send_header("Retry-After", formatdate(usegmt=True))
+                self.end_headers()
+                return
+            prompt = body["contents"][0]["parts"][0]["text"]
+            payload = {"candidates": [{"content": {"parts": [{"text": f"summary of {prompt}"}]}}]}
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+
+
+def test_rest_transport_retries_429_against_fake_server(fake_gemini):
+    base_url, state = fake_gemini
+    transport = GeminiRestTransport("test-key", "gemini-pro", base_url=base_url)
+    runner = AsyncGeminiRunner(transport, concurrency=2, requests_per_minute=6000, base_delay=0.01)
+
+    results = asyncio.run(runner.generate_many(["note a", "note b", "note c"]))
+
+    assert results == ["summary of note a", "summary of note b", "summary of note c"]
+    assert state["calls"] == 4
+    assert (state["key_in_url"], state["key_header"]) == (False, "test-key")
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3") == 3.0
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_fan_out_is_bounded_by_concurrency():
+    in_flight = {"now": 0, "peak": 0}
+
+    async def transport(prompt):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return prompt.upper()
+
+    runner = AsyncGeminiRunner(transport, concurrency=4, requests_per_minute=60_000)
+    start = time.monotonic()
+    results = asyncio.run(runner.generate_many([f"n{i}" for i in range(8)]))
+    elapsed = time.monotonic() - start
+
+    assert results == [f"N{i}" for i in range(8)]
+    assert in_flight["peak"] == 4
+    assert elapsed < 0.3
+
+
+def test_non_retryable_error_is_raised_immediately():
+    calls = []
+
+    async def transport(prompt):
+        calls.append(prompt)
+        raise TransportError(400, "bad request")
+
+    runner = AsyncGeminiRunner(transport, requests_per_minute=60_000)
+
+    with pytest.raises(TransportError):
+        asyncio.run(runner.generate("note"))
+    assert len(calls) == 1
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)
+
+    async def take_two():
+        start = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(take_two()) >= 0.09
+
+
+def test_failure_cancels_requests_still_in_flight():
+    finished = []
+
+    async def transport(prompt):
+        if prompt == "bad":
+            raise TransportError(400, "bad request")
+        await asyncio.sleep(0.2)
+        finished.append(prompt)
+        return prompt
+
+    async def main():
+        runner = AsyncGeminiRunner(transport, concurrency=4, requests_per_minute=60_000)
+        with pytest.raises(TransportError):
+            await runner.generate_many(["a", "bad", "b", "c"])
+        await asyncio.sleep(0.3)
+
+    asyncio.run(main())
+    assert finished == []
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from codebase.batch_runner import BatchRunner, load_checkpoint
+
+
+@pytest.fixture
+def fake_chat():
+    """
+    Local stand-in for /v1/chat/completions; later prompts answer faster
+    than earlier ones and prompts starting with "bad" get a 400.
+    """
+    state = {"calls": 0, "in_flight": 0, "peak": 0, "bodies": []}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            assert self.path == "/v1/chat/completions"
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["messages"][-1]["content"]
+            with lock:
+                state["calls"] += 1
+                state["bodies"].append(body)
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.05 / int(prompt.split()[-1]))
+            with lock:
+                state["in_flight"] -= 1
+            if prompt.startswith("bad"):
+                data = json.dumps({"error": {"message": "bad request"}}).encode("utf-8")
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            payload = {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f" answer to {prompt} \n"}
+                }]
+            }
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1", state
+    server.shutdown()
+
+
+def test_runs_concurrently_and_keeps_every_row(fake_chat, tmp_path):
+    base_url, state = fake_chat
+    runner = BatchRunner(base_url=base_url, api_key="test", concurrency=3)
+    items = [(f"ID_{i}", f"note {i}") for i in range(1, 7)]
+
+    results = runner.run(items, tmp_path / "ckpt.jsonl")
+
+    assert results == {f"ID_{i}": f"answer to note {i}" for i in range(1, 7)}
+    assert 1 < state["peak"] <= 3
+    assert load_checkpoint(tmp_path / "ckpt.jsonl") == results
+
+
+def test_resumes_from_checkpoint(fake_chat, tmp_path):
+    base_url, state = fake_chat
+    checkpoint = tmp_path / "ckpt.jsonl"
+    runner = BatchRunner(base_url=base_url, api_key="test", concurrency=2)
+    checkpoint.write_text(
+        json.dumps({"id": "ID_1", "key": runner.request_key("note 1"), "response": "from earlier run"})
+        + "\n" + '{"id": "ID_2", "resp'
+    )
+
+    results = runner.run([("ID_1", "note 1"), ("ID_2", "note 2")], checkpoint)
+
+    assert results == {"ID_1": "from earlier run", "ID_2": "answer to note 2"}
+    assert state["calls"] == 1
+
+
+def test_sends_stop_sequences_and_per_item_budgets(fake_chat, tmp_path):
+    base_url, state = fake_chat
+    runner = BatchRunner(base_url=base_url, api_key="test", max_tokens=256, stop=["**********"])
+
+    runner.run([("ID_1", "note 1", 96), ("ID_2", "note 2")], tmp_path / "ckpt.jsonl")
+
+    budgets = {body["messages"][-1]["content"]: body["max_tokens"] for body in state["bodies"]}
+    assert budgets == {"note 1": 96, "note 2": 256}
+    assert all(body["stop"] == ["**********"] for body in state["bodies"])
+
+
+def test_changed_model_or_prompt_is_not_resumed(fake_chat, tmp_path):
+    base_url, state = fake_chat
+    checkpoint = tmp_path / "ckpt.jsonl"
+    BatchRunner(base_url=base_url, api_key="test", model="old-model").run(
+        [("ID_1", "note 1"), ("ID_2", "note 2")], checkpoint)
+
+    results = BatchRunner(base_url=base_url, api_key="test", model="old-model").run(
+        [("ID_1", "note 1"), ("ID_2", "edited note 2")], checkpoint)
+    assert results["ID_2"] == "answer to edited note 2"
+    assert state["calls"] == 3
+
+    BatchRunner(base_url=base_url, api_key="test", model="new-model").run([("ID_1", "note 1")], checkpoint)
+    assert state["calls"] == 4
+
+
+def test_failed_row_is_skipped_and_retried_on_rerun(fake_chat, tmp_path):
+    base_url, state = fake_chat
+    checkpoint = tmp_path / "ckpt.jsonl"
+    runner = BatchRunner(base_url=base_url, api_key="test", concurrency=2, max_retries=0)
+    items = [("ID_1", "note 1"), ("ID_2", "bad note 2"), ("ID_3", "note 3")]
+
+    results = runner.run(items, checkpoint)
+    assert results == {"ID_1": "answer to note 1", "ID_3": "answer to note 3"}
+    assert "ID_2" not in load_checkpoint(checkpoint)
+
+    calls = state["calls"]
+    runner.run(items, checkpoint)
+    assert state["calls"] == calls + 1
@@ -0,0 +1,31 @@
+from src.batching import bucket_by_length
+
+
+def test_buckets_cover_every_index_once():
+    lengths = [50, 10, 300, 12, 48, 11, 299]
+    buckets = bucket_by_length(lengths, batch_size=3, max_padded_tokens=10_000)
+
+    flat = sorted(i for bucket in buckets for i in bucket)
+    assert flat == list(range(len(lengths)))
+    assert all(len(bucket) <= 3 for bucket in buckets)
+
+
+def test_buckets_group_similar_lengths():
+    lengths = [10, 300, 11, 299, 12, 301]
+    buckets = bucket_by_length(lengths, batch_size=3, max_padded_tokens=10_000)
+
+    assert sorted(buckets[0]) == [0, 2, 4]
+    assert sorted(buckets[1]) == [1, 3, 5]
+
+
+def test_buckets_respect_padded_token_budget():
+    lengths = [100, 100, 100, 100]
+    buckets = bucket_by_length(lengths, batch_size=8, max_padded_tokens=250)
+
+    assert [len(bucket) for bucket in buckets] == [2, 2]
+
+
+def test_oversized_item_gets_own_bucket():
+    buckets = bucket_by_length([1000, 5], batch_size=8, max_padded_tokens=200)
+
+    assert buckets == [[1], [0]]
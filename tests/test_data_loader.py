@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from src.data_loader import ClinicalDataLoader, load_clinical_data, load_csv_data
+
+CSV = """Master_Index,County,Health level,Years of Experience,Prompt,Nursing Competency,Clinical Panel,Clinician
+ID_1,kiambu,dispensaries,4,child with burns,pediatrics,surgery,refer to burns unit
+ID_2,uasin gishu,health centres,12,adult with fever,general nursing,internal medicine,test for malaria
+ID_3,kiambu,dispensaries,,pregnant woman with headache,maternal and child health,obstetrics,
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_text(CSV)
+    return path
+
+
+def test_loader_honors_path_and_types_columns(csv_path, tmp_path):
+    loader = ClinicalDataLoader(str(csv_path), cache_dir=str(tmp_path / "cache"))
+    df = loader.load_table()
+
+    assert df["Master_Index"].tolist() == ["ID_1", "ID_2", "ID_3"]
+    assert str(df["County"].dtype) == "category"
+    assert str(df["Clinical Panel"].dtype) == "category"
+    assert str(df["Years of Experience"].dtype) == "float32"
+
+    labelled = loader.load_data()
+    assert list(labelled["prompt"]) == ["child with burns", "adult with fever"]
+
+
+def test_iter_chunks_streams_and_reuses_cache(csv_path, tmp_path):
+    loader = ClinicalDataLoader(str(csv_path), cache_dir=str(tmp_path / "cache"))
+
+    first = [len(chunk) for chunk in loader.iter_chunks(chunksize=2)]
+    assert first == [2, 1]
+    assert loader.cache_is_fresh()
+
+    cached = [chunk["Prompt"].tolist() for chunk in loader.iter_chunks(chunksize=2)]
+    assert cached == [["child with burns", "adult with fever"], ["pregnant woman with headache"]]
+    # Chunks from the cache follow the requested size, not the batches it was written in
+    assert [len(chunk) for chunk in loader.iter_chunks(chunksize=3)] == [3]
+
+    # Touching the source invalidates the cache
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert not loader.cache_is_fresh()
+
+
+def test_columns_empty_in_some_chunks_keep_one_schema(tmp_path):
+    path = tmp_path / "train.csv"
+    path.write_text(
+        "Master_Index,Prompt,Clinician,GPT4.0,DDX SNOMED\n"
+        "ID_1,child with burns,refer,,\n"
+        "ID_2,adult with fever,test,,\n"
+        "ID_3,woman with headache,check bp,Pre-eclampsia,398254007\n"
+    )
+    loader = ClinicalDataLoader(str(path), cache_dir=str(tmp_path / "cache"))
+
+    assert [len(chunk) for chunk in loader.iter_chunks(chunksize=2)] == [2, 1]
+    df = loader.load_table()
+    assert df["GPT4.0"].tolist()[2] == "Pre-eclampsia"
+    assert df["DDX SNOMED"].tolist()[2] == "398254007"
+
+
+def test_module_helpers_keep_raw_columns(csv_path, tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_CACHE_DIR", str(tmp_path / "cache"))
+
+    assert len(load_csv_data(str(csv_path))) == 3
+    labelled = load_clinical_data(str(csv_path))
+    assert list(labelled.columns)[-1] == "Clinician"
+    assert len(labelled) == 2
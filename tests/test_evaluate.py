@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("datasets")
+pytest.importorskip("sklearn")
+pytest.importorskip("rouge_score")
+
+from src.evaluate import evaluate_model
+from src.summarizer import SummarizerService
+
+CSV = """Master_Index,Prompt,Clinician
+ID_1,child with burns on the forearm,dress the burns and give analgesia
+ID_2,adult with fever and chills,test for malaria
+ID_3,pregnant woman with headache,check blood pressure and urine protein
+"""
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SUMMARY_CACHE_ENABLED", "0")
+    monkeypatch.setenv("STUB_LATENCY_MS", "0")
+    monkeypatch.setenv("STUB_TOKENS_PER_SEC", "0")
+    path = tmp_path / "notes.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return path
+
+
+def interrupted_checkpoint(path, model_name, rows):
+    """Checkpoint lines as left behind by a run of `model_name` that stopped after `rows`."""
+    service = SummarizerService(mode="stub", model_name=model_name)
+    identity = {"mode": service.mode, "model": service.model_id, "template_fp": service.template_fp}
+    with open(path, "w", encoding="utf-8") as f:
+        for row_id, prompt in rows:
+            record = dict(identity, row_id=row_id, prompt=prompt, gold_summary="", latency_s=0.0,
+                          generated_summary=f"stale summary by {model_name}", rouge1=0.0, rougeL=0.0)
+            f.write(json.dumps(record) + "\n")
+
+
+def test_rerun_with_another_model_reuses_nothing(dataset, tmp_path):
+    out = tmp_path / "results.csv"
+    checkpoint = tmp_path / "results.csv.checkpoint.jsonl"
+    interrupted_checkpoint(checkpoint, "model-a", [("ID_1", "child with burns on the forearm")])
+
+    metrics = evaluate_model(str(dataset), mode="stub", model_name="model-b", sample_size=0,
+                             out_path=str(out), scoring_workers=1)
+
+    assert metrics["generated_this_run"] == 3
+    assert "stale summary" not in out.read_text(encoding="utf-8")
+    assert not checkpoint.exists()
+
+
+def test_rerun_with_the_same_model_resumes(dataset, tmp_path):
+    out = tmp_path / "results.csv"
+    checkpoint = tmp_path / "results.csv.checkpoint.jsonl"
+    interrupted_checkpoint(checkpoint, "model-a", [("ID_1", "child with burns on the forearm")])
+
+    metrics = evaluate_model(str(dataset), mode="stub", model_name="model-a", sample_size=0,
+                             out_path=str(out), scoring_workers=1)
+
+    assert metrics["generated_this_run"] == 2
+    assert "stale summary by model-a" in out.read_text(encoding="utf-8")
+    assert not checkpoint.exists()
+
+
+def test_resumed_rows_are_backfilled_into_the_results_store(dataset, tmp_path):
+    from src.results_store import ResultsStore
+
+    checkpoint = tmp_path / "results.csv.checkpoint.jsonl"
+    interrupted_checkpoint(checkpoint, "model-a", [("ID_1", "child with burns on the forearm"),
+                                                   ("ID_2", "adult with fever and chills")])
+
+    evaluate_model(str(dataset), mode="stub", model_name="model-a", sample_size=0,
+                   out_path=str(tmp_path / "results.csv"), scoring_workers=1, store_dir=str(tmp_path / "store"))
+
+    service = SummarizerService(mode="stub", model_name="model-a")
+    table = ResultsStore(str(tmp_path / "store")).run_table(service.model_id, service.template_fp, "rougeL")
+    assert sorted(table["row_id"]) == ["ID_1", "ID_2", "ID_3"]
+    assert table["rougeL"].notna().all()
+
+
+def test_generation_bypasses_the_summary_cache(dataset, tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMARY_CACHE_ENABLED", "1")
+    monkeypatch.setenv("SUMMARY_CACHE_PATH", "")
+    calls = []
+    summarize = SummarizerService.summarize
+
+    def recording_summarize(self, text, bypass_cache=False, deadline=None):
+        calls.append(bypass_cache)
+        return summarize(self, text, bypass_cache, deadline)
+
+    monkeypatch.setattr(SummarizerService, "summarize", recording_summarize)
+    evaluate_model(str(dataset), mode="stub", model_name="model-a", sample_size=0,
+                   out_path=str(tmp_path / "results.csv"), scoring_workers=1)
+
+    assert calls == [True, True, True]
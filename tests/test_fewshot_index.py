@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.fewshot_index import FewShotIndex
+from src.prompt_templates import EXAMPLE_FEW_SHOT, build_prompt
+
+PAIRS = [
+    ("I am a nurse in Kiambu. A child with second-degree burns on the forearm from a stove.",
+     "Burns: analgesia, silver sulfadiazine dressing."),
+    ("I am a nurse in Nakuru. Known diabetic with vomiting, Kussmaul breathing and fruity breath.",
+     "DKA: IV fluids, insulin infusion, monitor potassium."),
+    ("I am a nurse in Kisumu. Adult with fever, chills and a positive malaria rapid test.",
+     "Malaria: artemether-lumefantrine, paracetamol, follow up."),
+]
+
+
+def test_search_ranks_by_similarity_and_skips_the_note_itself(tmp_path):
+    index = FewShotIndex(str(tmp_path))
+    assert index.add(PAIRS) == 3
+
+    hits = index.search("Toddler with burns on the hand after touching a hot stove", k=2)
+    assert hits[0]["summary"].startswith("Burns")
+
+    own = index.search(PAIRS[1][0], k=3)
+    assert all(hit["note"] != PAIRS[1][0] for hit in own)
+
+
+def test_add_is_incremental_and_persisted(tmp_path):
+    index = FewShotIndex(str(tmp_path))
+    index.add(PAIRS[:2])
+    assert index.add(PAIRS) == 1
+    assert len(index.segments) == 2
+
+    reopened = FewShotIndex(str(tmp_path))
+    assert len(reopened) == 3
+    assert reopened.search("fever and malaria test", k=1)[0]["summary"].startswith("Malaria")
+
+
+def test_select_respects_token_budget(tmp_path):
+    index = FewShotIndex(str(tmp_path))
+    index.add(PAIRS)
+    query = "patient with burns, diabetes with vomiting and fever with malaria"
+
+    assert len(index.select(query, k=3, token_budget=10_000)) == 3
+    budget = len(PAIRS[0][0]) // 4 + 40
+    assert sum(ex["tokens"] for ex in index.select(query, k=3, token_budget=budget)) <= budget
+
+
+def test_build_prompt_uses_retrieved_examples():
+    examples = [{"note": "Child with burns.", "summary": "Dress the wound."}]
+
+    assert EXAMPLE_FEW_SHOT in build_prompt("note")
+    prompt = build_prompt("note", examples)
+    assert EXAMPLE_FEW_SHOT not in prompt
+    assert "### Example 1:\nChild with burns." in prompt
+    assert prompt.endswith("Clinical note:\nnote\n\n----\nResponse:\n")
+
+
+def test_build_prompt_falls_back_to_static_examples_when_nothing_is_retrieved(tmp_path):
+    index = FewShotIndex(str(tmp_path))
+    index.add(PAIRS)
+
+    examples = index.select("zzz unrelated words only", k=3)
+    assert examples == []
+    assert EXAMPLE_FEW_SHOT in build_prompt("note", examples)
+
+
+def test_fingerprint_changes_when_examples_are_added(tmp_path):
+    index = FewShotIndex(str(tmp_path))
+    index.add(PAIRS[:2])
+    before = index.fingerprint()
+
+    assert FewShotIndex(str(tmp_path)).fingerprint() == before
+    index.add(PAIRS)
+    assert index.fingerprint() != before
+
+
+def test_retrieved_prompt_style_selects_examples_per_note(tmp_path, monkeypatch, tiny_gpt2_dir):
+    pytest.importorskip("langchain")
+    from src.langchain_pipeline import LangChainSummarizer
+
+    FewShotIndex(str(tmp_path / "index")).add(PAIRS)
+    monkeypatch.setenv("FEWSHOT_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setenv("FEWSHOT_K", "1")
+    summarizer = LangChainSummarizer(mode="local", model_name=str(tiny_gpt2_dir), prompt_style="retrieved")
+
+    prompt = summarizer._format("Toddler with burns after touching a hot stove")
+    assert "### Example 1:\n" + PAIRS[0][0] in prompt
+    assert "### Example 2:" not in prompt
+    assert summarizer.prefix_cache is None
+    assert EXAMPLE_FEW_SHOT in summarizer._format("zzz unrelated words only")
@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+import types
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from src import gemini_client
+from src.gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient
+
+
+@pytest.fixture
+def fake_gemini():
+    """
+    Local generateContent endpoint over HTTP/1.1 keep-alive. Prompts steer it:
+    "fail" answers 503, "slow fail" sleeps 0.2 s and then answers 503,
+    "busy" answers 429 with an HTTP-date Retry-After, "bad" answers 400,
+    "slow" sleeps 0.5 s on its first request only.
+    """
+    state = {"calls": 0, "connections": set(), "slow_seen": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["contents"][0]["parts"][0]["text"]
+            with lock:
+                state["calls"] += 1
+                state["connections"].add(self.client_address)
+                first_slow = prompt == "slow" and state["slow_seen"] == 0
+                state["slow_seen"] += prompt == "slow"
+            assert self.headers["x-goog-api-key"] == "test"
+            if first_slow:
+                time.sleep(0.5)
+            if prompt == "slow fail":
+                time.sleep(0.2)
+            headers = {}
+            if prompt in ("fail", "slow fail"):
+                status, payload = 503, {"error": "unavailable"}
+            elif prompt == "busy":
+                status, payload = 429, {"error": "rate limited"}
+                headers["Retry-After"] = formatdate(time.time() + 30, usegmt=True)
+            elif prompt == "bad":
+                status, payload = 400, {"error": "invalid argument"}
+            else:
+                status, payload = 200, {"candidates": [{"content": {"parts": [{"text": f"summary of {prompt}"}]}}]}
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+
+
+def test_rest_calls_reuse_one_keepalive_connection(fake_gemini):
+    base_url, state = fake_gemini
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url)
+
+    assert [client.call_generate(f"note {i}") for i in range(5)] == [f"summary of note {i}" for i in range(5)]
+    assert client.stats()["call_path"] == "rest"
+    assert client.stats()["connections_opened"] == 1
+    assert len(state["connections"]) == 1
+
+
+def test_circuit_opens_and_fails_fast(fake_gemini):
+    base_url, state = fake_gemini
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.call_generate("fail")
+    calls = state["calls"]
+    with pytest.raises(CircuitOpenError):
+        client.call_generate("note")
+    assert state["calls"] == calls and client.stats()["breaker"] == "open"
+
+
+def test_http_date_retry_after_is_parsed(fake_gemini):
+    base_url, _ = fake_gemini
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url)
+
+    with pytest.raises(gemini_client.TransportError) as excinfo:
+        client.call_generate("busy")
+    assert excinfo.value.status == 429
+    assert 25 < excinfo.value.retry_after <= 30
+
+
+def test_client_errors_are_not_breaker_successes(fake_gemini):
+    base_url, _ = fake_gemini
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url, breaker=breaker)
+
+    with pytest.raises(Exception):
+        client.call_generate("fail")
+    with pytest.raises(gemini_client.TransportError):
+        client.call_generate("bad")
+    # The 400 neither reset the failure count nor added to it
+    assert (breaker.failures, breaker.state) == (1, "closed")
+    with pytest.raises(Exception):
+        client.call_generate("fail")
+    assert breaker.state == "open"
+
+
+def test_hedged_call_records_one_failure(fake_gemini):
+    base_url, state = fake_gemini
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url,
+                          breaker=breaker, hedge=True, hedge_delay=0.05, hedge_budget=1.0)
+
+    with pytest.raises(gemini_client.TransportError):
+        client.call_generate("slow fail")
+    assert state["calls"] == 2 and client.stats()["hedges"] == 1
+    assert (breaker.failures, breaker.state) == (1, "closed")
+    client.close()
+
+
+def test_half_open_probe_closes_the_circuit():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    now[0] = 11
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_client_error_probe_keeps_the_circuit_half_open():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+
+    now[0] = 11
+    breaker.allow()
+    breaker.record_neutral()
+    assert breaker.state == "half_open"
+    # The probe slot is free again for the next call
+    breaker.allow()
+
+
+def test_hedged_request_cuts_tail_latency(fake_gemini):
+    base_url, _ = fake_gemini
+    client = GeminiClient(api_key="test", model_name="m", transport="rest", base_url=base_url,
+                          hedge=True, hedge_delay=0.05)
+
+    start = time.perf_counter()
+    assert client.call_generate("slow") == "summary of slow"
+    assert time.perf_counter() - start < 0.4
+    stats = client.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+    client.close()
+
+
+def test_sdk_entry_point_is_resolved_once(monkeypatch):
+    calls = []
+    fake_sdk = types.SimpleNamespace(
+        responses=types.SimpleNamespace(create=lambda **kw: calls.append(kw) or types.SimpleNamespace(answer="ok"))
+    )
+    monkeypatch.setattr(gemini_client, "genai", fake_sdk)
+
+    client = GeminiClient(api_key="test", model_name="m", transport="sdk")
+    assert client.call_path == "responses"
+    assert client.call_generate("note") == "ok"
+    assert calls == [{"model": "m", "input": "note"}]
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from src.admission import AdmissionController
+from src import jobs
+from src.jobs import JobRunner, JobStore, parse_upload, results_csv
+
+CSV = "Master_Index,County,Prompt\nID_1,Kiambu,child with burns\nID_2,Nakuru,\"fever, chills\"\nID_3,Kisumu,bad note\n"
+
+
+class FakeService:
+    """Summarizes instantly; fails whole batches containing 'bad' and that note on its own."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def batch_summarize(self, texts):
+        self.calls += 1
+        if any("bad" in t for t in texts):
+            raise RuntimeError("batch failed")
+        return [f"summary of {t}" for t in texts]
+
+    def summarize(self, text):
+        if "bad" in text:
+            raise RuntimeError("cannot summarize")
+        return f"summary of {text}"
+
+
+def test_parses_csv_and_ndjson():
+    assert list(parse_upload(io.BytesIO(CSV.encode()), "test.csv"))[1] == ("ID_2", "fever, chills")
+
+    ndjson = "\n".join(json.dumps({"Master_Index": f"ID_{i}", "Prompt": f"note {i}"}) for i in range(2))
+    assert list(parse_upload(io.BytesIO(ndjson.encode()), "rows.ndjson")) == [("ID_0", "note 0"), ("ID_1", "note 1")]
+
+    with pytest.raises(ValueError):
+        list(parse_upload(io.BytesIO(b"Master_Index,Text\nID_1,x\n"), "test.csv"))
+
+
+def test_runner_finishes_job_in_order_and_isolates_failures(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id, rows = store.create(parse_upload(io.BytesIO(CSV.encode()), "test.csv"), "test.csv")
+    assert rows == 3 and store.get(job_id)["status"] == "queued"
+
+    runner = JobRunner(store, FakeService(), batch_size=2)
+    while runner.run_once():
+        pass
+
+    status = store.get(job_id)
+    assert (status["status"], status["completed"], status["failed"], status["eta_seconds"]) == ("done", 2, 1, 0.0)
+    assert status["throughput_rows_per_s"] > 0
+    lines = "".join(results_csv(store.iter_results(job_id))).splitlines()
+    assert lines == ["Master_Index,Clinician", "ID_1,summary of child with burns",
+                     'ID_2,"summary of fever, chills"', "ID_3,"]
+
+
+def test_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id, _ = store.create([(f"ID_{i}", f"note {i}") for i in range(5)])
+    # A worker of a previous process on this host claimed rows and died before finishing them
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    assert store.claim(3, owner=f"{socket.gethostname()}:{dead.pid}") is not None
+
+    restarted = JobStore(path)
+    runner = JobRunner(restarted, FakeService(), batch_size=10).start()
+    try:
+        deadline = time.time() + 5
+        while restarted.get(job_id)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        runner.stop(timeout=5)
+    assert restarted.get(job_id)["completed"] == 5
+
+
+def test_claims_of_an_earlier_process_with_the_same_pid_are_released(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id, _ = store.create([(f"ID_{i}", f"note {i}") for i in range(3)])
+    # As after a container restart: same hostname and pid, new process
+    assert store.claim(2, owner=f"{socket.gethostname()}:{os.getpid()}:previousboot") is not None
+    assert store.claim(2) is not None
+    monkeypatch.setattr(jobs, "BOOT_ID", "nextboot")
+
+    job, rows = store.claim(5)
+    assert (job, sorted(seq for seq, _ in rows)) == (job_id, [0, 1, 2])
+
+
+def test_rows_are_claimed_once_the_slot_is_held(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create([("ID_1", "note 1")])
+    events = []
+    claim = store.claim
+    store.claim = lambda limit: events.append("claim") or claim(limit)
+
+    @contextmanager
+    def slot():
+        events.append("slot")
+        yield
+        events.append("release")
+
+    assert JobRunner(store, FakeService(), slot=slot).run_once()
+    assert events == ["slot", "claim", "release"]
+
+
+def test_job_batches_wait_for_an_admission_slot(tmp_path):
+    controller = AdmissionController(max_concurrency=1)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create([("ID_1", "note 1")])
+    service = FakeService()
+    runner = JobRunner(store, service, slot=lambda: controller.thread_slot(loop))
+
+    try:
+        # The only slot is busy, as if with an interactive request
+        with controller.thread_slot(loop):
+            worker = threading.Thread(target=runner.run_once)
+            worker.start()
+            time.sleep(0.2)
+            assert service.calls == 0 and worker.is_alive()
+        worker.join(5)
+        assert service.calls == 1
+        # Let the release scheduled by the worker run before reading the counters
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result()
+        stats = controller.stats()
+        assert (stats["active"], stats["background"], stats["rejected"]) == (0, 0, 0)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def test_job_api_upload_poll_and_download(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("multipart")
+    from fastapi.testclient import TestClient
+
+    from src import app as app_module
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, FakeService(), poll_interval=0.01).start()
+    monkeypatch.setattr(app_module, "job_store", store)
+    monkeypatch.setattr(app_module, "job_runner", runner)
+    client = TestClient(app_module.app)
+    try:
+        response = client.post("/jobs", files={"file": ("test.csv", CSV.encode(), "text/csv")})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        deadline = time.time() + 5
+        while client.get(f"/jobs/{job_id}").json()["status"] != "done" and time.time() < deadline:
+            time.sleep(0.02)
+        results = client.get(f"/jobs/{job_id}/results")
+        assert results.status_code == 200
+        assert results.text.splitlines()[1] == "ID_1,summary of child with burns"
+
+        assert client.post("/jobs", files={"file": ("x.csv", b"Prompt\nx\n", "text/csv")}).status_code == 400
+        assert client.get("/jobs/missing").status_code == 404
+    finally:
+        runner.stop(timeout=5)
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+
+def test_pipeline_import_does_not_load_model_backends():
+    """Importing the pipeline must not pull in torch, transformers, langchain or Gemini."""
+    probe = (
+        "import sys, src.langchain_pipeline, src.summarizer; "
+        "print(','.join(m for m in ('torch', 'transformers', 'langchain', 'google.generativeai') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
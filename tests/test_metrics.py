@@ -0,0 +1,62 @@
+import pytest
+
+from src import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_seconds", "Test histogram.", ("stage",), buckets=(0.1, 1))
+    hist.observe(0.05, stage="generate")
+    hist.observe(0.5, stage="generate")
+    hist.observe(5, stage="generate")
+
+    lines = hist.render()
+    assert 'test_seconds_bucket{stage="generate",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="generate",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="generate",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="generate"} 3' in lines
+
+
+def test_span_records_stage_time():
+    with metrics.span("prompt_build", "test"):
+        pass
+
+    rendered = metrics.REGISTRY.render()
+    assert 'summarizer_stage_seconds_count{stage="prompt_build",mode="test"} 1' in rendered
+
+
+def test_disabled_metrics_are_noops(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    gauge = metrics.Gauge("test_in_flight", "Test gauge.")
+
+    gauge.inc()
+    with metrics.span("generate", "disabled"):
+        pass
+
+    assert gauge.render() == gauge.header()
+    assert 'mode="disabled"' not in metrics.REGISTRY.render()
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_escaped", "Test counter.", ("route",))
+    counter.inc(route='a\\b"c\nd')
+
+    assert counter.render()[-1] == 'test_escaped_total{route="a\\\\b\\"c\\nd"} 1'
+
+
+def test_request_metrics_use_the_route_template(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from src import app as app_module
+
+    if not metrics.METRICS_ENABLED:
+        pytest.skip("metrics disabled")
+    client = TestClient(app_module.app)
+    client.get("/jobs/first-job")
+    client.get("/jobs/second-job")
+    client.get("/no/such/path")
+
+    rendered = client.get("/metrics").text
+    assert 'http_requests_total{route="/jobs/{job_id}",status="503"} 2' in rendered
+    assert 'route="unmatched"' in rendered
+    assert "first-job" not in rendered and "/no/such/path" not in rendered
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.near_dup import NearDupIndex, choose_bands, strip_boilerplate
+from src.summarizer import SummarizerService
+
+CASE = ("A 24-year-old female complains of sharp pain in the right side of the nose that started "
+        "2 days ago with swelling, redness and tenderness, no fever, no trauma, no nasal discharge "
+        "and no previous history of similar complaints. What is the likely diagnosis and management?")
+NOTE = "I am a nurse with 2 years of experience in general nursing in Uasin Gishu county. " + CASE
+NEAR_COPY = "I am a nurse with 17 years of experience in critical care in Kiambu county. " + CASE.replace(
+    "What is", "What's")
+OTHER = ("I am a nurse with 5 years of experience. A 6-year-old girl with vomiting, abdominal pain, "
+         "Kussmaul breathing and fruity breath; known diabetic off insulin.")
+
+
+def test_boilerplate_is_stripped_before_hashing():
+    assert strip_boilerplate(NOTE) == CASE
+    assert strip_boilerplate("no full stop") == "no full stop"
+
+
+def test_unpunctuated_notes_and_decimals():
+    # The dataset's notes are lowercased without punctuation
+    note = ("i am a nurse with 22 years of experience in general nursing working in a sub county hospitals "
+            "and nursing homes in kiambu county in kenya a 3 years old boy with temp 38.5 and a bean seed "
+            "in the right nostril")
+    assert strip_boilerplate(note) == "a 3 years old boy with temp 38.5 and a bean seed in the right nostril"
+    # A decimal is not a sentence end, and a note without an introduction is kept whole
+    assert strip_boilerplate("I am a nurse with temp 38.5 readings. A child with cough.") == "A child with cough."
+    case = "a 6 year old with temp 38.5 and cough. what is the management"
+    assert strip_boilerplate(case) == case
+
+
+def test_lsh_threshold_does_not_exceed_target():
+    bands, rows = choose_bands(128, 0.9)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.9
+
+
+def test_finds_near_duplicates_within_scope_only(tmp_path):
+    index = NearDupIndex(str(tmp_path / "nd.sqlite3"), threshold=0.8)
+    note_id = index.add(NOTE, "Nasal furunculosis: analgesia, antibiotics.", scope="local")
+
+    match = index.query(NEAR_COPY, scope="local")
+    assert match is not None and match.note_id == note_id
+    assert 0.8 <= match.similarity <= 1.0
+    assert index.query(OTHER, scope="local") is None
+    assert index.query(NEAR_COPY, scope="gemini") is None
+    assert index.stats()["matches"] == 1
+
+
+@pytest.mark.parametrize("policy, source", [("reuse", "near_duplicate"), ("warm_start", "warm_start")])
+def test_service_reports_near_duplicate_audit(tmp_path, monkeypatch, policy, source):
+    monkeypatch.setenv("STUB_LATENCY_MS", "0")
+    monkeypatch.setenv("STUB_TOKENS_PER_SEC", "0")
+    monkeypatch.setenv("SUMMARY_CACHE_ENABLED", "0")
+    index = NearDupIndex(str(tmp_path / "nd.sqlite3"), threshold=0.8)
+    service = SummarizerService(mode="stub", near_dup=index, near_dup_policy=policy)
+
+    first = service.summarize_with_audit(NOTE)
+    assert first["source"] == "generated"
+
+    second = service.summarize_with_audit(NEAR_COPY)
+    assert second["source"] == source
+    assert second["near_duplicate_of"] == 1
+    if policy == "reuse":
+        assert second["summary"] == first["summary"]
+    assert service.summarize_with_audit(NEAR_COPY, bypass_cache=True)["source"] == "generated"
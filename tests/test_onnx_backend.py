@@ -0,0 +1,47 @@
+import pytest
+
+from src.onnx_backend import _publish, _staging_dir, load_onnx_model, onnx_export_dir
+
+
+def test_export_dir_changes_when_the_model_is_retrained(tmp_path):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "config.json").write_text("{}", encoding="utf-8")
+    (model_dir / "model.safetensors").write_bytes(b"old weights")
+    fp32 = onnx_export_dir(str(model_dir), quantize=False, root=str(tmp_path / "onnx"))
+    assert fp32.name == "fp32"
+    assert onnx_export_dir(str(model_dir), quantize=True, root=str(tmp_path / "onnx")).parent == fp32.parent
+
+    (model_dir / "model.safetensors").write_bytes(b"retrained weights")
+    assert onnx_export_dir(str(model_dir), quantize=False, root=str(tmp_path / "onnx")) != fp32
+
+
+def test_concurrent_exports_keep_the_first_finished_one(tmp_path):
+    target = tmp_path / "onnx" / "abc" / "fp32"
+    first, second = _staging_dir(target), target.with_name("fp32.tmp-other")
+    second.mkdir()
+    (first / "model.onnx").write_text("first", encoding="utf-8")
+    (second / "model.onnx").write_text("second", encoding="utf-8")
+
+    _publish(first, target)
+    _publish(second, target)
+
+    assert (target / "model.onnx").read_text(encoding="utf-8") == "first"
+    assert sorted(p.name for p in target.parent.iterdir()) == ["fp32"]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_onnx_model_generates(tiny_gpt2_dir, tmp_path, quantize):
+    pytest.importorskip("optimum.onnxruntime")
+    import transformers
+
+    tokenizer, model = load_onnx_model(str(tiny_gpt2_dir), quantize=quantize, root=str(tmp_path / "onnx"))
+    encoded = tokenizer("child with burns", return_tensors="pt")
+    kwargs = dict(max_new_tokens=6, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    output = model.generate(**encoded, **kwargs)
+
+    assert output.shape[1] > encoded["input_ids"].shape[1]
+    if not quantize:
+        reference = transformers.AutoModelForCausalLM.from_pretrained(tiny_gpt2_dir).eval()
+        assert output.tolist() == reference.generate(**encoded, **kwargs).tolist()
+    assert not [p for p in (tmp_path / "onnx").rglob("*.tmp-*")]
@@ -0,0 +1,107 @@
+import re
+import string
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from codebase.postprocess import (
+    clean_sentence,
+    clean_summary,
+    extract_description,
+    format_responses,
+    process_csv,
+)
+
+DATA = Path(__file__).resolve().parent.parent / "Data"
+
+
+# Per-row reference implementations, exactly as they were in codebase/main.py
+
+def ref_clean_sentence(text: str) -> str:
+    text_no_punct = text.translate(str.maketrans('', '', string.punctuation))
+    text_no_newlines = text_no_punct.replace('\n', ' ').replace('\r', ' ').replace("**", "")
+    return text_no_newlines.lower().strip()
+
+
+def ref_extract_description(prompt):
+    prompt_cleaned = prompt.replace('\n', ' ')
+    match = re.search(r'\.(.*)', prompt_cleaned)
+    return match.group(1).strip() if match else None
+
+
+def ref_clean_summary(summary):
+    sentences = summary.split('.')
+    filtered = [s for s in sentences if 'i am a nurse' not in s.lower()]
+    cleaned_summary = '. '.join(filtered).strip()
+    return cleaned_summary
+
+
+def ref_format_response(question, content):
+    cleaned_prompt = "summary " + " ".join(question.split('.')[1:]).replace('\n\n', ' ').replace('\n', ' ')
+    response_text = f"{cleaned_prompt} {content}"
+    return response_text.replace('\n\n', ' ').replace('\n', ' ').replace('**', '').replace("####", "").strip().lower()
+
+
+EDGE_CASES = [
+    "I am a nurse.",
+    "I am a nurse",
+    "no full stop here",
+    "a. I AM A NURSE in kiambu. b",
+    "a. I am a nurse. I am a nurse too. b.",
+    "a. b. I am a nurse",
+    "I am a nurse. I am a nurse",
+    "..I am a nurse..x",
+    "line\n\n\nbreaks **bold** ##**## end.\r\n",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def raw_texts():
+    """Every text column of the raw and cleaned Data/ files, plus hand-picked edge cases."""
+    texts = list(EDGE_CASES)
+    for path in sorted(DATA.glob("*_raw*.csv")) + sorted(DATA.glob("*_cleaned.csv")):
+        df = pd.read_csv(path)
+        for column in ("Prompt", "Clinician"):
+            if column in df.columns:
+                texts.extend(df[column].dropna().tolist())
+    return pd.Series(texts, dtype=object)
+
+
+@pytest.mark.parametrize("vectorized, reference", [
+    (clean_sentence, ref_clean_sentence),
+    (extract_description, ref_extract_description),
+    (clean_summary, ref_clean_summary),
+])
+def test_column_transforms_match_per_row_reference(raw_texts, vectorized, reference):
+    assert vectorized(raw_texts).tolist() == [reference(t) for t in raw_texts]
+
+
+def test_format_responses_matches_reference(raw_texts):
+    questions = raw_texts
+    responses = raw_texts.iloc[::-1].reset_index(drop=True)
+
+    expected = [ref_format_response(q, r) for q, r in zip(questions, responses)]
+    assert format_responses(questions, responses).tolist() == expected
+
+
+def test_format_responses_reproduces_committed_prompt_prefix():
+    raw = pd.read_csv(DATA / "test_raw.csv")
+    outputs = pd.read_csv(DATA / "optimizedv2_test_raw_with_prompt.csv")
+    merged = raw.merge(outputs, on="Master_Index")
+
+    prefixes = format_responses(merged["Prompt"], pd.Series([""] * len(merged)))
+    assert all(out.startswith(prefix) for prefix, out in zip(prefixes, merged["Clinician"]))
+
+
+def test_process_csv_keeps_row_order_across_workers(tmp_path):
+    source = pd.read_csv(DATA / "test_raw.csv")
+    out = tmp_path / "clean.csv"
+
+    process_csv(str(DATA / "test_raw.csv"), str(out), {"Prompt": "clean_sentence"}, chunksize=40, workers=2)
+
+    result = pd.read_csv(out, keep_default_na=False)
+    assert result["Master_Index"].tolist() == source["Master_Index"].tolist()
+    assert result["Prompt"].tolist() == [ref_clean_sentence(t) for t in source["Prompt"]]
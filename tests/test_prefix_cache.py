@@ -0,0 +1,57 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from src.prefix_cache import PrefixKVCache
+
+PREFIX = "### Example 1:\nchild with burns\nSummary: dressing\n\nClinical note:\n"
+
+
+class ByteTokenizer:
+    """Tokenizes text into its UTF-8 bytes, so ids line up with characters."""
+
+    def __call__(self, text, return_tensors=None, add_special_tokens=True):
+        return {"input_ids": torch.tensor([list(text.encode("utf-8"))])}
+
+
+def tiny_model():
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=256, n_positions=256, n_embd=32, n_layer=2, n_head=2)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+
+def plain_generate(model, input_ids, **kwargs):
+    with torch.no_grad():
+        output = model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), **kwargs)
+    return output[0, input_ids.shape[1]:].tolist()
+
+
+def test_cached_and_uncached_greedy_outputs_match():
+    model = tiny_model()
+    tokenizer = ByteTokenizer()
+    cache = PrefixKVCache(model, tokenizer, "tiny")
+    kwargs = dict(max_new_tokens=12, do_sample=False, pad_token_id=0)
+
+    for note in ("adult with fever and chills", "child with burns on the forearm"):
+        input_ids = tokenizer(PREFIX + note)["input_ids"]
+        cached, prompt_len = cache.generate(PREFIX, input_ids, **kwargs)
+        assert prompt_len == input_ids.shape[1]
+        assert cached.tolist() == plain_generate(model, input_ids, **kwargs)
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["boundary_misses"]) == (1, 2, 0)
+
+
+def test_prompt_tokenized_across_the_boundary_is_generated_uncached():
+    model = tiny_model()
+    cache = PrefixKVCache(model, ByteTokenizer(), "tiny")
+    kwargs = dict(max_new_tokens=8, do_sample=False, pad_token_id=0)
+
+    # As if BPE had merged the prefix's last character with the note's first one
+    input_ids = ByteTokenizer()(PREFIX + "fever")["input_ids"].clone()
+    input_ids[0, len(PREFIX) - 1] = 255
+
+    cached, _ = cache.generate(PREFIX, input_ids, **kwargs)
+    assert cached.tolist() == plain_generate(model, input_ids, **kwargs)
+    assert cache.stats()["boundary_misses"] == 1
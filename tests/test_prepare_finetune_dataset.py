@@ -0,0 +1,80 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+# The script imports its siblings as top-level modules, as when run from src/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from prepare_finetune_dataset import FinetuneDatasetPreparer, shard_paths  # noqa: E402
+
+
+def write_csv(path, prompts):
+    rows = "".join(f"ID_{i},{prompt},summary of {prompt}\n" for i, prompt in enumerate(prompts))
+    path.write_text("Master_Index,Prompt,Clinician\n" + rows, encoding="utf-8")
+
+
+@pytest.fixture
+def notes(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "notes.csv"
+    write_csv(path, [f"note number {i}" for i in range(6)])
+    return path
+
+
+def mtimes(directory):
+    return {p.name: p.stat().st_mtime_ns for p in directory.glob("*.jsonl")}
+
+
+def test_export_writes_sharded_splits_and_manifest(notes, tmp_path):
+    out = tmp_path / "out"
+    manifest = FinetuneDatasetPreparer(str(notes), str(out), shard_rows=2, val_fraction=0.5, num_workers=2).prepare()
+
+    assert sum(manifest["rows"].values()) == 6
+    assert len(manifest["shards"]) == 6
+    assert json.loads((out / "manifest.json").read_text(encoding="utf-8")) == manifest
+    rows = [json.loads(line) for path in shard_paths(str(out / "manifest.json"), "train")
+            for line in open(path, encoding="utf-8")]
+    assert len(rows) == manifest["rows"]["train"]
+    assert all(row["output_text"] == f"summary of {row['input_text']}" for row in rows)
+
+
+def test_reexport_only_rewrites_changed_shards(notes, tmp_path):
+    out = tmp_path / "out"
+    preparer = FinetuneDatasetPreparer(str(notes), str(out), shard_rows=2, num_workers=1)
+    first = preparer.prepare()
+    before = mtimes(out)
+
+    assert preparer.prepare() == first
+    assert mtimes(out) == before
+
+    write_csv(notes, [f"note number {i}" for i in range(5)] + ["an edited note"])
+    preparer.prepare()
+    changed = {name for name, mtime in mtimes(out).items() if before.get(name) != mtime}
+    assert changed and all(name.endswith("-00002.jsonl") for name in changed)
+
+
+def test_shorter_export_removes_stale_shards(notes, tmp_path):
+    out = tmp_path / "out"
+    FinetuneDatasetPreparer(str(notes), str(out), shard_rows=2, num_workers=1).prepare()
+    assert (out / "train-00002.jsonl").exists()
+
+    manifest = FinetuneDatasetPreparer(str(notes), str(out), shard_rows=3, num_workers=1).prepare()
+
+    assert not (out / "train-00002.jsonl").exists()
+    assert sorted(p.name for p in out.glob("*.jsonl")) == sorted(e["path"] for e in manifest["shards"])
+
+
+def test_each_task_carries_only_its_own_manifest_entries(notes, tmp_path):
+    out = tmp_path / "out"
+    preparer = FinetuneDatasetPreparer(str(notes), str(out), shard_rows=2, num_workers=1)
+    preparer.prepare()
+
+    tasks = list(preparer._tasks(preparer._previous_shards()))
+    assert [sorted(task["previous"]) for task in tasks] == [
+        [f"train-{i:05d}.jsonl", f"val-{i:05d}.jsonl"] for i in range(3)
+    ]
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from src.results_store import ResultsStore, note_hash, result_key
+
+NOTES = {"ID_1": "child with burns", "ID_2": "adult with fever", "ID_3": "pregnant woman with headache"}
+
+
+def add_run(store, model, summaries, scores, metric_version=1):
+    """Store one (model, "tpl") run: `summaries` and rougeL `scores` by row id."""
+    run_id = store.new_run_id()
+    store.append_generations([
+        {"key": result_key(NOTES[row_id], model, "tpl"), "note_hash": note_hash(NOTES[row_id]), "row_id": row_id,
+         "model": model, "template_fp": "tpl", "generated_summary": summary, "latency_s": 0.1}
+        for row_id, summary in summaries.items()
+    ], run_id)
+    store.append_scores([
+        {"key": result_key(NOTES[row_id], model, "tpl"), "metric": "rougeL", "metric_version": metric_version,
+         "value": value}
+        for row_id, value in scores.items()
+    ], run_id)
+
+
+def test_lookups_return_latest_generation_and_current_scores(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    add_run(store, "a", {"ID_1": "old"}, {"ID_1": 0.1})
+    add_run(store, "a", {"ID_1": "new"}, {"ID_1": 0.3}, metric_version=2)
+    key = result_key(NOTES["ID_1"], "a", "tpl")
+
+    assert store.get_generations([key, "missing"]) == {key: "new"}
+    assert store.get_scores([key], {"rougeL": 1}) == {(key, "rougeL"): 0.1}
+    assert store.get_scores([key], {"rougeL": 3}) == {}
+
+
+def test_run_table_and_diff_runs(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    assert store.run_table("a", "tpl", "rougeL").empty
+    add_run(store, "a", {"ID_1": "a1", "ID_2": "a2"}, {"ID_1": 0.2, "ID_2": 0.5})
+    add_run(store, "b", {"ID_1": "b1", "ID_2": "b2", "ID_3": "b3"}, {"ID_1": 0.4, "ID_2": 0.5})
+
+    table = store.run_table("b", "tpl", "rougeL").sort_values("row_id")
+    assert table["row_id"].tolist() == ["ID_1", "ID_2", "ID_3"]
+    assert table["rougeL"].tolist()[:2] == [0.4, 0.5] and table["rougeL"].isna().tolist()[2]
+
+    diff = store.diff_runs(("a", "tpl"), ("b", "tpl")).sort_values("row_id")
+    assert diff["row_id"].tolist() == ["ID_1", "ID_2"]
+    assert diff["delta"].round(6).tolist() == [0.2, 0.0]
+
+
+def test_ingest_predictions_joins_to_source_notes(tmp_path):
+    notes_csv, preds_csv = tmp_path / "notes.csv", tmp_path / "preds.csv"
+    notes_csv.write_text("Master_Index,Prompt\n" + "".join(f"{k},{v}\n" for k, v in NOTES.items()), encoding="utf-8")
+    preds_csv.write_text("Master_Index,Clinician\nID_2,give antipyretics\nID_9,orphan prediction\n", encoding="utf-8")
+    store = ResultsStore(str(tmp_path / "store"))
+
+    run_id = store.ingest_predictions(str(preds_csv), str(notes_csv), "submission-v2", "tpl")
+
+    key = result_key(NOTES["ID_2"], "submission-v2", "tpl")
+    assert store.get_generations([key]) == {key: "give antipyretics"}
+    assert store.run_table("submission-v2", "tpl", "rougeL")["row_id"].tolist() == ["ID_2"]
+    assert any(run_id in part.name for part in (tmp_path / "store" / "generations").iterdir())
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+from src.shared_weights import load_shared_model, memory_report, prepare_shared_weights, shared_weights_dir
+
+
+def test_shared_weights_dir_is_stable_per_model(tmp_path):
+    first = shared_weights_dir("distilgpt2", str(tmp_path))
+
+    assert first == shared_weights_dir("distilgpt2", str(tmp_path))
+    assert first != shared_weights_dir("models/t5_finetuned", str(tmp_path))
+
+
+def test_retrained_model_in_the_same_directory_gets_a_new_export(tmp_path):
+    model_dir = tmp_path / "t5_finetuned"
+    model_dir.mkdir()
+    (model_dir / "config.json").write_text("{}", encoding="utf-8")
+    (model_dir / "model.safetensors").write_bytes(b"old weights")
+    before = shared_weights_dir(str(model_dir), str(tmp_path / "shared"))
+
+    (model_dir / "model.safetensors").write_bytes(b"retrained weights")
+    assert shared_weights_dir(str(model_dir), str(tmp_path / "shared")) != before
+
+
+def test_shared_model_generates_like_the_original(tiny_gpt2_dir, tmp_path):
+    import torch
+    import transformers
+
+    export = prepare_shared_weights(str(tiny_gpt2_dir), str(tmp_path / "shared"))
+    tokenizer, model = load_shared_model(str(export))
+    assert not any(t.is_meta for t in [*model.parameters(), *model.buffers()])
+
+    encoded = tokenizer("child with burns", return_tensors="pt")
+    kwargs = dict(max_new_tokens=6, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    reference = transformers.AutoModelForCausalLM.from_pretrained(tiny_gpt2_dir).eval()
+    with torch.no_grad():
+        assert model.generate(**encoded, **kwargs).tolist() == reference.generate(**encoded, **kwargs).tolist()
+    assert os.path.exists(export / "buffers.pt")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_memory_report_reads_rss_and_shared():
+    report = memory_report()
+
+    assert report["rss_kb"] > 0
+    assert report["shared_kb"] + report["private_kb"] == report["rss_kb"]
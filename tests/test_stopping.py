@@ -0,0 +1,113 @@
+import pytest
+
+from src.stopping import (
+    count_questions,
+    is_complete,
+    new_token_budget,
+    required_sections,
+    trim_at_stop,
+    trim_trailing_header,
+)
+from src.streaming import stop_at_markers
+
+NOTE = ("i am a nurse in kiambu a 6 years old girl with twitching mrdt negative what could be the problem "
+        "what is the diagnosis and which medication do i prescribe")
+ANSWER = "Summary:\nGirl with twitching.\n\nDiagnosis:\nFebrile seizure.\n\nMedications:\n * Diazepam 0.3 mg/kg PR"
+
+
+def test_budget_scales_with_questions():
+    assert count_questions(NOTE) == 4
+    assert count_questions("Fever for 2 days. Diagnosis? Management?") == 2
+    assert count_questions("no questions at all") == 1
+    assert new_token_budget("no questions at all") < new_token_budget(NOTE) <= 256
+
+
+def test_narrative_is_not_read_as_questions():
+    note = ("A nurse at the latest shift noted the labour ward had no beds available when she arrived, "
+            "where the mother was waiting. SPO?: 72%.\nQuestions:\n1. What is the diagnosis?\n2. How is it managed?")
+    assert count_questions(note) == 2
+    assert required_sections(note) == ["Diagnosis:", "Immediate Management:"]
+
+    plain = "she collapsed when walking home where she lives what is the diagnosis"
+    assert count_questions(plain) == 1
+    assert required_sections("a child who had the latest labour test what is the problem") == ["Diagnosis:"]
+
+
+def test_required_sections_follow_the_questions():
+    assert required_sections(NOTE) == ["Diagnosis:", "Medications:"]
+    assert required_sections("Fever since Monday. Which tests and drugs should I order?") == [
+        "Investigations:", "Medications:"
+    ]
+
+
+def test_complete_only_once_every_section_is_closed():
+    sections = required_sections(NOTE)
+    assert not is_complete("Summary:\nGirl with twitching.\n\nDiagnosis:\nFebrile seizure.\n\n", sections)
+    assert not is_complete(ANSWER, sections)
+    assert is_complete(ANSWER + "\n\n", sections)
+    assert is_complete(ANSWER + "\nFollow-up Care:", sections)
+    assert is_complete("Diagnosis: seizure\n\n**********", [])
+
+
+def test_labels_inside_a_section_do_not_close_it():
+    assert not is_complete("Immediate Management:\nParacetamol:", ["Immediate Management:"])
+    assert not is_complete("Immediate Management:\n * Paracetamol\n\nFollow-up Care:\nReferral:",
+                           ["Follow-up Care:"])
+    assert not is_complete("Diagnosis:\nMedications:", ["Diagnosis:"])
+    assert is_complete("Diagnosis:\nFebrile seizure\nMedications:", ["Diagnosis:"])
+
+
+def test_trailing_empty_header_is_trimmed():
+    assert trim_trailing_header("Diagnosis:\nFebrile seizure\n\nFollow-up Care: ") == "Diagnosis:\nFebrile seizure\n\n"
+    assert trim_trailing_header(ANSWER) == ANSWER
+    assert trim_trailing_header("Diagnosis:\nMalaria\nDose:") == "Diagnosis:\nMalaria\nDose:"
+
+
+def test_stream_trimming_matches_trim_at_stop():
+    text = ANSWER + "\n\n**********\n\n### Example 3:\nmore"
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    assert "".join(stop_at_markers(chunks, ["**********", "### Example"])) == trim_at_stop(text)
+    assert trim_at_stop(text) == ANSWER + "\n\n"
+
+
+def test_criterion_stops_rows_independently():
+    torch = pytest.importorskip("torch")
+    from src.stopping import SectionStoppingCriteria
+
+    class CharTokenizer:
+        def decode(self, ids, skip_special_tokens=True):
+            return "".join(chr(i) for i in ids.tolist())
+
+    def ids(text):
+        return [ord(c) for c in text]
+
+    finished, open_ = ANSWER + "\n\n", ANSWER + "\n "
+    rows = torch.tensor([ids("P" + finished), ids("P" + open_)])
+    criterion = SectionStoppingCriteria(CharTokenizer(), 1, [required_sections(NOTE)] * 2, budgets=[512, 512])
+
+    assert criterion(rows, None).tolist() == [True, False]
+    assert criterion(rows[:, :5], None).tolist() == [True, False]
+
+
+def test_criterion_decodes_only_the_open_line():
+    torch = pytest.importorskip("torch")
+    from src.stopping import SectionStoppingCriteria, is_complete
+
+    decoded = []
+
+    class CharTokenizer:
+        def decode(self, ids, skip_special_tokens=True):
+            decoded.append(len(ids))
+            return "".join(chr(i) for i in ids.tolist())
+
+    text = "P" + ANSWER + "\n\n"
+    rows = torch.tensor([[ord(c) for c in text]])
+    sections = required_sections(NOTE)
+    criterion = SectionStoppingCriteria(CharTokenizer(), 1, [sections])
+
+    # One call per generated token, as `generate` makes them
+    stopped_at = next(end for end in range(2, len(text) + 1) if criterion(rows[:, :end], None).tolist() == [True])
+    assert stopped_at == len(text)
+    assert not is_complete(text[1:stopped_at - 1], sections)
+    assert max(decoded) <= max(len(line) for line in text.splitlines()) + 1
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from src.streaming import ndjson_events, sse_events, strip_prompt_stream
+
+PROMPT = "Clinician's Note:\nchild with burns\n\nSummary:"
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("output", [
+    PROMPT + "  A 4-year-old with burns.\n\nManagement:\n * Paracetamol \n",
+    "\n A 4-year-old with burns.  ",
+    PROMPT,
+    "Clinician's",
+])
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_stream_matches_non_streaming_post_processing(output, size):
+    streamed = "".join(strip_prompt_stream(split(output, size), PROMPT))
+
+    assert streamed == output.replace(PROMPT, "").strip()
+
+
+def test_ndjson_and_sse_end_with_full_summary():
+    lines = list(ndjson_events(["A 4-year", "-old"]))
+    assert json.loads(lines[0]) == {"token": "A 4-year"}
+    assert json.loads(lines[-1]) == {"done": True, "summary": "A 4-year-old"}
+
+    events = list(sse_events(["A", "B"]))
+    assert events[0] == 'data: {"token": "A"}\n\n'
+    assert events[-1].startswith("event: done\n")
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from src.stub_backend import StubSummarizer
+
+
+def test_stub_is_deterministic_and_per_note():
+    stub = StubSummarizer(latency_ms=0, tokens_per_sec=0)
+    note = "A 4-year-old child presents with second-degree burns on the forearm."
+
+    assert stub.run(note) == stub.run(note)
+    assert stub.run(note) != stub.run(note + " Alert and crying.")
+    assert "".join(stub.stream(note)) == stub.run(note)
+
+
+def test_stub_applies_configured_latency():
+    stub = StubSummarizer(latency_ms=30, tokens_per_sec=0)
+
+    start = time.perf_counter()
+    stub.run("note")
+    assert time.perf_counter() - start >= 0.03
+
+
+def test_stub_async_batch_overlaps_requests():
+    stub = StubSummarizer(latency_ms=50, tokens_per_sec=0)
+
+    start = time.perf_counter()
+    results = asyncio.run(stub.arun_batch(["a", "b", "c", "d"]))
+
+    assert results == [stub._summary(t) for t in ["a", "b", "c", "d"]]
+    assert time.perf_counter() - start < 0.15
@@ -0,0 +1,82 @@
+import types
+
+from src import summary_cache
+from src.summary_cache import LRUCache, SQLiteCache, SummaryCache, cache_key, template_fingerprint
+
+
+def test_cache_key_ignores_whitespace_but_not_backend():
+    fp = template_fingerprint("Clinician's Note:\n{prompt}\n\nSummary:")
+    key = cache_key("Child with  burns\non forearm", "local", "distilgpt2", fp)
+
+    assert key == cache_key(" Child with burns on forearm ", "local", "distilgpt2", fp)
+    assert key != cache_key("Child with burns on forearm", "gemini", "gemini-pro", fp)
+    assert key != cache_key("Child with burns on forearm", "local", "distilgpt2", template_fingerprint("{prompt}"))
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    lru.get("a")
+    lru.set("c", "3")
+
+    assert lru.get("b") is None
+    assert lru.get("a") == "1"
+    assert lru.get("c") == "3"
+
+
+def test_disk_tier_expires_and_bounds_entries(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=3600, max_entries=2)
+    disk.set("a", "1")
+    disk.set("b", "2")
+    disk.set("c", "3")
+
+    assert len(disk) == 2
+    assert disk.get("a") is None
+
+    expired = SQLiteCache(str(tmp_path / "expired.sqlite3"), ttl_seconds=-1)
+    expired._conn.execute("INSERT INTO summaries VALUES ('k', 'v', 0, 0)")
+    assert expired.get("k") is None
+
+
+def test_two_tier_hits_are_counted_and_promoted(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    disk.set("k", "summary")
+    cache = SummaryCache(LRUCache(maxsize=4), disk)
+
+    assert cache.get("missing") is None
+    assert cache.get("k") == "summary"
+    assert cache.get("k") == "summary"
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["memory_entries"] == 1
+
+
+def test_memory_tier_expires_entries_with_the_disk_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(summary_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    disk.set("k", "summary")
+    now[0] += 50
+    cache = SummaryCache(LRUCache(maxsize=4, ttl_seconds=60), disk)
+    assert cache.get("k") == "summary"
+    assert cache.stats()["disk_hits"] == 1
+
+    # Promoted with its disk age: it expires from memory when it does on disk
+    now[0] += 20
+    assert cache.memory.get("k") is None
+    assert cache.get("k") is None
+
+
+def test_disk_tier_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("SUMMARY_CACHE_PATH", raising=False)
+    monkeypatch.delenv("SUMMARY_CACHE_ENABLED", raising=False)
+    monkeypatch.chdir(tmp_path)
+    assert SummaryCache.from_env().disk is None
+    assert not (tmp_path / "cache").exists()
+
+    monkeypatch.setenv("SUMMARY_CACHE_PATH", str(tmp_path / "summaries.sqlite3"))
+    assert SummaryCache.from_env().disk is not None
@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.token_cache import TokenCache
+
+
+class WhitespaceTokenizer:
+    """Tiny stand-in tokenizer that counts how many texts it tokenizes."""
+
+    name_or_path = "whitespace"
+    truncation_side = "right"
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = 0
+
+    def __len__(self):
+        return 1000
+
+    def _ids(self, text, max_length, truncation):
+        ids = [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+        return ids[:max_length] if truncation and max_length else ids
+
+    def __call__(self, texts=None, text_target=None, max_length=None, truncation=False, add_special_tokens=True):
+        batch = texts if texts is not None else text_target
+        self.calls += len(batch)
+        return {"input_ids": [self._ids(t, max_length, truncation) for t in batch]}
+
+
+def test_encodes_once_and_persists_across_instances(tmp_path):
+    tokenizer = WhitespaceTokenizer()
+    cache = TokenCache(tokenizer, prefix="summarize: ", max_length=3, label_max_length=2, root=str(tmp_path))
+
+    first = cache.encode(["child with burns", "adult fever"], ["refer now please", "malaria test"])
+    assert [len(ids) for ids in first["input_ids"]] == [3, 3]
+    assert [len(ids) for ids in first["labels"]] == [2, 2]
+    cache.flush()
+
+    reopened = TokenCache(tokenizer, prefix="summarize: ", max_length=3, label_max_length=2, root=str(tmp_path))
+    tokenizer.calls = 0
+    again = reopened.encode(["adult fever", "child with burns"], ["malaria test", "refer now please"])
+    assert again["input_ids"] == first["input_ids"][::-1]
+    assert tokenizer.calls == 0
+    assert reopened.stats()["hits"] == 2
+
+
+def test_new_rows_are_appended_incrementally(tmp_path):
+    tokenizer = WhitespaceTokenizer()
+    cache = TokenCache(tokenizer, root=str(tmp_path), flush_every=1)
+    cache.encode(["one note"])
+    cache.encode(["one note", "another note"])
+
+    assert len(list(cache.dir.glob("part-*.arrow"))) == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+def test_settings_change_the_cache_directory(tmp_path):
+    tokenizer = WhitespaceTokenizer()
+    a = TokenCache(tokenizer, prefix="summarize: ", max_length=512, root=str(tmp_path))
+    b = TokenCache(tokenizer, prefix="summarize: ", max_length=256, root=str(tmp_path))
+    assert a.dir != b.dir
+
+
+def test_in_memory_index_keeps_only_the_newest_parts(tmp_path):
+    tokenizer = WhitespaceTokenizer()
+    cache = TokenCache(tokenizer, root=str(tmp_path), flush_every=2, max_entries=3)
+    cache.encode(["note one", "note two"])
+    cache.encode(["note three", "note four"])
+    cache.encode(["note five", "note six"])
+
+    assert cache.stats()["entries"] == 2
+    assert len(list(cache.dir.glob("part-*.arrow"))) == 3
+    tokenizer.calls = 0
+    assert cache.encode(["note six", "note one"])["input_ids"][0] == cache.encode(["note six"])["input_ids"][0]
+    assert tokenizer.calls == 1
+
+    reopened = TokenCache(tokenizer, root=str(tmp_path), flush_every=2, max_entries=3)
+    assert reopened.stats()["entries"] <= 3
+